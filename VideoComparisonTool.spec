@@ -1,39 +1,49 @@
-# -*- mode: python ; coding: utf-8 -*-
-
-
-a = Analysis(
-    ['video_comparison_tool.py'],
-    pathex=[],
-    binaries=[],
-    datas=[],
-    hiddenimports=[],
-    hookspath=[],
-    hooksconfig={},
-    runtime_hooks=[],
-    excludes=[],
-    noarchive=False,
-    optimize=0,
-)
-pyz = PYZ(a.pure)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='VideoComparisonTool',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=['logo.ico'],
-)
+# -*- mode: python ; coding: utf-8 -*-
+
+# 使用目录模式（onedir）而不是单文件：单文件版每次启动都要先把 Qt 解压到临时目录，
+# 窗口要等好几秒才出现。同样关闭 UPX，避免启动时解压 DLL。
+# 启动耗时检查见 README：python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+
+
+a = Analysis(
+    ['video_comparison_tool.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('logo.ico', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['tkinter'],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='VideoComparisonTool',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['logo.ico'],
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='VideoComparisonTool',
+)
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from media_probe import app_cache_dir, file_key
+
+# 音频互相关自动对齐：同一场景的多路录制开始时间不同，用音轨找出它们之间的时间偏移
+#
+# 每个文件只提取一次低采样率的单声道音频，按块求 RMS 得到每秒 ENVELOPE_RATE 个点的包络，
+# 一小时的素材只有几十万个点；包络保存在磁盘缓存中，再次对齐时不需要重新解码。
+# 相关计算使用包络的起音强度（对数包络的正向差分），对两路录音的音量和频响差异不敏感，
+# 用补零的 FFT 一次算出所有时移的互相关，峰值位置即为偏移
+
+# 提取音频使用的采样率，只用于计算包络，不需要高频
+DECODE_RATE = 8000
+# 包络采样率（每秒点数），对齐精度为 1000 / ENVELOPE_RATE 毫秒，峰值插值后更细
+ENVELOPE_RATE = 100
+# 每次从管道读取的样本数
+READ_SAMPLES = DECODE_RATE * 10
+# 相关系数低于这个值时认为没有找到可靠的对齐
+MIN_CONFIDENCE = 0.1
+
+
+class AlignmentCancelled(Exception):
+    pass
+
+
+def envelope_cache_path(path, rate=ENVELOPE_RATE, directory=None):
+    key = hashlib.sha1(file_key(path).encode("utf-8")).hexdigest()
+    return os.path.join(directory or app_cache_dir("audio_envelopes"), f"{key}_{rate}.npy")
+
+
+def extract_command(path):
+    # 直接让 ffmpeg 混成单声道并重采样，管道中的数据量只有原始音频的很小一部分
+    return [
+        "ffmpeg", "-v", "error", "-nostdin",
+        "-i", path,
+        "-map", "0:a:0", "-vn",
+        "-ac", "1", "-ar", str(DECODE_RATE),
+        "-f", "s16le",
+        "pipe:1",
+    ]
+
+
+def extract_envelope(path, rate=ENVELOPE_RATE, cancel_event=None):
+    """ 解码音轨并按块计算 RMS 包络，返回 float32 数组；文件没有音轨时返回 None """
+    block = DECODE_RATE // rate
+    process = subprocess.Popen(extract_command(path), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    chunks = []
+    # 不满一块的样本留到下一次读取
+    remainder = np.zeros(0, dtype=np.float32)
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise AlignmentCancelled()
+            data = process.stdout.read(READ_SAMPLES * 2)
+            if not data:
+                break
+            samples = np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32)
+            if len(remainder):
+                samples = np.concatenate([remainder, samples])
+            usable = len(samples) // block * block
+            blocks = samples[:usable].reshape(-1, block)
+            chunks.append(np.sqrt(np.einsum("ij,ij->i", blocks, blocks) / block))
+            remainder = samples[usable:]
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+    if process.returncode != 0 and not chunks:
+        # 没有音轨或无法解码
+        return None
+    envelope = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    return envelope.astype(np.float32) if len(envelope) else None
+
+
+def load_envelope(path, rate=ENVELOPE_RATE, cancel_event=None, directory=None):
+    """ 优先读取磁盘缓存，没有时提取并保存 """
+    try:
+        cache_path = envelope_cache_path(path, rate, directory)
+    except OSError:
+        return None
+    try:
+        return np.load(cache_path)
+    except (OSError, ValueError):
+        pass
+
+    envelope = extract_envelope(path, rate, cancel_event)
+    if envelope is None:
+        return None
+    temp_path = cache_path + ".part"
+    try:
+        with open(temp_path, "wb") as f:
+            np.save(f, envelope)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"无法保存音频包络缓存: {e}")
+    return envelope
+
+
+def onset_strength(envelope):
+    """ 对数包络的正向差分，去均值并归一化 """
+    log_envelope = np.log1p(envelope)
+    onset = np.maximum(np.diff(log_envelope, prepend=log_envelope[:1]), 0.0)
+    onset -= onset.mean()
+    norm = np.linalg.norm(onset)
+    return onset / norm if norm > 0 else onset
+
+
+def fft_length(n):
+    # 补零到 2 的幂，FFT 最快
+    return 1 << max(0, int(n - 1).bit_length())
+
+
+def cross_correlate(reference, other, max_lag=None):
+    """ 返回 (lag, score)：other 的第 0 个点对应 reference 的第 lag 个点（可以为负数或小数）
+
+    输入需要已经归一化，score 为该时移下的相关系数；max_lag 限制搜索范围（点数）
+    """
+    n = fft_length(len(reference) + len(other) - 1)
+    spectrum = np.fft.rfft(reference, n) * np.conj(np.fft.rfft(other, n))
+    correlation = np.fft.irfft(spectrum, n)
+
+    # 下标 k 对应时移 k，超过 reference 长度的部分是负时移
+    lags = np.arange(n)
+    lags[lags >= len(reference)] -= n
+    valid = (lags > -len(other)) & (lags < len(reference))
+    if max_lag is not None:
+        valid &= np.abs(lags) <= max_lag
+    correlation = np.where(valid, correlation, -np.inf)
+
+    peak = int(np.argmax(correlation))
+    score = float(correlation[peak])
+    lag = float(lags[peak])
+    # 抛物线插值得到亚采样点精度
+    left, right = correlation[(peak - 1) % n], correlation[(peak + 1) % n]
+    if np.isfinite(left) and np.isfinite(right):
+        denominator = left - 2 * score + right
+        if denominator < 0:
+            lag += float(0.5 * (left - right) / denominator)
+    return lag, score
+
+
+def align_clips(reference, others, max_offset_ms=None, max_workers=None, progress_callback=None,
+                cancel_event=None, rate=ENVELOPE_RATE):
+    """ 计算 others 中每个文件相对 reference 的偏移
+
+    返回 {路径: (偏移毫秒, 相关系数)}，偏移为该文件开头对应参考文件中的时间，
+    可以直接作为同步引擎的偏移；没有音轨或相关太弱的文件值为 None。
+    progress_callback(已完成数量, 总数)，cancel_event 被设置时抛出 AlignmentCancelled
+    """
+    paths = [reference] + [p for p in others if p != reference]
+    max_workers = max_workers or max(1, min(len(paths), (os.cpu_count() or 2) // 2))
+    envelopes = {}
+    done = 0
+
+    # 解码是主要耗时，每个文件一个 ffmpeg 进程并行提取
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {path: executor.submit(load_envelope, path, rate, cancel_event) for path in paths}
+        try:
+            for path, future in futures.items():
+                envelopes[path] = future.result()
+                done += 1
+                if progress_callback is not None:
+                    progress_callback(done, len(paths))
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            raise
+
+    if envelopes[reference] is None:
+        raise RuntimeError("参考视频没有可用的音轨")
+    reference_onset = onset_strength(envelopes[reference])
+    max_lag = None if max_offset_ms is None else int(max_offset_ms * rate / 1000)
+
+    offsets = {}
+    for path in paths[1:]:
+        if cancel_event is not None and cancel_event.is_set():
+            raise AlignmentCancelled()
+        envelope = envelopes[path]
+        if envelope is None or len(envelope) < 2:
+            offsets[path] = None
+            continue
+        lag, score = cross_correlate(reference_onset, onset_strength(envelope), max_lag)
+        offsets[path] = (int(round(lag * 1000 / rate)), score) if score >= MIN_CONFIDENCE else None
+    return offsets
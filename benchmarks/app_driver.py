@@ -0,0 +1,87 @@
+import time
+
+# 记录进程启动时间，用于测量窗口显示耗时
+START_TIME = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 基准测试驱动：在子进程中启动界面，测量完成后输出 key=value 并退出，由 bench_startup.py / bench_session.py 调用
+#   startup         窗口显示并处理完第一轮事件的耗时，以及启动时是否已经导入了应延迟导入的模块
+#   session 文件    打开会话后网格显示画面、第一个解码器就绪、所有可见解码器就绪的耗时
+# 用法: python benchmarks/app_driver.py startup
+#       python benchmarks/app_driver.py session bench.vcts
+
+DEFERRED_MODULES = ("PyQt6.QtMultimedia", "export_pipeline", "media_probe")
+# 轮询解码器加载状态的间隔（毫秒）
+POLL_INTERVAL_MS = 1
+
+
+def elapsed_ms():
+    return (time.perf_counter() - START_TIME) * 1000
+
+
+def report(key, value):
+    print(f"{key}={value}", flush=True)
+
+
+def run_startup(app):
+    report("startup_window_visible_ms", f"{elapsed_ms():.1f}")
+    modules = [name for name in DEFERRED_MODULES if name in sys.modules]
+    report("startup_deferred_modules_loaded", ",".join(modules) or "none")
+    app.quit()
+
+
+def run_session(app, window, session_path):
+    from PyQt6.QtCore import QTimer
+
+    window.open_session_file(session_path)
+    pending = set(window.session_pending)
+    shown = sum(1 for p in pending if p.thumbnail_path is not None)
+    report("session_grid_ready_ms", f"{elapsed_ms():.1f}")
+    report("session_thumbnails_shown", f"{shown}/{len(pending)}")
+
+    # 打开会话后还在加载的播放器都在 session_pending 中，加载完成时被移除
+    state = {"first": not pending}
+    timer = QTimer(window)
+
+    def poll():
+        if not state["first"] and len(window.session_pending) < len(pending):
+            state["first"] = True
+            report("session_first_loaded_ms", f"{elapsed_ms():.1f}")
+        if window.session_pending:
+            return
+        timer.stop()
+        report("session_all_loaded_ms", f"{elapsed_ms():.1f}")
+        app.quit()
+
+    timer.timeout.connect(poll)
+    timer.start(POLL_INTERVAL_MS)
+    poll()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="界面基准测试驱动")
+    parser.add_argument("scenario", choices=["startup", "session"])
+    parser.add_argument("session", nargs="?", help="session 场景打开的会话文件")
+    args = parser.parse_args()
+    if args.scenario == "session" and not args.session:
+        parser.error("session 场景需要会话文件")
+
+    from PyQt6.QtCore import QTimer
+    from video_comparison_tool import create_application
+
+    app, window = create_application(sys.argv[:1])
+    if args.scenario == "startup":
+        QTimer.singleShot(0, lambda: run_startup(app))
+    else:
+        QTimer.singleShot(0, lambda: run_session(app, window, args.session))
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_pipeline import SinglePassExport, TileCache, TiledExport
+from grid_export import EXPORT_PROFILES
+
+# 对比单次编码导出和并行预缩放导出在 4/9/16 个输入时的耗时，
+# 以及只有一个输入变化、只改布局时利用单元格缓存的增量导出耗时
+# 用法: python benchmarks/bench_export_pipeline.py --duration 10 --counts 4 9 16
+
+
+def make_clip(path, duration, size, rate, pattern):
+    # 用 testsrc 系列滤镜生成合成测试视频
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"{pattern}=size={size}:rate={rate}:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        path,
+    ], check=True)
+
+
+def make_clips(clip_dir, count, duration, size, rate):
+    patterns = ["testsrc", "testsrc2", "smptebars", "rgbtestsrc"]
+    paths = []
+    for i in range(count):
+        path = os.path.join(clip_dir, f"clip_{i:02d}.mp4")
+        if not os.path.exists(path):
+            make_clip(path, duration, size, rate, patterns[i % len(patterns)])
+        paths.append(path)
+    return paths
+
+
+def time_export(job):
+    start = time.perf_counter()
+    job.run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出流水线基准测试")
+    parser.add_argument("--counts", type=int, nargs="+", default=[4, 9, 16])
+    parser.add_argument("--duration", type=int, default=10, help="每个测试视频的秒数")
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None, help="预缩放并行进程数")
+    parser.add_argument("--profile", default="master", choices=sorted(EXPORT_PROFILES), help="导出配置")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="vct_bench_")
+    failures = []
+    try:
+        clips = make_clips(work_dir, max(args.counts), args.duration, args.size, args.rate)
+        duration_ms = args.duration * 1000
+
+        print(f"{'输入数':>6} {'单次编码(s)':>12} {'并行预缩放(s)':>14} {'加速比':>8} {'改一个输入(s)':>14} "
+              f"{'只改布局(s)':>12}")
+        for count in args.counts:
+            paths = clips[:count]
+            per_row = max(1, int(round(count ** 0.5)))
+            single_out = os.path.join(work_dir, f"single_{count}.mp4")
+            tiled_out = os.path.join(work_dir, f"tiled_{count}.mp4")
+
+            single = time_export(SinglePassExport(paths, single_out, per_row, True, duration_ms, profile=args.profile))
+            # 每组使用独立的空缓存，第一次导出不受前一组的影响
+            tile_cache = TileCache(os.path.join(work_dir, f"tiles_{count}"))
+
+            def tiled_job(per_row=per_row, is_zigzag=True):
+                return TiledExport(paths, tiled_out, per_row, is_zigzag, duration_ms, max_workers=args.workers,
+                                   profile=args.profile, tile_cache=tile_cache)
+
+            tiled = time_export(tiled_job())
+            # 修改时间变化后这个输入的单元格失效，其余单元格复用
+            os.utime(paths[0])
+            changed = time_export(tiled_job())
+            # 单元格尺寸与布局无关，只改布局时所有单元格都应复用
+            relayout_job = tiled_job(per_row=max(1, per_row - 1), is_zigzag=False)
+            relayout = time_export(relayout_job)
+            print(f"{count:>6} {single:>12.2f} {tiled:>14.2f} {single / tiled:>7.2f}x {changed:>14.2f} "
+                  f"{relayout:>12.2f}")
+            if relayout_job.cached_tiles != count:
+                failures.append(f"{count} 个输入只改布局时重新缩放了 {count - relayout_job.cached_tiles} 个单元格")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"失败: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_diff import DIFF_MODES, DiffRenderer, FrameSampler
+
+# 差异图渲染基准：测量 1080p 下每种模式每秒能渲染的帧数，并检查循环中是否分配了新内存
+# 只测量 numpy 计算部分，解码和界面显示不计入；另外测量从 NV12 和 BGRA 画面采样到输入缓冲区的耗时
+# 用法: python benchmarks/bench_frame_diff.py --size 1920x1080 --frames 300 --target-fps 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description="差异图渲染基准")
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--target-fps", type=float, default=30.0, help="需要达到的源帧率")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    renderer = DiffRenderer(width, height)
+
+    # 预先生成几帧随机画面轮流使用，B 在 A 的基础上加少量噪声，模拟编码差异
+    rng = np.random.default_rng(0)
+    frames_a = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    frames_b = [np.clip(f.astype(np.int16) + rng.integers(-3, 4, f.shape), 0, 255).astype(np.uint8)
+                for f in frames_a]
+
+    failed = False
+    print(f"{'模式':>10} {'fps':>8} {'每帧(ms)':>9} {'循环内分配(KB)':>14}")
+    for mode in DIFF_MODES:
+        # 预热一次
+        np.copyto(renderer.input_a, frames_a[0])
+        np.copyto(renderer.input_b, frames_b[0])
+        renderer.render(mode)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(args.frames):
+            np.copyto(renderer.input_a, frames_a[i % 4])
+            np.copyto(renderer.input_b, frames_b[i % 4])
+            renderer.render(mode, split=(i % 100) / 100.0)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        fps = args.frames / elapsed
+        print(f"{mode:>10} {fps:8.1f} {elapsed * 1000 / args.frames:9.2f} {peak / 1024:14.1f}")
+        if fps < args.target_fps:
+            failed = True
+
+    # 两路画面都要采样，按两倍计算
+    sampler = FrameSampler(width, height)
+    luma = rng.integers(16, 236, (height, width), dtype=np.uint8)
+    chroma = rng.integers(16, 241, ((height + 1) // 2, width), dtype=np.uint8)
+    bgra = rng.integers(0, 256, (height, width * 4), dtype=np.uint8)
+    sources = {
+        "nv12": lambda out: sampler.sample_yuv(((luma, 1, 0), (chroma, 2, 0), (chroma, 2, 1)), width, height, out),
+        "bgra": lambda out: sampler.sample_rgb(bgra, width, height, 4, (2, 1, 0), out),
+    }
+    for name, sample in sources.items():
+        sample(renderer.input_a)
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(args.frames):
+            sample(renderer.input_a)
+            sample(renderer.input_b)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        fps = args.frames / elapsed
+        print(f"{'采样 ' + name:>10} {fps:8.1f} {elapsed * 1000 / args.frames:9.2f} {peak / 1024:14.1f}")
+
+    if failed:
+        print(f"失败: 有模式未达到 {args.target_fps:.0f} fps")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_source import FrameSource
+from media_probe import probe_file
+
+# 解码帧访问层基准：顺序读取帧率、向前/向后单步延迟和随机访问延迟，无需显示器
+# 用法: python benchmarks/bench_frame_source.py --duration 20 --size 1920x1080
+
+
+def make_clip(path, duration, size, rate, gop):
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-pix_fmt", "yuv420p",
+        path,
+    ], check=True)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解码帧访问层基准")
+    parser.add_argument("--duration", type=int, default=20)
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--gop", type=int, default=60, help="测试视频的关键帧间隔")
+    parser.add_argument("--output-width", type=int, default=640, help="解码输出宽度")
+    parser.add_argument("--memory-mb", type=int, default=64, help="环形缓冲区上限")
+    parser.add_argument("--seeks", type=int, default=20, help="随机访问次数")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="vct_frames_")
+    clip = os.path.join(work_dir, "clip.mp4")
+    make_clip(clip, args.duration, args.size, args.rate, args.gop)
+    info = probe_file(clip)
+    size = (args.output_width, args.output_width * info["height"] // info["width"] // 2 * 2)
+
+    source = FrameSource(clip, info, size, memory_cap=args.memory_mb * 1024 * 1024)
+    try:
+        print(f"输出 {size[0]}x{size[1]}，缓冲区 {source.capacity} 帧")
+
+        # 顺序读取
+        frames = min(300, source.frame_count or 300)
+        _, elapsed = timed(lambda: [source.get_frame(i) for i in range(frames)])
+        print(f"顺序读取: {frames * 1000 / elapsed:.1f} fps")
+
+        # 单步：向前的帧已经预读，向后的帧仍在缓冲区中
+        forward = [timed(lambda i=i: source.get_frame(frames + i))[1] for i in range(10)]
+        backward = [timed(lambda i=i: source.get_frame(frames + 9 - i))[1] for i in range(10)]
+        print(f"向前单步: 中位数 {statistics.median(forward):.2f} ms")
+        print(f"向后单步: 中位数 {statistics.median(backward):.2f} ms")
+
+        # 随机访问：需要通过关键帧重新定位
+        import random
+        rng = random.Random(0)
+        targets = [rng.randrange(0, source.frame_count) for _ in range(args.seeks)]
+        seeks = [timed(lambda t=t: source.get_frame(t))[1] for t in targets]
+        print(f"随机访问: 中位数 {statistics.median(seeks):.1f} ms, 最大 {max(seeks):.1f} ms")
+    finally:
+        source.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
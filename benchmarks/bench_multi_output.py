@@ -0,0 +1,72 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_export_pipeline import make_clips
+
+# 多输出导出基准：母版、网页预览、GIF 和联系表分别导出（每次都重新解码全部输入），
+# 与一个 ffmpeg 进程同时编码全部输出比较总耗时
+# 用法: python benchmarks/bench_multi_output.py --clips 9 --per-row 3 --duration 20
+
+
+def run_job(job_class, clips, output, per_row, profile, targets=None):
+    job = job_class(clips, output, per_row, True, profile=profile, targets=targets)
+    start = time.perf_counter()
+    job.run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多输出导出基准")
+    parser.add_argument("--clips", type=int, default=9)
+    parser.add_argument("--per-row", type=int, default=3)
+    parser.add_argument("--duration", type=int, default=20)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--profile", default="review")
+    parser.add_argument("--mode", choices=["single", "tiled"], default="single")
+    args = parser.parse_args()
+
+    from export_pipeline import EXPORT_MODES
+    from grid_export import TARGET_PRESETS, get_profile, preset_target
+
+    job_class = EXPORT_MODES[args.mode]
+    work_dir = tempfile.mkdtemp(prefix="vct_multi_output_")
+    try:
+        print(f"生成 {args.clips} 个测试视频...")
+        clips = make_clips(work_dir, args.clips, args.duration, args.size, args.rate)
+
+        # 分别导出：每个输出都是一次独立的导出，主输出格式按扩展名决定
+        separate = {"母版": run_job(job_class, clips, os.path.join(work_dir, "separate.mp4"), args.per_row,
+                                  args.profile)}
+        for name in TARGET_PRESETS:
+            target = preset_target(name, os.path.join(work_dir, "separate.mp4"))
+            profile = get_profile(target.get("profile") or args.profile)
+            if target.get("crf"):
+                profile["crf"] = target["crf"]
+            if target.get("width"):
+                # 网页预览单独导出时直接按预览宽度限制网格尺寸
+                profile["max_output"] = (target["width"], profile["max_output"][1])
+            separate[name] = run_job(job_class, clips, target["output"], args.per_row, profile)
+        for name, seconds in separate.items():
+            print(f"  单独导出 {name}: {seconds:.2f} s")
+
+        output = os.path.join(work_dir, "combined.mp4")
+        combined = run_job(job_class, clips, output, args.per_row, args.profile,
+                           [preset_target(name, output) for name in TARGET_PRESETS])
+        total = sum(separate.values())
+        print(f"分别导出合计: {total:.2f} s")
+        print(f"一次导出全部: {combined:.2f} s ({combined / total * 100:.0f}%)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
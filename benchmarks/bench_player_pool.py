@@ -0,0 +1,93 @@
+import argparse
+import os
+import subprocess
+import sys
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 播放器池浸泡测试：反复添加和移除视频，检查内存是否保持平稳
+# 第一轮用于预热（创建播放器、加载解码器插件），之后每轮结束时的内存增长不应超过阈值
+# 用法: python benchmarks/bench_player_pool.py --cycles 20 --videos 16
+# tests/test_player_pool.py 以较少的轮数运行同样的检查
+
+
+def make_clip(path, duration=2):
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=30:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        path,
+    ], check=True)
+
+
+def rss_mb():
+    """ 当前进程的常驻内存（MB），优先使用 psutil """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("无法读取内存占用，请安装 psutil")
+
+
+def process_events(app, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="播放器池添加/移除浸泡测试")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--videos", type=int, default=16, help="每轮添加的视频数")
+    parser.add_argument("--settle", type=float, default=0.5, help="每次添加或移除后处理事件的秒数")
+    parser.add_argument("--max-growth-mb", type=float, default=30.0, help="预热后允许的内存增长")
+    parser.add_argument("--platform", default="offscreen", help="Qt 平台插件，默认无显示器运行")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", args.platform)
+    from PyQt6.QtWidgets import QApplication
+    from video_comparison_tool import VideoComparisonTool
+
+    app = QApplication(sys.argv)
+    window = VideoComparisonTool()
+    window.show()
+
+    work_dir = tempfile.mkdtemp(prefix="vct_pool_")
+    samples = []
+    try:
+        clip = os.path.join(work_dir, "clip.mp4")
+        make_clip(clip)
+
+        for cycle in range(args.cycles):
+            window.add_video_files([clip] * args.videos)
+            process_events(app, args.settle)
+            for player in list(window.players):
+                window.remove_player(player)
+            process_events(app, args.settle)
+            samples.append(rss_mb())
+            print(f"第 {cycle + 1:3d} 轮: {samples[-1]:8.1f} MB  (新建 {window.player_pool.created}, "
+                  f"复用 {window.player_pool.reused}, 空闲 {len(window.player_pool.idle)})")
+    finally:
+        # 先关闭窗口释放解码器，再删除测试视频
+        window.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    growth = samples[-1] - samples[0] if len(samples) > 1 else 0.0
+    print(f"预热后内存增长: {growth:.1f} MB  (阈值 {args.max_growth_mb:.0f} MB)")
+    if growth > args.max_growth_mb:
+        print("失败: 添加/移除循环后内存持续增长")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
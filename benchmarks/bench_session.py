@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 会话打开耗时基准：生成一组测试视频并保存为会话，分别测量没有索引（冷缓存）和有索引时
+# 从启动进程到网格显示画面、第一个解码器就绪、所有可见解码器就绪的时间
+# 用法: python benchmarks/bench_session.py --clips 16 --runs 3
+
+
+def make_clips(directory, count, seconds):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"clip_{i:02d}.mp4")
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+            "-vf", f"hue=h={i * 360 // count}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "60",
+            path,
+        ], check=True)
+        paths.append(path)
+    return paths
+
+
+def session_state(paths):
+    return {
+        "videos": [{"path": path, "muted": False, "offset_ms": 0} for path in paths],
+        "layout": "grid",
+        "videos_per_row": 4,
+        "page_size": len(paths),
+        "current_page": 0,
+        "volume": 50,
+        "mute_all": True,
+        "sync_mode": "proportional",
+        "position": 5000,
+        "export_range": [None, None],
+    }
+
+
+def build_index(session_path, paths):
+    """ 在当前缓存目录中探测并生成缩略图，保存带索引的会话 """
+    from media_probe import ProbeCache
+    from session import save_session
+    from thumbnail_index import build_index as build_thumbnails
+
+    media_info = ProbeCache().probe_many(paths)
+    thumbnails = {path: build_thumbnails(path, info["keyframes"]) for path, info in media_info.items() if info}
+    save_session(session_path, session_state(paths), media_info, thumbnails)
+
+
+def measure_once(entry, session_path, env, timeout):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, entry, "session", session_path], env=env, capture_output=True, text=True,
+                            timeout=timeout)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    values = {}
+    for line in result.stdout.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key.strip()] = value.strip()
+    if "session_all_loaded_ms" not in values:
+        raise RuntimeError(f"打开会话失败:\n{result.stderr.strip()}")
+    return {
+        "grid_ready_ms": float(values["session_grid_ready_ms"]),
+        "first_loaded_ms": float(values.get("session_first_loaded_ms", values["session_all_loaded_ms"])),
+        "all_loaded_ms": float(values["session_all_loaded_ms"]),
+        "thumbnails_shown": values.get("session_thumbnails_shown", ""),
+        "process_wall_ms": wall_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话打开耗时基准")
+    parser.add_argument("--clips", type=int, default=16)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--platform", default="offscreen", help="Qt 平台插件，默认无显示器运行")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    from session import SESSION_EXTENSION, save_session
+
+    work_dir = tempfile.mkdtemp(prefix="vct_session_bench_")
+    entry = os.path.join(ROOT, "benchmarks", "app_driver.py")
+    summary = {"clips": args.clips}
+    try:
+        print(f"生成 {args.clips} 个测试视频...")
+        paths = make_clips(work_dir, args.clips, args.seconds)
+        session_path = os.path.join(work_dir, "bench" + SESSION_EXTENSION)
+
+        for label, with_index in (("没有索引", False), ("有索引", True)):
+            runs = []
+            for _ in range(args.runs):
+                # 每次使用新的缓存目录，没有索引时探测和缩略图都要重新生成
+                cache_dir = tempfile.mkdtemp(prefix="cache_", dir=work_dir)
+                os.environ["XDG_CACHE_HOME"] = os.environ["LOCALAPPDATA"] = cache_dir
+                if with_index:
+                    build_index(session_path, paths)
+                else:
+                    save_session(session_path, session_state(paths))
+                env = dict(os.environ, QT_QPA_PLATFORM=args.platform)
+                runs.append(measure_once(entry, session_path, env, args.timeout))
+
+            result = {key: statistics.median(r[key] for r in runs)
+                      for key in ("grid_ready_ms", "first_loaded_ms", "all_loaded_ms", "process_wall_ms")}
+            summary["indexed" if with_index else "cold"] = dict(result, runs=runs)
+            print(f"{label}: 网格显示 {result['grid_ready_ms']:.0f} ms  第一个解码器 {result['first_loaded_ms']:.0f} ms  "
+                  f"全部解码器 {result['all_loaded_ms']:.0f} ms  缩略图 {runs[-1]['thumbnails_shown']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 启动耗时基准：测量从启动进程到主窗口显示的时间，并检查是否超出预算
+# 界面由 app_driver.py 在子进程中启动；超出预算或启动时加载了应延迟导入的模块时返回非零退出码，可直接用于自动化检查
+# 用法: python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+# tests/test_startup.py 用同样的预算做自动检查
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 窗口显示时间预算（毫秒，从启动进程算起）
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure_once(entry, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, entry, "startup"], env=env, capture_output=True, text=True, timeout=60)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    values = {}
+    for line in result.stdout.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            values[key.strip()] = value.strip()
+    if "startup_window_visible_ms" not in values:
+        raise RuntimeError(f"启动失败:\n{result.stderr.strip()}")
+
+    return {
+        "window_visible_ms": float(values["startup_window_visible_ms"]),
+        "process_wall_ms": wall_ms,
+        "deferred_modules_loaded": [m for m in values.get("startup_deferred_modules_loaded", "none").split(",")
+                                    if m and m != "none"],
+    }
+
+
+def measure(runs, platform="offscreen"):
+    """ 预热一次后启动 runs 次，返回汇总结果；deferred_modules_loaded 为任意一次启动时已经导入的延迟模块 """
+    env = dict(os.environ, QT_QPA_PLATFORM=platform)
+    entry = os.path.join(ROOT, "benchmarks", "app_driver.py")
+
+    # 第一次运行用于预热磁盘缓存和 .pyc，不计入结果
+    measure_once(entry, env)
+    results = [measure_once(entry, env) for _ in range(runs)]
+    return {
+        "runs": results,
+        "median_window_visible_ms": statistics.median(r["window_visible_ms"] for r in results),
+        "median_process_wall_ms": statistics.median(r["process_wall_ms"] for r in results),
+        "deferred_modules_loaded": sorted({m for r in results for m in r["deferred_modules_loaded"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="界面启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="进程启动到窗口显示的预算")
+    parser.add_argument("--platform", default="offscreen", help="Qt 平台插件，默认无显示器运行")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    summary = dict(measure(args.runs, args.platform), budget_ms=args.budget_ms)
+    deferred = summary["deferred_modules_loaded"]
+
+    print(f"窗口显示（进程内）中位数: {summary['median_window_visible_ms']:.1f} ms")
+    print(f"进程总耗时中位数:         {summary['median_process_wall_ms']:.1f} ms  (预算 {args.budget_ms:.0f} ms)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = False
+    if summary["median_process_wall_ms"] > args.budget_ms:
+        print("失败: 启动耗时超出预算")
+        failed = True
+    if deferred:
+        print(f"失败: 启动时加载了应延迟导入的模块: {', '.join(deferred)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_export_pipeline import make_clips
+
+# 性能基准套件：无显示器运行（Qt offscreen），用 ffmpeg testsrc 生成合成视频，测量
+#   load    添加 N 个视频到所有解码器加载完成的时间
+#   seek    sync_players_position 在 N 个播放器上的跳转延迟（到每个播放器收到新位置）
+#   layout  N 个视频时 update_grid_layout 的耗时
+#   export  不同布局下导出的耗时和编码帧率
+# 结果写成 JSON，每个指标带单位和方向；指定 --baseline 时与基准结果比较，变差超过容差时返回非零退出码
+# 用法: python benchmarks/bench_suite.py --output results.json
+#       python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.15
+#       python benchmarks/bench_suite.py --compare results.json baseline.json
+
+GROUPS = ("load", "seek", "layout", "export")
+DEFAULT_COUNTS = [1, 2, 4, 9, 16]
+DEFAULT_LAYOUTS = ["2x2", "3x3", "4x4"]
+# 等待解码器或跳转完成的最长时间
+WAIT_TIMEOUT_S = 30.0
+
+
+def metric(value, unit, lower_is_better=True):
+    return {"value": round(value, 3), "unit": unit, "lower_is_better": lower_is_better}
+
+
+def wait_until(app, condition, timeout=WAIT_TIMEOUT_S):
+    """ 处理事件直到 condition() 成立，返回耗时（秒）；超时返回 None """
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def visible_loaded(window):
+    visible = [p for p in window.players if not p.parked]
+    return bool(visible) and all(p.restore_position is None and p.media_player.duration() > 0 for p in visible)
+
+
+def load_players(app, window, clips):
+    window.clear_players()
+    app.processEvents()
+    start = time.perf_counter()
+    window.add_video_files(clips)
+    if wait_until(app, lambda: visible_loaded(window)) is None:
+        raise RuntimeError(f"{len(clips)} 个视频在 {WAIT_TIMEOUT_S:.0f} 秒内没有加载完成")
+    return time.perf_counter() - start
+
+
+def bench_load(app, window, clips, counts, runs):
+    results = {}
+    for count in counts:
+        times = [load_players(app, window, clips[:count]) for _ in range(runs)]
+        results[f"load/{count}/ms"] = metric(statistics.median(times) * 1000, "ms")
+        print(f"  加载 {count:>2} 个视频: {results[f'load/{count}/ms']['value']:.0f} ms")
+    return results
+
+
+def bench_seek(app, window, clips, counts, seeks):
+    results = {}
+    # 跳转延迟来自播放器的性能统计（setPosition 到第一个新的 positionChanged）
+    window.perf_checkbox.setChecked(True)
+    rng = random.Random(0)
+    try:
+        for count in counts:
+            load_players(app, window, clips[:count])
+            duration = window.sync_engine.clock.duration
+            call_ms, all_ms, timeouts = [], [], 0
+            for player in window.sync_engine.players:
+                player.perf.seek_latencies.clear()
+            for _ in range(seeks):
+                position = rng.randrange(0, max(1, duration - 1000))
+                start = time.perf_counter()
+                window.sync_players_position(position)
+                call_ms.append((time.perf_counter() - start) * 1000)
+                waited = wait_until(app, lambda: all(p.perf.seek_started is None for p in window.sync_engine.players),
+                                    timeout=5.0)
+                if waited is None:
+                    timeouts += 1
+                else:
+                    all_ms.append((time.perf_counter() - start) * 1000)
+                # 两次跳转之间让解码器空闲下来
+                wait_until(app, lambda: False, timeout=0.05)
+            per_player = [latency for p in window.sync_engine.players for latency in p.perf.seek_latencies]
+            results[f"seek/{count}/call_ms"] = metric(statistics.median(call_ms), "ms")
+            results[f"seek/{count}/player_ms"] = metric(statistics.median(per_player) if per_player else 0.0, "ms")
+            results[f"seek/{count}/all_players_ms"] = metric(statistics.median(all_ms) if all_ms else 0.0, "ms")
+            results[f"seek/{count}/timeouts"] = metric(timeouts, "count")
+            print(f"  跳转 {count:>2} 个播放器: 调用 {results[f'seek/{count}/call_ms']['value']:.1f} ms  "
+                  f"单个播放器 {results[f'seek/{count}/player_ms']['value']:.0f} ms  "
+                  f"全部完成 {results[f'seek/{count}/all_players_ms']['value']:.0f} ms  超时 {timeouts}")
+    finally:
+        window.perf_checkbox.setChecked(False)
+    return results
+
+
+def bench_layout(app, window, clips, counts, repeats):
+    results = {}
+    for count in counts:
+        load_players(app, window, clips[:count])
+        times = []
+        for i in range(repeats):
+            # 每行数量在两个值之间切换，每次都有播放器需要移动
+            start = time.perf_counter()
+            window.videos_per_row_spinbox.setValue(3 if i % 2 == 0 else 4)
+            window.grid_layout.activate()
+            times.append((time.perf_counter() - start) * 1000)
+            app.processEvents()
+        results[f"layout/{count}/ms"] = metric(statistics.median(times), "ms")
+        print(f"  布局 {count:>2} 个视频: {results[f'layout/{count}/ms']['value']:.2f} ms")
+    return results
+
+
+def bench_export(clips, layouts, modes, profile, duration, rate, work_dir):
+    from export_pipeline import EXPORT_MODES, TileCache
+
+    results = {}
+    for layout in layouts:
+        columns, _, rows = layout.partition("x")
+        per_row, count = int(columns), int(columns) * int(rows)
+        for mode in modes:
+            output = os.path.join(work_dir, f"export_{mode}_{layout}.mp4")
+            options = {"profile": profile}
+            if mode == "tiled":
+                # 每次使用空的单元格缓存，测量完整的导出
+                options["tile_cache"] = TileCache(tempfile.mkdtemp(prefix="tiles_", dir=work_dir))
+            job = EXPORT_MODES[mode](clips[:count], output, per_row, True, duration * 1000, **options)
+            start = time.perf_counter()
+            job.run()
+            elapsed = time.perf_counter() - start
+            results[f"export/{mode}/{layout}/s"] = metric(elapsed, "s")
+            results[f"export/{mode}/{layout}/fps"] = metric(duration * rate / elapsed, "fps", lower_is_better=False)
+            print(f"  导出 {mode:>9} {layout}: {elapsed:.2f} s  {duration * rate / elapsed:.1f} fps")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ 打印与基准结果的对比，返回变差超过容差的指标列表 """
+    regressions = []
+    print(f"{'指标':<32} {'基准':>10} {'本次':>10} {'变化':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        old, new = previous["value"], current["value"]
+        if old == 0:
+            change = 0.0 if new == 0 else float("inf")
+        else:
+            change = (new - old) / old
+        worse = change > tolerance if current["lower_is_better"] else change < -tolerance
+        flag = "  变差" if worse else ""
+        print(f"{name:<32} {old:>10.2f} {new:>10.2f} {change * 100:>7.1f}%{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def run_suite(args):
+    work_dir = tempfile.mkdtemp(prefix="vct_suite_")
+    # 探测、缩略图和代理缓存放在临时目录，每次运行都从冷缓存开始
+    os.environ["XDG_CACHE_HOME"] = os.environ["LOCALAPPDATA"] = os.path.join(work_dir, "cache")
+    results = {}
+    try:
+        qt_groups = [group for group in ("load", "seek", "layout") if group in args.groups]
+        layouts = args.layouts if "export" in args.groups else []
+        needed = max((args.counts if qt_groups else []) +
+                     [int(c) * int(r) for c, _, r in (layout.partition("x") for layout in layouts)])
+        print(f"生成 {needed} 个测试视频...")
+        clips = make_clips(work_dir, needed, args.duration, args.size, args.rate)
+
+        if qt_groups:
+            os.environ["QT_QPA_PLATFORM"] = args.platform
+            from PyQt6.QtWidgets import QApplication
+            from video_comparison_tool import VideoComparisonTool
+
+            app = QApplication(sys.argv)
+            window = VideoComparisonTool()
+            # 所有视频都在同一页，不会被停放
+            window.page_size_spinbox.setValue(max(args.counts))
+            window.proxy_checkbox.setChecked(False)
+            window.mute_all_button.setChecked(True)
+            window.show()
+            if "load" in qt_groups:
+                print("加载:")
+                results.update(bench_load(app, window, clips, args.counts, args.runs))
+            if "seek" in qt_groups:
+                print("跳转:")
+                results.update(bench_seek(app, window, clips, args.counts, args.seeks))
+            if "layout" in qt_groups:
+                print("布局:")
+                results.update(bench_layout(app, window, clips, args.counts, args.repeats))
+            window.close()
+
+        if "export" in args.groups:
+            print("导出:")
+            results.update(bench_export(clips, layouts, args.modes, args.profile, args.duration, args.rate, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="播放、跳转、布局和导出性能基准套件")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS, help="播放器数量")
+    parser.add_argument("--layouts", nargs="+", default=DEFAULT_LAYOUTS, help="导出布局（列x行）")
+    parser.add_argument("--modes", nargs="+", default=["tiled", "single"], help="导出模式")
+    parser.add_argument("--profile", default="draft", help="导出质量预设")
+    parser.add_argument("--duration", type=int, default=10, help="每个测试视频的秒数")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=3, help="加载测试的重复次数")
+    parser.add_argument("--seeks", type=int, default=10, help="每组跳转次数")
+    parser.add_argument("--repeats", type=int, default=20, help="每组布局次数")
+    parser.add_argument("--platform", default="offscreen", help="Qt 平台插件，默认无显示器运行")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="与这个结果文件比较")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许变差的比例")
+    parser.add_argument("--compare", nargs=2, metavar=("RESULTS", "BASELINE"), help="只比较两个已有的结果文件")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]), args.tolerance)
+        return 1 if regressions else 0
+
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "settings": vars(args), "results": results}, f,
+                      ensure_ascii=False, indent=2)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        if regressions:
+            print(f"失败: {len(regressions)} 个指标变差超过 {args.tolerance * 100:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+
+from export_pipeline import EXPORT_MODES, ExportQueue, create_export_job, export_range
+from grid_export import (DEFAULT_PROFILE, DURATION_POLICIES, EXPORT_PROFILES, OUTPUT_FORMATS, TARGET_PRESETS,
+                         get_profile, preset_target)
+from media_probe import ProbeCache
+from media_scan import is_glob, scan_paths
+from perf_trace import tracer
+
+# 无界面的网格导出命令行，不导入 PyQt6，可在没有显示器的渲染农场上运行
+#
+# 单个任务:
+#   python export_cli.py a.mp4 b.mp4 c.mp4 -o grid.mp4 --per-row 3 --profile draft
+# 批量任务（JSON 或 CSV 清单）:
+#   python export_cli.py --manifest jobs.json --jobs 4
+#
+# JSON 清单为任务列表（或 {"jobs": [...]}），每个任务:
+#   {"inputs": ["a.mp4", "b.mp4"], "output": "grid.mp4", "videos_per_row": 2,
+#    "layout": "zigzag", "profile": "review", "mode": "tiled", "offsets": [0, 1200], "max_size": "3840x2160"}
+# CSV 清单的列名相同，inputs 和 offsets 用分号分隔。相对路径按清单所在目录解析。
+# offsets 为每个输入相对第一个输入的起始偏移（毫秒）；--align-audio 时按音轨自动计算
+# 只导出一段时可以指定 "start"/"end"（秒），"fps" 统一输出帧率，
+# "duration" 为输入时长不同时的输出时长（longest/shortest/reference，reference 为第一个输入）
+# 输入可以是文件夹或通配符（如 renders/**/*.mp4），展开为其中的视频文件，按自然顺序排列
+#
+# 附加输出与主输出共用一次解码和拼接，在同一个 ffmpeg 进程中编码:
+#   --target "preview.mp4,width=960,crf=28" --target grid.gif --also contact
+# 清单中为 "targets": ["grid.gif", {"output": "web.webm", "width": 1280, "crf": 32}]，"also": ["preview", "gif"]
+# 格式按扩展名判断（.gif 动图，.png/.jpg 联系表，.webm 为 VP9），也可以用 format 指定 h264/hevc/vp9/gif/contact
+
+LAYOUTS = ("zigzag", "grid")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="视频对比网格批量导出")
+    parser.add_argument("inputs", nargs="*", help="输入视频文件、文件夹或通配符")
+    parser.add_argument("-o", "--output", help="输出文件路径")
+    parser.add_argument("-m", "--manifest", help="JSON 或 CSV 任务清单")
+    parser.add_argument("--per-row", type=int, default=3, help="每行视频数")
+    parser.add_argument("--layout", choices=LAYOUTS, default="zigzag", help="Z字形布局或普通网格")
+    parser.add_argument("--mode", choices=sorted(EXPORT_MODES), default="tiled", help="导出模式")
+    parser.add_argument("--profile", choices=sorted(EXPORT_PROFILES), default=DEFAULT_PROFILE, help="导出配置")
+    parser.add_argument("--max-size", help="输出分辨率上限，如 3840x2160，默认使用导出配置的上限")
+    parser.add_argument("--start", type=float, help="导出区间的开始时间（秒）")
+    parser.add_argument("--end", type=float, help="导出区间的结束时间（秒）")
+    parser.add_argument("--fps", type=float, help="统一输出帧率，默认使用导出配置的帧率")
+    parser.add_argument("--duration", choices=DURATION_POLICIES, default="longest", help="输入时长不同时的输出时长")
+    parser.add_argument("--target", action="append", default=[],
+                        help="附加输出，如 preview.mp4,width=960,crf=28，可重复")
+    parser.add_argument("--also", nargs="+", choices=sorted(TARGET_PRESETS), default=[],
+                        help="在主输出旁边同时生成的常用附加输出")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="同时运行的导出任务数")
+    parser.add_argument("--no-probe", action="store_true", help="不使用 ffprobe 探测输入")
+    parser.add_argument("--align-audio", action="store_true", help="按音轨互相关自动对齐输入")
+    parser.add_argument("--trace", help="把各阶段耗时写入 Chrome 跟踪文件（JSON）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不显示进度")
+    args = parser.parse_args(argv)
+
+    if not args.manifest and not (args.inputs and args.output):
+        parser.error("需要输入文件和 --output，或者 --manifest")
+    return args
+
+
+def parse_size(value):
+    width, _, height = str(value).lower().partition("x")
+    return int(width), int(height)
+
+
+def resolve_path(path, base_dir):
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
+
+
+def parse_target(value):
+    """ 解析 --target 的值：输出路径后面跟逗号分隔的 key=value """
+    output, *options = str(value).split(",")
+    target = {"output": output.strip()}
+    for option in options:
+        key, sep, option_value = option.partition("=")
+        if not sep:
+            raise ValueError(f"附加输出的参数格式应为 key=value: {option}")
+        target[key.strip()] = option_value.strip()
+    return target
+
+
+def resolve_targets(job, base_dir):
+    """ 合并 targets 和 also，输出路径按 base_dir 解析并检查格式 """
+    targets = []
+    for target in job.get("targets") or []:
+        target = parse_target(target) if isinstance(target, str) else dict(target)
+        if not target.get("output"):
+            raise ValueError("附加输出缺少 output")
+        target["output"] = resolve_path(target["output"], base_dir)
+        targets.append(target)
+    for name in job.get("also") or []:
+        if name not in TARGET_PRESETS:
+            raise ValueError(f"未知的附加输出: {name}")
+        targets.append(preset_target(name, job["output"]))
+    for target in targets:
+        if target.get("format") and target["format"] not in OUTPUT_FORMATS:
+            raise ValueError(f"未知的输出格式: {target['format']}")
+        if target.get("profile") and target["profile"] not in EXPORT_PROFILES:
+            raise ValueError(f"附加输出的导出配置无效: {target['profile']}")
+    if targets and job["mode"] == "segmented":
+        raise ValueError("分段导出不支持附加输出，请使用 tiled 或 single 模式")
+    return targets
+
+
+def expand_inputs(paths):
+    """ 文件夹和通配符展开为其中的视频文件，普通路径保持不变 """
+    inputs = []
+    for path in paths:
+        if is_glob(path) or os.path.isdir(path):
+            inputs.extend(scan_paths([path]))
+        else:
+            inputs.append(os.path.abspath(path))
+    return inputs
+
+
+def load_manifest(manifest_path, defaults):
+    """ 读取任务清单，返回任务字典列表，未指定的字段使用命令行参数的值 """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, "r", encoding="utf-8-sig", newline="") as f:
+            entries = []
+            for row in csv.DictReader(f):
+                row = {k: v for k, v in row.items() if k and v not in (None, "")}
+                row["inputs"] = [p.strip() for p in row.get("inputs", "").split(";") if p.strip()]
+                if "offsets" in row:
+                    row["offsets"] = [v.strip() for v in row["offsets"].split(";")]
+                for key in ("targets", "also"):
+                    if key in row:
+                        row[key] = [v.strip() for v in row[key].split(";") if v.strip()]
+                entries.append(row)
+    else:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries.get("jobs", [])
+
+    jobs = []
+    for i, entry in enumerate(entries):
+        job = dict(defaults)
+        job.update(entry)
+        if not job.get("inputs") or not job.get("output"):
+            raise ValueError(f"清单第 {i + 1} 个任务缺少 inputs 或 output")
+        job["inputs"] = expand_inputs(resolve_path(p, base_dir) for p in job["inputs"])
+        job["output"] = resolve_path(job["output"], base_dir)
+        job["videos_per_row"] = int(job["videos_per_row"])
+        if job.get("offsets") is not None:
+            job["offsets"] = [int(float(v or 0)) for v in job["offsets"]]
+            if len(job["offsets"]) != len(job["inputs"]):
+                raise ValueError(f"清单第 {i + 1} 个任务的 offsets 数量与 inputs 不一致")
+        if job["layout"] not in LAYOUTS:
+            raise ValueError(f"清单第 {i + 1} 个任务的布局无效: {job['layout']}")
+        if job["mode"] not in EXPORT_MODES:
+            raise ValueError(f"清单第 {i + 1} 个任务的导出模式无效: {job['mode']}")
+        if job["profile"] not in EXPORT_PROFILES:
+            raise ValueError(f"清单第 {i + 1} 个任务的导出配置无效: {job['profile']}")
+        if job.get("max_size"):
+            job["max_size"] = parse_size(job["max_size"])
+        for key in ("start", "end", "fps"):
+            job[key] = float(job[key]) if job.get(key) not in (None, "") else None
+        if job["duration"] not in DURATION_POLICIES:
+            raise ValueError(f"清单第 {i + 1} 个任务的时长策略无效: {job['duration']}")
+        try:
+            job["time_range"] = job_time_range(job)
+            job["targets"] = resolve_targets(job, base_dir)
+        except ValueError as e:
+            raise ValueError(f"清单第 {i + 1} 个任务: {e}")
+        jobs.append(job)
+    return jobs
+
+
+def audio_offsets(inputs):
+    """ 以第一个输入为参考计算其余输入的偏移，找不到对齐的输入偏移为 0 """
+    from audio_align import align_clips
+
+    offsets = align_clips(inputs[0], inputs[1:])
+    return [0] + [(offsets.get(path) or (0, 0))[0] for path in inputs[1:]]
+
+
+def job_time_range(spec):
+    """ 任务的 (入点, 出点)（毫秒），没有指定时为 None；出点不晚于入点时抛出 ValueError """
+    if spec.get("start") is None and spec.get("end") is None:
+        return None
+    time_range = (int((spec.get("start") or 0) * 1000),
+                  int(spec["end"] * 1000) if spec.get("end") is not None else None)
+    export_range(time_range, 0)
+    return time_range
+
+
+def build_jobs(args):
+    defaults = {
+        "videos_per_row": args.per_row,
+        "layout": args.layout,
+        "mode": args.mode,
+        "profile": args.profile,
+        "max_size": parse_size(args.max_size) if args.max_size else None,
+        "start": args.start,
+        "end": args.end,
+        "fps": args.fps,
+        "duration": args.duration,
+        "also": args.also,
+    }
+    if args.manifest:
+        return load_manifest(args.manifest, defaults)
+    job = dict(defaults, inputs=expand_inputs(args.inputs), output=os.path.abspath(args.output), targets=args.target)
+    job["time_range"] = job_time_range(job)
+    job["targets"] = resolve_targets(job, os.getcwd())
+    return [job]
+
+
+class ProgressPrinter:
+    """ 在 stderr 上打印每个任务的进度，多个任务时每行一个任务 """
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.names = {}
+        self.last_print = {}
+        self._lock = threading.Lock()
+
+    def started(self, job):
+        with self._lock:
+            self.names[job] = os.path.basename(job.output_path)
+            if not self.quiet:
+                print(f"开始: {self.names[job]}", file=sys.stderr)
+
+    def progress(self, job, stats):
+        if self.quiet:
+            return
+        # 每个任务每秒最多打印一次
+        now = time.monotonic()
+        with self._lock:
+            if now - self.last_print.get(job, 0) < 1.0:
+                return
+            self.last_print[job] = now
+            line = f"  {self.names.get(job, '')}: {stats['stage']} {stats['percent']:5.1f}%"
+            if stats.get("fps"):
+                line += f"  {stats['fps']:.1f} fps  {stats['speed']:.2f}x"
+            print(line, file=sys.stderr)
+
+    def finished(self, job, success, message):
+        with self._lock:
+            name = self.names.get(job, job.output_path)
+            size = f" ({job.output_size[0]}x{job.output_size[1]})" if success and job.output_size else ""
+            print(f"{'完成' if success else '失败'}: {name}{size}" + ("" if success else f"\n  {message}"),
+                  file=sys.stderr)
+            if success and job.targets:
+                print("  附加输出: " + ", ".join(os.path.basename(t["output"]) for t in job.targets), file=sys.stderr)
+            if job.stage_times and not self.quiet:
+                print("  " + "  ".join(f"{stage} {seconds:.1f}s" for stage, seconds in job.stage_times.items()),
+                      file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        jobs = build_jobs(args)
+    except (OSError, ValueError) as e:
+        print(f"无效的导出任务: {e}", file=sys.stderr)
+        return 2
+    for spec in jobs:
+        if not spec["inputs"]:
+            print(f"没有找到输入视频: {spec['output']}", file=sys.stderr)
+            return 2
+
+    if args.trace:
+        tracer.enabled = True
+    probe_cache = None if args.no_probe else ProbeCache()
+    printer = ProgressPrinter(args.quiet)
+    results = []
+    queue = ExportQueue(max_concurrent=max(1, args.jobs), on_started=printer.started,
+                        on_progress=printer.progress,
+                        on_finished=lambda job, ok, msg: (results.append(ok), printer.finished(job, ok, msg)))
+
+    for spec in jobs:
+        offsets = spec.get("offsets")
+        if offsets is None and args.align_audio and len(spec["inputs"]) > 1:
+            try:
+                offsets = audio_offsets(spec["inputs"])
+            except Exception as e:
+                print(f"音频对齐失败，按原始时间导出: {e}", file=sys.stderr)
+        profile = get_profile(spec["profile"])
+        if spec.get("max_size"):
+            profile["max_output"] = spec["max_size"]
+        if spec.get("fps"):
+            profile["fps"] = spec["fps"]
+        queue.add(create_export_job(spec["mode"], spec["inputs"], spec["output"], spec["videos_per_row"],
+                                    spec["layout"] == "zigzag", probe_cache=probe_cache, profile=profile,
+                                    offsets=offsets, time_range=spec["time_range"], duration_policy=spec["duration"],
+                                    targets=spec["targets"]))
+
+    try:
+        queue.wait()
+    except KeyboardInterrupt:
+        queue.cancel_all()
+        queue.wait()
+        return 130
+
+    if args.trace:
+        try:
+            tracer.export(args.trace)
+        except OSError as e:
+            print(f"无法写入跟踪文件: {e}", file=sys.stderr)
+
+    failed = results.count(False)
+    print(f"共 {len(jobs)} 个任务，成功 {len(jobs) - failed} 个，失败 {failed} 个", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,676 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from grid_export import (FFmpegProgressParser, build_export_command, build_grid_filter, encoder_args,
+                         get_profile, grid_output_size, normalize_target, normalized_fps, offset_filter,
+                         output_duration, remove_file, seek_input_args, tile_scale_filter, tile_size_for)
+from media_probe import app_cache_dir, file_key, nearest_keyframe
+from perf_trace import tracer
+
+# 分阶段导出流水线：先并行把每个输入缩放成单元格大小的中间文件，再做一次拼接编码
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def default_tile_workers():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def resolve_inputs(video_paths, videos_per_row, probe_cache, total_duration_ms=0, profile=None, offsets=None,
+                   duration_policy="longest", reference_index=0):
+    """ 返回 (单元格尺寸, 总时长, 输出帧率)
+
+    单元格尺寸由探测到的宽高比和导出配置的输出尺寸上限决定，没有探测缓存时按 16:9 计算；
+    没有给出总时长时按时长策略计算，有对齐偏移时使用各输入在主时间线上的结束时间；
+    导出配置没有指定帧率而输入帧率不一致时，统一到参考输入的帧率
+    """
+    profile = profile or get_profile()
+    infos = []
+    if probe_cache is not None:
+        probed = probe_cache.probe_many(video_paths)
+        infos = [probed.get(path) for path in video_paths]
+    if not total_duration_ms:
+        offsets = offsets or [0] * len(video_paths)
+        end_times = [info["duration_ms"] + offset if info else None for info, offset in zip(infos, offsets)]
+        total_duration_ms = output_duration(end_times, duration_policy, reference_index)
+    fps = profile["fps"] or normalized_fps(infos, reference_index)
+    return tile_size_for(infos, profile), total_duration_ms, fps
+
+
+def export_range(time_range, total_duration_ms):
+    """ 把入点/出点限制在总时长内，返回 (开始, 时长)；没有区间时为整个时长
+
+    限制后区间为空（出点不晚于入点，或入点在结尾之后）时抛出 ValueError，
+    时长 0 表示导出到结尾，不能用来表示空区间
+    """
+    if not time_range:
+        return 0, total_duration_ms
+    start, end = time_range
+    start = max(0, start or 0)
+    if total_duration_ms:
+        end = min(end, total_duration_ms) if end else total_duration_ms
+    if end is not None and end <= start:
+        raise ValueError(f"导出区间为空: 入点 {start / 1000:.3f}s 不早于出点 {end / 1000:.3f}s")
+    return start, end - start if end is not None else 0
+
+
+def build_tile_command(video_path, tile_path, tile_size=None, threads=0, profile=None, offset_ms=0, start_ms=0,
+                       duration_ms=0):
+    """ 把单个输入缩放到单元格大小，使用无损 ultrafast x264 作为快速中间编码
+
+    对齐偏移和导出区间在这一步应用，拼接时各单元格已经在主时间线上
+    """
+    input_args, pad_ms = seek_input_args(video_path, start_ms, duration_ms, offset_ms)
+    scale_filter = offset_filter(pad_ms) + tile_scale_filter(tile_size, profile)
+    duration_args = ["-t", f"{duration_ms / 1000:.3f}"] if duration_ms else []
+    return [
+        "ffmpeg", "-y", "-nostdin",
+        *input_args,
+        "-map", "0:v:0",
+        "-vf", scale_filter,
+        "-c:v", "libx264", "-preset", "ultrafast", "-qp", "0",
+        "-pix_fmt", "yuv420p",
+        "-threads", str(threads),
+        "-an",
+        *duration_args,
+        tile_path,
+    ]
+
+
+class TileCache:
+    """ 预缩放单元格的缓存，按内容寻址
+
+    键由输入文件（路径、大小、修改时间）和完整的预缩放命令组成，缩放尺寸、抽帧、
+    对齐偏移或中间编码设置变化时自动失效；布局（每行数量、Z 字形）不影响单元格，
+    只改布局或只替换一个输入时，其余单元格直接复用。超出大小上限时删除最久没有使用的文件
+    """
+    # 单元格是无损中间文件，体积较大
+    DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or app_cache_dir("export_tiles")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def tile_key(self, video_path, tile_size, profile, offset_ms=0, start_ms=0, duration_ms=0):
+        # 用占位路径生成命令，命令中除路径和线程数以外的部分都参与哈希
+        command = build_tile_command("{input}", "{output}", tile_size, 0, profile, offset_ms, start_ms, duration_ms)
+        settings = {"input": file_key(video_path), "command": command}
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def tile_path(self, key):
+        return os.path.join(self.directory, f"{key}.mkv")
+
+    def temp_path(self, key):
+        # 多个导出任务可能同时生成同一个单元格，各自写入不同的临时文件
+        return os.path.join(self.directory, f"{key}.{os.getpid()}_{threading.get_ident()}.part.mkv")
+
+    def lookup(self, key):
+        """ 返回已缓存的单元格路径并刷新使用时间，没有时返回 None """
+        path = self.tile_path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, temp_path, key):
+        path = self.tile_path(key)
+        os.replace(temp_path, path)
+        return path
+
+    def evict(self, keep=()):
+        """ 超出上限时按最近使用时间删除，keep 中的文件（当前任务的单元格）不删除 """
+        keep = set(keep)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".mkv") or name.endswith(".part.mkv") or path in keep:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries) + sum(os.path.getsize(p) for p in keep if os.path.exists(p))
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            remove_file(path)
+            total -= size
+
+
+class FFmpegRunner:
+    """ 运行 ffmpeg 子进程并支持从其他线程取消 """
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self._lock:
+            for process in list(self._processes):
+                process.kill()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self, ffmpeg_cmd, progress_callback=None, total_duration_ms=0):
+        if self.is_cancelled():
+            raise ExportCancelled()
+
+        # 进度写到 stdout，错误信息写到 stderr
+        cmd = ffmpeg_cmd[:-1] + ["-progress", "pipe:1", "-nostats", ffmpeg_cmd[-1]]
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True, errors="replace")
+        with self._lock:
+            self._processes.add(process)
+
+        # 在单独线程中读取 stderr，避免管道写满导致 ffmpeg 阻塞
+        stderr_tail = []
+        def drain_stderr():
+            for line in process.stderr:
+                if line.strip():
+                    stderr_tail.append(line.rstrip())
+                    del stderr_tail[:-20]
+        stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+        stderr_thread.start()
+
+        try:
+            parser = FFmpegProgressParser(total_duration_ms)
+            for line in process.stdout:
+                stats = parser.feed_line(line)
+                if stats is not None and progress_callback is not None:
+                    progress_callback(stats)
+            process.wait()
+            stderr_thread.join()
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+        if self.is_cancelled():
+            raise ExportCancelled()
+        if process.returncode != 0:
+            raise RuntimeError("\n".join(stderr_tail[-5:]) or f"ffmpeg 退出码 {process.returncode}")
+
+
+class GridExportJob:
+    """ 三种导出方式共用的参数和运行前的输入解析
+
+    offsets 为每个输入的对齐偏移，time_range 为主时间线上的 (入点, 出点)（出点为 None 时到结尾），
+    duration_policy 为输入时长不同时的输出时长（见 grid_export.DURATION_POLICIES），
+    reference_index 为时长策略和帧率统一使用的参考输入，
+    targets 为附加输出（见 grid_export.normalize_target），与主输出共用一次解码和拼接
+    """
+    def __init__(self, video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms=0, probe_cache=None,
+                 profile=None, offsets=None, time_range=None, duration_policy="longest", reference_index=0,
+                 targets=None):
+        self.video_paths = list(video_paths)
+        self.offsets = list(offsets) if offsets and any(offsets) else None
+        self.output_path = output_path
+        self.videos_per_row = videos_per_row
+        self.is_zigzag = is_zigzag
+        self.total_duration_ms = total_duration_ms
+        self.probe_cache = probe_cache
+        self.profile = get_profile(profile)
+        self.time_range = time_range
+        # 出点不晚于入点时创建任务就报错，入点超出结尾要在探测时长后才能发现
+        export_range(time_range, 0)
+        self.duration_policy = duration_policy
+        self.reference_index = reference_index
+        self.targets = [normalize_target(target, self.profile) for target in targets or []]
+        # 以下在运行时确定：导出区间的开始时间、单元格尺寸和输出分辨率
+        self.start_ms = 0
+        self.tile_size = None
+        self.output_size = None
+        self.runner = FFmpegRunner()
+        # 各阶段的耗时（秒），按执行顺序排列
+        self.stage_times = {}
+
+    def cancel(self):
+        self.runner.cancel()
+
+    def output_paths(self):
+        return [self.output_path] + [target["output"] for target in self.targets]
+
+    def remove_outputs(self):
+        for path in self.output_paths():
+            remove_file(path)
+
+    def offset_of(self, index):
+        return self.offsets[index] if self.offsets else 0
+
+    @contextmanager
+    def stage(self, name):
+        """ 记录一个阶段的耗时，开启跟踪时同时写入跟踪事件 """
+        start = time.perf_counter()
+        try:
+            with tracer.span(name, "export", output=os.path.basename(self.output_path)):
+                yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + time.perf_counter() - start
+
+    def resolve(self):
+        """ 确定单元格尺寸、输出帧率和导出区间，之后 total_duration_ms 为导出区间的时长 """
+        with self.stage("解析输入"):
+            self.tile_size, total_duration_ms, self.profile["fps"] = resolve_inputs(
+                self.video_paths, self.videos_per_row, self.probe_cache, self.total_duration_ms, self.profile,
+                self.offsets, self.duration_policy, self.reference_index)
+        self.start_ms, self.total_duration_ms = export_range(self.time_range, total_duration_ms)
+        self.output_size = grid_output_size(self.tile_size, len(self.video_paths), self.videos_per_row,
+                                            self.profile)
+
+
+class SinglePassExport(GridExportJob):
+    """ 原有的单次编码导出：一个 ffmpeg 进程完成全部工作 """
+    def run(self, progress_callback=None):
+        self.resolve()
+        ffmpeg_cmd = build_export_command(self.video_paths, self.output_path, self.videos_per_row, self.is_zigzag,
+                                          tile_size=self.tile_size, profile=self.profile, offsets=self.offsets,
+                                          duration_ms=self.total_duration_ms, start_ms=self.start_ms,
+                                          targets=self.targets)
+
+        def report(stats):
+            if progress_callback is not None:
+                progress_callback(dict(stats, stage="编码"))
+
+        try:
+            with self.stage("编码"):
+                self.runner.run(ffmpeg_cmd, report, self.total_duration_ms)
+        except Exception:
+            self.remove_outputs()
+            raise
+        return self.output_path
+
+
+class TiledExport(GridExportJob):
+    """ 两阶段导出：并行预缩放每个输入，然后一次拼接编码
+
+    第一阶段每个输入一个 ffmpeg 进程，最多同时运行 max_workers 个，
+    解码慢的输入不会再拖住其他输入的缩放。预缩放结果保存在 TileCache 中，
+    再次导出时只重新处理变化了的输入，然后重新拼接。
+    """
+    def __init__(self, video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms=0, max_workers=None,
+                 tile_cache=None, **options):
+        super().__init__(video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms, **options)
+        self.max_workers = max_workers or default_tile_workers()
+        self.tile_cache = tile_cache or TileCache()
+        self.cached_tiles = 0
+
+    def run(self, progress_callback=None):
+        self.resolve()
+        try:
+            with self.stage("预缩放"):
+                tile_paths = self.encode_tiles(progress_callback)
+            with self.stage("拼接编码"):
+                self.stack_tiles(tile_paths, progress_callback)
+        except Exception:
+            self.remove_outputs()
+            raise
+        self.tile_cache.evict(keep=tile_paths)
+        return self.output_path
+
+    def encode_tiles(self, progress_callback=None):
+        keys = [self.tile_cache.tile_key(path, self.tile_size, self.profile, self.offset_of(i), self.start_ms,
+                                         self.total_duration_ms)
+                for i, path in enumerate(self.video_paths)]
+        tile_paths = [self.tile_cache.tile_path(key) for key in keys]
+        # 已缓存的单元格不需要重新缩放；同一个输入出现多次时只处理一次
+        missing = [i for i, key in enumerate(keys) if keys.index(key) == i and self.tile_cache.lookup(key) is None]
+        self.cached_tiles = len(tile_paths) - sum(keys.count(keys[i]) for i in missing)
+        # 每个 ffmpeg 进程分到的线程数，避免超额订阅
+        threads = max(1, (os.cpu_count() or 2) // self.max_workers)
+        done = [self.cached_tiles]
+        lock = threading.Lock()
+
+        def report():
+            if progress_callback is not None:
+                # 第一阶段占总进度的一半
+                progress_callback({"stage": "预缩放", "percent": done[0] * 50.0 / len(tile_paths),
+                                   "fps": 0.0, "speed": 0.0, "eta": None})
+
+        def encode(i):
+            temp_path = self.tile_cache.temp_path(keys[i])
+            try:
+                with tracer.span("tile", "export", input=os.path.basename(self.video_paths[i])):
+                    self.runner.run(build_tile_command(self.video_paths[i], temp_path, self.tile_size, threads,
+                                                       self.profile, self.offset_of(i), self.start_ms,
+                                                       self.total_duration_ms))
+                self.tile_cache.store(temp_path, keys[i])
+            except Exception:
+                remove_file(temp_path)
+                raise
+            with lock:
+                done[0] += keys.count(keys[i])
+            report()
+
+        report()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(encode, i) for i in missing]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            errors = [f.exception() for f in futures if f.done() and f.exception() is not None]
+            if errors:
+                # 任意一个失败时停止其余任务
+                self.runner.cancel()
+
+        if errors:
+            # 优先报告真正的错误，而不是因此被取消的任务
+            real_errors = [e for e in errors if not isinstance(e, ExportCancelled)]
+            raise (real_errors or errors)[0]
+        return tile_paths
+
+    def stack_tiles(self, tile_paths, progress_callback=None):
+        # 输入已经是单元格大小，只需拼接
+        ffmpeg_cmd = build_export_command(tile_paths, self.output_path, self.videos_per_row,
+                                          self.is_zigzag, tile_filter="setsar=1", tile_size=self.tile_size,
+                                          profile=self.profile, duration_ms=self.total_duration_ms,
+                                          targets=self.targets)
+
+        def report(stats):
+            if progress_callback is not None:
+                progress_callback(dict(stats, stage="拼接编码", percent=50.0 + stats["percent"] / 2))
+
+        self.runner.run(ffmpeg_cmd, report, self.total_duration_ms)
+
+
+def plan_segments(total_duration_ms, num_segments, gop_ms=2000, min_segment_ms=10000, keyframes=None):
+    """ 把时间轴切成若干段，分段边界对齐到参考输入的关键帧，
+    没有关键帧索引时对齐到 GOP 的整数倍
+
+    返回 [(start_ms, duration_ms), ...]，最后一段覆盖到结尾
+    """
+    if total_duration_ms <= 0:
+        return []
+    num_segments = max(1, min(num_segments, total_duration_ms // max(1, min_segment_ms)))
+
+    boundaries = [0]
+    for i in range(1, num_segments):
+        boundary = total_duration_ms * i / num_segments
+        if keyframes:
+            boundary = nearest_keyframe(keyframes, boundary)
+        else:
+            boundary = round(boundary / gop_ms) * gop_ms
+        if boundaries[-1] < boundary < total_duration_ms:
+            boundaries.append(boundary)
+    boundaries.append(total_duration_ms)
+    return [(start, end - start) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def build_segment_command(video_paths, segment_path, videos_per_row, is_zigzag, start_ms, duration_ms,
+                          threads=0, tile_size=None, profile=None, offsets=None):
+    """ 对一个时间段运行与完整导出相同的网格滤镜
+
+    有对齐偏移时每个输入从 主时间 - 偏移 处开始读取，
+    分段开头早于输入开头的部分在滤镜中补黑帧
+    """
+    ffmpeg_cmd = ["ffmpeg", "-y", "-nostdin"]
+    pads = []
+    for i, video_path in enumerate(video_paths):
+        args, pad = seek_input_args(video_path, start_ms, duration_ms, offsets[i] if offsets else 0)
+        ffmpeg_cmd.extend(args)
+        pads.append(pad)
+
+    ffmpeg_cmd.extend(["-filter_complex", build_grid_filter(len(video_paths), videos_per_row, is_zigzag,
+                                                            tile_size=tile_size, profile=profile,
+                                                            offsets=pads if any(pads) else None,
+                                                            duration_ms=duration_ms)])
+    ffmpeg_cmd.extend(["-map", "[vout]"])
+    ffmpeg_cmd.extend(encoder_args(profile))
+    # 限制输出时长，空白单元格不会让分段无限延长
+    ffmpeg_cmd.extend(["-t", f"{duration_ms / 1000:.3f}", "-threads", str(threads), segment_path])
+    return ffmpeg_cmd
+
+
+class SegmentedExport(GridExportJob):
+    """ 分段并行导出：按时间切成多段，各段在独立的 ffmpeg 进程中编码，
+    最后用 concat 分离器无损拼接
+
+    分段保存在输出文件旁的 .segments 目录中，只有编码完成的分段才会被重命名为
+    最终文件名，因此中途崩溃后再次导出只会重新编码缺失的分段。
+    """
+    def __init__(self, video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms=0, num_segments=None,
+                 max_workers=None, **options):
+        super().__init__(video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms, **options)
+        if self.targets:
+            # GIF 和联系表无法按分段拼接
+            raise ValueError("分段导出不支持附加输出，请使用并行预缩放或单次编码")
+        self.num_segments = num_segments or (os.cpu_count() or 2)
+        self.max_workers = max_workers or default_tile_workers()
+        self.segment_dir = output_path + ".segments"
+
+    def settings_key(self):
+        # 输入或设置变化时旧分段失效
+        settings = {
+            "inputs": [(p, os.path.getsize(p), os.path.getmtime(p)) for p in self.video_paths],
+            "videos_per_row": self.videos_per_row,
+            "is_zigzag": self.is_zigzag,
+            "start_ms": self.start_ms,
+            "total_duration_ms": self.total_duration_ms,
+            "num_segments": self.num_segments,
+            "offsets": self.offsets,
+            "filter": build_grid_filter(len(self.video_paths), self.videos_per_row, self.is_zigzag,
+                                        tile_size=self.tile_size, profile=self.profile),
+            "encoder": encoder_args(self.profile),
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def prepare_segment_dir(self):
+        manifest_path = os.path.join(self.segment_dir, "manifest.json")
+        key = self.settings_key()
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("key") == key:
+                    return
+        except (OSError, ValueError):
+            pass
+
+        # 设置不同，丢弃旧的分段
+        shutil.rmtree(self.segment_dir, ignore_errors=True)
+        os.makedirs(self.segment_dir, exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key}, f)
+
+    def segment_path(self, index):
+        return os.path.join(self.segment_dir, f"segment_{index:04d}.mp4")
+
+    def run(self, progress_callback=None):
+        self.resolve()
+        if self.total_duration_ms <= 0:
+            raise RuntimeError("分段导出需要已知的视频时长")
+
+        # 分段边界对齐到第一个输入的关键帧，输入端定位更快；关键帧时间换算到导出区间内
+        keyframes = None
+        if self.probe_cache is not None:
+            info = self.probe_cache.get(self.video_paths[0])
+            if info:
+                shift = self.offset_of(0) - self.start_ms
+                keyframes = [k + shift for k in info["keyframes"] if k + shift > 0]
+        segments = [(self.start_ms + start, duration) for start, duration in
+                    plan_segments(self.total_duration_ms, self.num_segments, keyframes=keyframes)]
+        self.prepare_segment_dir()
+
+        # 已完成的分段直接复用
+        missing = [i for i in range(len(segments)) if not os.path.exists(self.segment_path(i))]
+        done_ms = {i: duration for i, (_, duration) in enumerate(segments) if i not in missing}
+        lock = threading.Lock()
+        threads = max(1, (os.cpu_count() or 2) // self.max_workers)
+
+        def report():
+            if progress_callback is None:
+                return
+            with lock:
+                out_time = sum(done_ms.values())
+            # 拼接几乎不耗时，编码阶段占满进度
+            progress_callback({"stage": "分段编码", "percent": min(100.0, out_time * 100.0 / self.total_duration_ms),
+                               "fps": 0.0, "speed": 0.0, "eta": None})
+
+        def encode(i):
+            start_ms, duration_ms = segments[i]
+            part_path = os.path.join(self.segment_dir, f"segment_{i:04d}.part.mp4")
+
+            def segment_progress(stats):
+                with lock:
+                    done_ms[i] = min(duration_ms, stats["out_time_ms"])
+                report()
+
+            try:
+                with tracer.span("segment", "export", index=i, start_ms=start_ms, duration_ms=duration_ms):
+                    self.runner.run(build_segment_command(self.video_paths, part_path, self.videos_per_row,
+                                                          self.is_zigzag, start_ms, duration_ms, threads,
+                                                          self.tile_size, self.profile, self.offsets),
+                                    segment_progress, duration_ms)
+            except Exception:
+                remove_file(part_path)
+                raise
+            os.replace(part_path, self.segment_path(i))
+            with lock:
+                done_ms[i] = duration_ms
+            report()
+
+        report()
+        with self.stage("分段编码"), ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(encode, i) for i in missing]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            errors = [f.exception() for f in futures if f.done() and f.exception() is not None]
+            if errors:
+                self.runner.cancel()
+
+        if errors:
+            real_errors = [e for e in errors if not isinstance(e, ExportCancelled)]
+            raise (real_errors or errors)[0]
+
+        with self.stage("合并分段"):
+            self.concat_segments(len(segments))
+        shutil.rmtree(self.segment_dir, ignore_errors=True)
+        return self.output_path
+
+    def concat_segments(self, count):
+        # concat 分离器 + 流复制，不重新编码
+        list_path = os.path.join(self.segment_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for i in range(count):
+                # 相对路径按列表文件所在目录解析
+                f.write(f"file '{os.path.basename(self.segment_path(i))}'\n")
+
+        try:
+            self.runner.run(["ffmpeg", "-y", "-nostdin", "-f", "concat", "-safe", "0", "-i", list_path,
+                             "-c", "copy", "-movflags", "+faststart", self.output_path])
+        except Exception:
+            remove_file(self.output_path)
+            raise
+
+
+# 导出模式名称与实现类，界面和命令行共用
+EXPORT_MODES = {
+    "tiled": TiledExport,
+    "segmented": SegmentedExport,
+    "single": SinglePassExport,
+}
+
+
+def create_export_job(mode, video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms=0,
+                      probe_cache=None, profile=None, offsets=None, time_range=None, duration_policy="longest",
+                      reference_index=0, targets=None):
+    job_class = EXPORT_MODES.get(mode)
+    if job_class is None:
+        raise ValueError(f"未知的导出模式: {mode}")
+    return job_class(video_paths, output_path, videos_per_row, is_zigzag, total_duration_ms,
+                     probe_cache=probe_cache, profile=profile, offsets=offsets, time_range=time_range,
+                     duration_policy=duration_policy, reference_index=reference_index, targets=targets)
+
+
+class ExportQueue:
+    """ 导出任务队列，最多同时运行 max_concurrent 个任务
+
+    on_started/on_finished 回调在工作线程中调用，界面需要自行切换到主线程。
+    """
+    def __init__(self, max_concurrent=1, on_started=None, on_progress=None, on_finished=None):
+        self.max_concurrent = max_concurrent
+        self.on_started = on_started
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.pending = []
+        self.running = []
+        self._lock = threading.Lock()
+
+    def set_max_concurrent(self, max_concurrent):
+        with self._lock:
+            self.max_concurrent = max(1, max_concurrent)
+        self._start_pending()
+
+    def add(self, job):
+        with self._lock:
+            self.pending.append(job)
+        self._start_pending()
+
+    def cancel(self, job):
+        with self._lock:
+            if job in self.pending:
+                self.pending.remove(job)
+                return
+        job.cancel()
+
+    def cancel_all(self):
+        with self._lock:
+            self.pending.clear()
+            running = list(self.running)
+        for job in running:
+            job.cancel()
+
+    def wait(self):
+        # 等待所有任务结束（命令行和基准测试使用）
+        while True:
+            with self._lock:
+                threads = [job._thread for job in self.running]
+                if not threads and not self.pending:
+                    return
+            if not threads:
+                # 排队中的任务正在启动
+                time.sleep(0.01)
+            for thread in threads:
+                thread.join()
+
+    def _start_pending(self):
+        with self._lock:
+            started = []
+            while self.pending and len(self.running) < self.max_concurrent:
+                job = self.pending.pop(0)
+                job._thread = threading.Thread(target=self._run_job, args=(job,), daemon=True)
+                self.running.append(job)
+                started.append(job)
+        for job in started:
+            job._thread.start()
+
+    def _run_job(self, job):
+        if self.on_started is not None:
+            self.on_started(job)
+
+        def report(stats):
+            if self.on_progress is not None:
+                self.on_progress(job, stats)
+
+        success, message = False, ""
+        try:
+            message = job.run(report)
+            success = True
+        except ExportCancelled:
+            message = "导出已取消"
+        except Exception as e:
+            message = str(e)
+
+        with self._lock:
+            self.running.remove(job)
+        if self.on_finished is not None:
+            self.on_finished(job, success, message)
+        self._start_pending()
@@ -0,0 +1,27 @@
+# 导出配置定义，不依赖其他模块，界面启动时可以直接导入
+
+# 默认单元格宽度，与界面导出保持一致
+TILE_WIDTH = 640
+
+# 导出配置：草稿用于日常快速预览，审阅用于分享，母版用于最终交付
+# tile_width 为单元格宽度，max_output 为输出画面的最大尺寸，视频较多时拼接后的网格整体缩小到这个尺寸以内；
+# fps 为抽帧后的帧率（None 表示保持原帧率），threads 为 0 时由 ffmpeg 自动决定
+EXPORT_PROFILES = {
+    "draft": {"label": "草稿", "preset": "ultrafast", "crf": 30, "tune": "fastdecode",
+              "tile_width": 320, "max_output": (1920, 1080), "fps": 15, "threads": 0},
+    "review": {"label": "审阅", "preset": "veryfast", "crf": 23, "tune": "film",
+               "tile_width": 480, "max_output": (2560, 1440), "fps": 30, "threads": 0},
+    "master": {"label": "母版", "preset": "slow", "crf": 16, "tune": "film",
+               "tile_width": TILE_WIDTH, "max_output": (3840, 2160), "fps": None, "threads": 0},
+}
+DEFAULT_PROFILE = "master"
+
+
+def get_profile(name=None):
+    # 已经解析过的配置（可能修改了部分参数）直接复制
+    if isinstance(name, dict):
+        return dict(name)
+    profile = EXPORT_PROFILES.get(name or DEFAULT_PROFILE)
+    if profile is None:
+        raise ValueError(f"未知的导出配置: {name}")
+    return dict(profile, name=name or DEFAULT_PROFILE)
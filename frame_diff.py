@@ -0,0 +1,163 @@
+import numpy as np
+
+# 两路视频的逐帧差异图：差值、热力图和左右划像
+# 所有缓冲区在创建时一次分配，每帧只在这些缓冲区上原地计算，不产生新的数组
+
+DIFF_MODES = ("difference", "heatmap", "wipe")
+# 差值放大倍数，细小的编码差异也能看清
+DEFAULT_GAIN = 4
+
+
+def heatmap_lut():
+    """ 256 级热力图颜色表（黑-蓝-青-绿-黄-红），形状为 (256, 3) """
+    stops = np.array([
+        [0, 0, 0],
+        [0, 0, 255],
+        [0, 255, 255],
+        [0, 255, 0],
+        [255, 255, 0],
+        [255, 0, 0],
+    ], dtype=np.float32)
+    positions = np.linspace(0, 255, len(stops))
+    levels = np.arange(256)
+    return np.stack([np.interp(levels, positions, stops[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+
+
+class DiffRenderer:
+    """ 固定尺寸的差异图渲染器，输入和输出都是 (高, 宽, 3) 的 RGB uint8 数组
+
+    调用方把两路画面写入 input_a / input_b，再调用 render 取得输出缓冲区
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.input_a = np.zeros((height, width, 3), dtype=np.uint8)
+        self.input_b = np.zeros((height, width, 3), dtype=np.uint8)
+        self.output = np.zeros((height, width, 3), dtype=np.uint8)
+        # 全部在 uint8 上计算：|A - B| = max(A, B) - min(A, B)，不需要转换成更宽的类型
+        self._diff = np.zeros((height, width, 3), dtype=np.uint8)
+        self._low = np.zeros((height, width, 3), dtype=np.uint8)
+        self._level8 = np.zeros((height, width), dtype=np.uint8)
+        # 颜色表索引直接用 intp，np.take 不需要临时转换类型
+        self._level = np.zeros((height, width), dtype=np.intp)
+        self._lut = heatmap_lut()
+
+    def render(self, mode="difference", split=0.5, gain=DEFAULT_GAIN):
+        if mode == "wipe":
+            return self._wipe(split)
+
+        diff = self._diff
+        np.maximum(self.input_a, self.input_b, out=diff)
+        np.minimum(self.input_a, self.input_b, out=self._low)
+        np.subtract(diff, self._low, out=diff)
+
+        # 乘以放大倍数并限制在 255 以内：先把会溢出的值截到 255 // gain，相乘后不会超过 255
+        gain = max(1, int(gain))
+        if gain != 1:
+            np.minimum(diff, 255 // gain, out=diff)
+            np.multiply(diff, gain, out=diff)
+
+        if mode == "heatmap":
+            # 取三个通道中最大的差异作为强度，通过颜色表上色
+            # 逐元素比较比沿长度为 3 的轴做归约快得多
+            np.maximum(diff[..., 0], diff[..., 1], out=self._level8)
+            np.maximum(self._level8, diff[..., 2], out=self._level8)
+            np.copyto(self._level, self._level8)
+            # mode="clip" 时 numpy 直接写入 out，不经过临时缓冲区
+            np.take(self._lut, self._level, axis=0, out=self.output, mode="clip")
+        else:
+            np.copyto(self.output, diff)
+        return self.output
+
+    def _wipe(self, split):
+        # 分割线左边为 A，右边为 B，中间画一条白线
+        column = int(min(max(split, 0.0), 1.0) * self.width)
+        self.output[:, :column] = self.input_a[:, :column]
+        self.output[:, column:] = self.input_b[:, column:]
+        self.output[:, max(0, column - 1):column + 1] = 255
+        return self.output
+
+    def mean_difference(self):
+        """ 最近一次差值或热力图渲染的平均差异（已乘以放大倍数） """
+        return float(self._diff.mean())
+
+
+class FrameSampler:
+    """ 把解码器给出的画面平面最近邻缩放到固定尺寸，写入预先分配的数组
+
+    行列索引和行缓冲区按源平面的尺寸创建一次并缓存，之后每帧只做两次 np.take；
+    YUV 画面的三个平面先采样到输出尺寸，再原地换算成 RGB
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._indices = {}
+        self._y = np.zeros((height, width), dtype=np.uint8)
+        self._u = np.zeros((height, width), dtype=np.uint8)
+        self._v = np.zeros((height, width), dtype=np.uint8)
+        self._c = np.zeros((height, width), dtype=np.int32)
+        self._d = np.zeros((height, width), dtype=np.int32)
+        self._e = np.zeros((height, width), dtype=np.int32)
+        self._t = np.zeros((height, width), dtype=np.int32)
+        self._t2 = np.zeros((height, width), dtype=np.int32)
+
+    def sample(self, plane, src_width, src_height, bpp, offsets, out):
+        """ plane 为 (行数, 行跨度) 的 uint8 数组，每个像素 bpp 字节，取其中 offsets 位置的字节
+
+        out 为 (高, 宽 * len(offsets)) 的 uint8 数组
+        """
+        key = (src_width, src_height, plane.shape[1], bpp, tuple(offsets))
+        entry = self._indices.get(key)
+        if entry is None:
+            rows = (np.arange(self.height) * src_height // self.height).astype(np.intp)
+            columns = np.arange(self.width) * src_width // self.width * bpp
+            columns = (columns[:, None] + np.array(offsets)).reshape(-1).astype(np.intp)
+            entry = (rows, columns, np.zeros((self.height, plane.shape[1]), dtype=np.uint8))
+            self._indices[key] = entry
+        rows, columns, row_buffer = entry
+        # mode="clip" 时 numpy 直接写入 out，不经过临时缓冲区
+        np.take(plane, rows, axis=0, out=row_buffer, mode="clip")
+        np.take(row_buffer, columns, axis=1, out=out, mode="clip")
+
+    def sample_rgb(self, plane, src_width, src_height, bpp, offsets, out):
+        """ 打包的 RGB 类格式，offsets 为 R、G、B 三个字节的位置，out 为 (高, 宽, 3) """
+        self.sample(plane, src_width, src_height, bpp, offsets, out.reshape(self.height, self.width * 3))
+
+    def sample_yuv(self, planes, src_width, src_height, out):
+        """ planes 为 ((Y 平面, bpp, 偏移), (U ...), (V ...))，色度平面为亮度的一半大小（4:2:0） """
+        (y, y_bpp, y_offset), (u, u_bpp, u_offset), (v, v_bpp, v_offset) = planes
+        chroma_width, chroma_height = (src_width + 1) // 2, (src_height + 1) // 2
+        self.sample(y, src_width, src_height, y_bpp, (y_offset,), self._y)
+        self.sample(u, chroma_width, chroma_height, u_bpp, (u_offset,), self._u)
+        self.sample(v, chroma_width, chroma_height, v_bpp, (v_offset,), self._v)
+        self.yuv_to_rgb(out)
+
+    def yuv_to_rgb(self, out):
+        # BT.601 有限范围的整数换算，两路画面用同样的换算，差异图不受色彩标准的影响
+        c, d, e, t, t2 = self._c, self._d, self._e, self._t, self._t2
+        np.subtract(self._y, 16, out=c, dtype=np.int32)
+        np.multiply(c, 298, out=c)
+        np.add(c, 128, out=c)
+        np.subtract(self._u, 128, out=d, dtype=np.int32)
+        np.subtract(self._v, 128, out=e, dtype=np.int32)
+
+        # R = (298C + 409E + 128) >> 8
+        np.multiply(e, 409, out=t)
+        np.add(t, c, out=t)
+        self._store(t, out[..., 0])
+        # G = (298C - 100D - 208E + 128) >> 8
+        np.multiply(d, -100, out=t)
+        np.multiply(e, 208, out=t2)
+        np.subtract(t, t2, out=t)
+        np.add(t, c, out=t)
+        self._store(t, out[..., 1])
+        # B = (298C + 516D + 128) >> 8
+        np.multiply(d, 516, out=t)
+        np.add(t, c, out=t)
+        self._store(t, out[..., 2])
+
+    @staticmethod
+    def _store(value, channel):
+        np.right_shift(value, 8, out=value)
+        np.clip(value, 0, 255, out=value)
+        np.copyto(channel, value, casting="unsafe")
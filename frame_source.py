@@ -0,0 +1,219 @@
+import bisect
+import subprocess
+import threading
+
+import numpy as np
+
+# 解码帧访问层：每个文件一个 ffmpeg 进程，通过管道输出原始帧，直接读入预先分配的环形缓冲区
+# 返回的帧是缓冲区中的 numpy 只读视图，不复制；后台线程向前预读，内存占用不超过设定的上限
+#
+# 第 n 帧固定存放在第 n % 容量 个槽位中。预读只会超前当前帧有限的帧数，
+# 当前帧之前的 keep_behind 帧不会被覆盖，所以向后单步通常不需要重新解码
+
+# 默认每个文件的缓冲区上限
+DEFAULT_MEMORY_CAP = 64 * 1024 * 1024
+CHANNELS = {"rgb24": 3, "gray": 1}
+
+
+def decode_command(path, start_ms, size, fps, pix_fmt):
+    width, height = size
+    # -ss 放在 -i 之前：先跳到前一个关键帧再精确解码到目标时间
+    return [
+        "ffmpeg", "-v", "error", "-nostdin",
+        "-ss", f"{start_ms / 1000.0:.3f}",
+        "-i", path,
+        "-map", "0:v:0",
+        "-vf", f"fps={fps},scale={width}:{height}:flags=bicubic,format={pix_fmt}",
+        "-f", "rawvideo", "-pix_fmt", pix_fmt,
+        "pipe:1",
+    ]
+
+
+class FrameSource:
+    """ 单个文件的解码帧来源
+
+    info 为 media_probe 的探测结果，提供帧率、时长和关键帧索引；size 为输出尺寸。
+    get_frame / get_frames 返回的视图在下一次调用 get_frame、get_frames 或 seek 之前有效
+    """
+    def __init__(self, path, info, size, pix_fmt="rgb24", memory_cap=DEFAULT_MEMORY_CAP):
+        self.path = path
+        self.fps = info.get("fps") or 30.0
+        self.keyframes = info.get("keyframes") or []
+        self.size = size
+        self.pix_fmt = pix_fmt
+        width, height = size
+        channels = CHANNELS[pix_fmt]
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        self.frame_bytes = width * height * channels
+
+        self.capacity = max(4, memory_cap // self.frame_bytes)
+        self.keep_behind = max(1, self.capacity // 4)
+        self.ring = np.zeros((self.capacity,) + shape, dtype=np.uint8)
+        self.slot_frame = [-1] * self.capacity
+        # 先按探测结果估算帧数，解码到结尾后改为实际帧数
+        self.frame_count = int(info.get("duration_ms", 0) * self.fps / 1000) or None
+        self._frame_count_exact = False
+
+        self._cond = threading.Condition()
+        self._process = None
+        self._reading = None
+        self._generation = 0
+        self._next_decode = 0
+        self._current = 0
+        self._eof = False
+        self._closed = False
+        self._worker = threading.Thread(target=self._decode_loop, daemon=True)
+        self._worker.start()
+
+    def frame_time(self, frame):
+        return int(frame * 1000 / self.fps)
+
+    def frame_index(self, position_ms):
+        return max(0, int(round(position_ms * self.fps / 1000)))
+
+    def _view(self, frame, count=1):
+        slot = frame % self.capacity
+        view = self.ring[slot:slot + count]
+        view.flags.writeable = False
+        return view
+
+    def _has_frame(self, frame):
+        return self.slot_frame[frame % self.capacity] == frame
+
+    def _ahead_limit(self):
+        return self.capacity - self.keep_behind
+
+    def _keyframe_between(self, start_ms, end_ms):
+        index = bisect.bisect_right(self.keyframes, start_ms)
+        return index < len(self.keyframes) and self.keyframes[index] <= end_ms
+
+    def _discard(self, process):
+        # 在锁内调用：正在被后台线程读取的进程由后台线程回收
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        if process is not self._reading:
+            self._reap(process)
+
+    def _restart(self, frame):
+        # 在锁内调用：结束当前解码进程，从 frame 开始重新解码
+        self._discard(self._process)
+        self._generation += 1
+        self._next_decode = frame
+        self._eof = False
+        self._process = subprocess.Popen(decode_command(self.path, self.frame_time(frame), self.size, self.fps,
+                                                        self.pix_fmt),
+                                         stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL)
+        self._cond.notify_all()
+
+    def _ensure_decoding(self, frame):
+        """ 在锁内调用：frame 不在缓冲区中时决定继续向前读还是重新定位 """
+        if self._process is not None and self._next_decode <= frame:
+            if self._eof:
+                return
+            # 目标在同一个 GOP 内且距离不远时继续向前读，比重新定位更快
+            if frame - self._next_decode < self._ahead_limit() and \
+                    not self._keyframe_between(self.frame_time(self._next_decode), self.frame_time(frame)):
+                return
+        self._restart(frame)
+
+    def _decode_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._process is None or self._eof or
+                                            self._next_decode - self._current >= self._ahead_limit()):
+                    self._cond.wait()
+                if self._closed:
+                    break
+                process, frame, generation = self._process, self._next_decode, self._generation
+                slot = frame % self.capacity
+                self.slot_frame[slot] = -1
+                self._reading = process
+
+            # 不持有锁时直接把管道数据读进缓冲区槽位
+            buffer = memoryview(self.ring[slot]).cast("B")
+            filled = 0
+            try:
+                while filled < self.frame_bytes:
+                    count = process.stdout.readinto(buffer[filled:])
+                    if not count:
+                        break
+                    filled += count
+            except (OSError, ValueError):
+                filled = 0
+
+            with self._cond:
+                self._reading = None
+                if generation != self._generation or self._closed:
+                    # 读取期间已经重新定位或关闭，丢弃这一帧并回收旧进程
+                    self._reap(process)
+                    continue
+                if filled < self.frame_bytes:
+                    self._eof = True
+                    self.frame_count = frame
+                    self._frame_count_exact = True
+                    self._reap(process)
+                else:
+                    self.slot_frame[slot] = frame
+                    self._next_decode = frame + 1
+                self._cond.notify_all()
+
+    def _reap(self, process):
+        if process.poll() is None:
+            process.kill()
+        if not process.stdout.closed:
+            process.stdout.close()
+        process.wait()
+
+    def get_frames(self, start, count):
+        """ 返回从 start 开始最多 count 个连续帧的视图，遇到环形缓冲区末尾或文件结尾时变短
+
+        已经超出文件结尾时返回 None
+        """
+        with self._cond:
+            start = max(0, start)
+            if self._frame_count_exact:
+                count = min(count, self.frame_count - start)
+            count = min(count, self.capacity - start % self.capacity, self._ahead_limit())
+            if count <= 0:
+                return None
+            self._current = start + count - 1
+
+            while True:
+                missing = next((start + i for i in range(count) if not self._has_frame(start + i)), None)
+                if missing is None:
+                    return self._view(start, count)
+                if self._closed:
+                    return None
+                if self._eof and self._next_decode <= missing:
+                    # 文件在这一批中间结束
+                    count = missing - start
+                    return self._view(start, count) if count > 0 else None
+                self._ensure_decoding(missing)
+                self._cond.notify_all()
+                self._cond.wait()
+
+    def get_frame(self, frame):
+        frames = self.get_frames(frame, 1)
+        return None if frames is None else frames[0]
+
+    def frame_at(self, position_ms):
+        return self.get_frame(self.frame_index(position_ms))
+
+    def seek(self, frame):
+        """ 提前从 frame 开始预读，不等待 """
+        with self._cond:
+            self._current = max(0, frame)
+            if not self._has_frame(self._current):
+                self._ensure_decoding(self._current)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._discard(self._process)
+            self._process = None
+            self._cond.notify_all()
+        self._worker.join(timeout=2)
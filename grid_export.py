@@ -0,0 +1,444 @@
+import os
+
+from export_profiles import DEFAULT_PROFILE, EXPORT_PROFILES, get_profile
+from media_probe import display_aspect
+
+# 不依赖 PyQt6 的网格导出逻辑，供界面、后台导出流水线和基准测试共用
+
+
+# 整个网格四周的黑边宽度
+GRID_MARGIN = 5
+# 输入时长不同时的输出时长：最长的输入、最短的输入或参考输入
+DURATION_POLICIES = ("longest", "shortest", "reference")
+
+# 附加输出的格式：视频编码器、GIF 动图或联系表（一张拼好的缩略图）
+OUTPUT_FORMATS = ("h264", "hevc", "vp9", "gif", "contact")
+# 没有指定格式时按扩展名判断，其余扩展名为 h264
+FORMAT_BY_EXTENSION = {".gif": "gif", ".png": "contact", ".jpg": "contact", ".jpeg": "contact", ".webm": "vp9"}
+# GIF 和联系表没有指定时的默认值
+GIF_FPS = 10
+GIF_WIDTH = 480
+CONTACT_WIDTH = 1920
+CONTACT_GRID = (4, 4)
+# 常用的附加输出，文件名后缀加在主输出文件名（不含扩展名）之后
+TARGET_PRESETS = {
+    "preview": {"suffix": "_preview.mp4", "width": 960, "profile": "review", "crf": 28},
+    "gif": {"suffix": ".gif"},
+    "contact": {"suffix": "_contact.png"},
+}
+# libvpx-vp9 没有 preset，按 x264 preset 选择对应的速度
+VP9_SPEED = {"ultrafast": 5, "superfast": 5, "veryfast": 4, "faster": 3, "fast": 2, "medium": 2, "slow": 1}
+
+
+def filler_size_for(profile):
+    # 没有探测信息时空白单元格按 16:9 计算
+    width = profile["tile_width"]
+    return (width, even(width * 9 / 16))
+
+
+def grid_rows(num_videos, videos_per_row):
+    # 向上取整
+    return (num_videos + videos_per_row - 1) // videos_per_row
+
+
+def grid_cell_index(row, col, videos_per_row, is_zigzag):
+    # 如果使用Z字形布局且是奇数行，则反向排序
+    if is_zigzag and row % 2 == 1:
+        return row * videos_per_row + (videos_per_row - 1 - col)
+    return row * videos_per_row + col
+
+
+def grid_cells(num_videos, videos_per_row, is_zigzag):
+    """ 返回每一行从左到右的视频序号，不足的位置为 None """
+    cells = []
+    for row in range(grid_rows(num_videos, videos_per_row)):
+        row_cells = []
+        for col in range(videos_per_row):
+            idx = grid_cell_index(row, col, videos_per_row, is_zigzag)
+            row_cells.append(idx if idx < num_videos else None)
+        cells.append(row_cells)
+    return cells
+
+
+def even(value):
+    return max(2, int(round(value / 2.0)) * 2)
+
+
+def even_floor(value):
+    # 向下取偶数，保证不超过预算
+    return max(2, int(value) // 2 * 2)
+
+
+def tile_size_for(infos, profile=None):
+    """ 根据探测到的显示宽高比计算统一的单元格尺寸
+
+    单元格宽高比取所有输入的中位数，比例不同的输入在单元格内加黑边，保证每行高度一致；
+    单元格尺寸只取决于输入和配置的 tile_width，与布局无关，只改布局时预缩放的单元格仍然有效
+    """
+    profile = profile or get_profile()
+    aspects = sorted(display_aspect(info) for info in infos if info) or [16 / 9]
+    aspect = aspects[len(aspects) // 2]
+    width = even_floor(profile["tile_width"])
+    return (width, even_floor(width / aspect))
+
+
+def stacked_grid_size(tile_size, num_videos, videos_per_row):
+    """ 拼接后（缩放到输出尺寸上限之前）的网格尺寸 """
+    width, height = tile_size
+    return (width * videos_per_row + 2 * GRID_MARGIN, height * grid_rows(max(1, num_videos), videos_per_row)
+            + 2 * GRID_MARGIN)
+
+
+def grid_output_size(tile_size, num_videos, videos_per_row, profile=None):
+    """ 网格导出的输出分辨率，可以在开始编码前估算编码量
+
+    拼接后的网格超过配置的 max_output 时整体等比缩小
+    """
+    width, height = stacked_grid_size(tile_size, num_videos, videos_per_row)
+    max_width, max_height = (profile or {}).get("max_output") or (0, 0)
+    if not (max_width and max_height) or (width <= max_width and height <= max_height):
+        return (width, height)
+    scale = min(max_width / width, max_height / height)
+    return (even_floor(width * scale), even_floor(height * scale))
+
+
+def tile_fit_filter(tile_size):
+    # 等比缩放到单元格内并居中加黑边
+    width, height = tile_size
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,setsar=1")
+
+
+def tile_scale_filter(tile_size=None, profile=None):
+    """ 单个输入的缩放滤镜，抽帧放在缩放之前以减少缩放的工作量 """
+    profile = profile or get_profile()
+    # 没有单元格尺寸时按 16:9 的单元格加黑边，各输入高度仍然一致
+    scale_filter = tile_fit_filter(tile_size or filler_size_for(profile))
+    if profile["fps"]:
+        scale_filter = f"fps={profile['fps']}," + scale_filter
+    return scale_filter
+
+
+def output_duration(end_times, policy="longest", reference_index=0):
+    """ 按时长策略计算输出时长，end_times 为各输入在主时间线上的结束时间，未知的为 None """
+    known = [t for t in end_times if t]
+    if not known:
+        return 0
+    if policy == "shortest":
+        return min(known)
+    if policy == "reference" and reference_index < len(end_times) and end_times[reference_index]:
+        return end_times[reference_index]
+    return max(known)
+
+
+def normalized_fps(infos, reference_index=0):
+    """ 输入帧率不一致时统一到参考输入的帧率，避免编码器按最高的帧率输出；一致或未知时返回 None """
+    rates = [round(info["fps"], 3) for info in infos if info and info.get("fps")]
+    if len(set(rates)) <= 1:
+        return None
+    reference = infos[reference_index] if reference_index < len(infos) else None
+    return round(reference["fps"], 3) if reference and reference.get("fps") else min(rates)
+
+
+def seek_input_args(video_path, start_ms=0, duration_ms=0, offset_ms=0):
+    """ 一个输入的参数，-ss 放在 -i 之前，只解码需要的时间段
+
+    start_ms 为主时间线上的开始时间，offset_ms 为该输入的对齐偏移。
+    返回 (参数列表, 开头需要补黑帧的毫秒数)：输入开头晚于开始时间时无法定位，改为补黑帧
+    """
+    input_start = start_ms - offset_ms
+    args = []
+    if input_start > 0:
+        args.extend(["-ss", f"{input_start / 1000:.3f}"])
+    if duration_ms:
+        args.extend(["-t", f"{duration_ms / 1000:.3f}"])
+    args.extend(["-i", video_path])
+    return args, max(0, -input_start)
+
+
+def offset_filter(offset_ms):
+    """ 把输入按对齐偏移移到主时间线上，返回需要放在缩放滤镜之前的滤镜（带结尾逗号）
+
+    偏移为正时输入开头对应主时间线上较晚的位置，前面补黑帧；
+    为负时输入开头早于主时间线，裁掉多出的部分并把时间戳归零
+    """
+    if not offset_ms:
+        return ""
+    seconds = abs(offset_ms) / 1000
+    if offset_ms > 0:
+        return f"tpad=start_duration={seconds:.3f}:color=black,"
+    return f"trim=start={seconds:.3f},setpts=PTS-STARTPTS,"
+
+
+def build_grid_filter(num_videos, videos_per_row, is_zigzag, tile_filter=None, tile_size=None, profile=None,
+                      offsets=None, duration_ms=0):
+    """ 构建网格布局的 filter_complex，输出标签为 [vout]
+
+    tile_filter 为每个输入的缩放滤镜，输入已经预先缩放时可传入 "setsar=1"；
+    tile_size 为探测得到的单元格尺寸，未知时按导出配置的单元格宽度缩放；
+    offsets 为每个输入相对主时间线的偏移（毫秒），见 offset_filter；
+    duration_ms 为输出时长，空白单元格与它一样长，未知时空白单元格不限时长
+    """
+    profile = profile or get_profile()
+    if tile_filter is None:
+        tile_filter = tile_scale_filter(tile_size, profile)
+    filler_size = tile_size or filler_size_for(profile)
+
+    filter_complex = []
+    row_stacks = []
+    for row, row_cells in enumerate(grid_cells(num_videos, videos_per_row, is_zigzag)):
+        row_inputs = []
+        for col, idx in enumerate(row_cells):
+            if idx is not None:
+                align = offset_filter(offsets[idx]) if offsets else ""
+                filter_complex.append(f"[{idx}:v]{align}{tile_filter}[v{idx}]")
+                row_inputs.append(f"[v{idx}]")
+            else:
+                # 如果没有够的视频，添加适合分辨率的空白背景
+                label = f"f{row}_{col}"
+                filler_rate = f":r={profile['fps']}" if profile["fps"] else ""
+                filler_duration = f"{duration_ms / 1000:.3f}" if duration_ms else "999999"
+                filter_complex.append(f"color=black:s={filler_size[0]}x{filler_size[1]}{filler_rate}"
+                                      f":d={filler_duration}[{label}]")
+                row_inputs.append(f"[{label}]")
+
+        # 水平合并每一行的视频
+        row_stacks.append(f"{''.join(row_inputs)}hstack=inputs={len(row_inputs)}[row{row}]")
+
+    # 垂直合并所有行
+    rows = len(row_stacks)
+    filter_complex.extend(row_stacks)
+    rows_inputs = ''.join([f"[row{i}]" for i in range(rows)])
+    filter_complex.append(f"{rows_inputs}vstack=inputs={rows}[v]")
+
+    # 为整个视频添加统一小边距，超过输出尺寸上限时整体缩小一次
+    output_filter = f"[v]pad=iw+{2 * GRID_MARGIN}:ih+{2 * GRID_MARGIN}:{GRID_MARGIN}:{GRID_MARGIN}:black"
+    output_size = grid_output_size(filler_size, num_videos, videos_per_row, profile)
+    if output_size != stacked_grid_size(filler_size, num_videos, videos_per_row):
+        output_filter += f",scale={output_size[0]}:{output_size[1]}:flags=lanczos,setsar=1"
+    filter_complex.append(output_filter + "[vout]")
+    return ';'.join(filter_complex)
+
+
+def encoder_args(profile=None):
+    """ 按导出配置生成编码参数，并把配置名写入输出文件的 comment 元数据 """
+    profile = profile or get_profile()
+    args = [
+        "-c:v", "libx264",
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),  # 数值越小质量越高、8-28之间，16已非常高
+        "-pix_fmt", "yuv420p",  # 确保在不同播放器中兼容
+        "-tune", profile["tune"],
+    ]
+    if profile["threads"]:
+        args.extend(["-threads", str(profile["threads"])])
+    args.extend(profile_metadata_args(profile))
+    return args
+
+
+def profile_metadata_args(profile):
+    return ["-metadata", f"comment=VideoComparisonTool export profile={profile['name']} "
+                         f"preset={profile['preset']} crf={profile['crf']}"]
+
+
+def preset_target(name, output_path):
+    """ 按 TARGET_PRESETS 生成主输出旁边的附加输出 """
+    preset = dict(TARGET_PRESETS[name])
+    suffix = preset.pop("suffix")
+    return dict(preset, output=os.path.splitext(output_path)[0] + suffix)
+
+
+def normalize_target(target, profile=None):
+    """ 补全一个附加输出的设置
+
+    target 可以是输出路径，或者包含 output、format、width、profile、crf、fps 的字典；
+    width 为输出宽度（不放大），profile 和 crf 决定编码预设和质量，未指定时使用主输出的配置；
+    联系表可以指定 columns 和 rows
+    """
+    if isinstance(target, str):
+        target = {"output": target}
+    if not target.get("output"):
+        raise ValueError("附加输出缺少 output")
+    extension = os.path.splitext(target["output"])[1].lower()
+    output_format = target.get("format") or FORMAT_BY_EXTENSION.get(extension, "h264")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"未知的输出格式: {output_format}")
+    target_profile = get_profile(target.get("profile") or profile)
+    if target.get("crf") not in (None, ""):
+        target_profile["crf"] = int(target["crf"])
+    return {
+        "output": target["output"],
+        "format": output_format,
+        "width": int(target["width"]) if target.get("width") else None,
+        "fps": float(target["fps"]) if target.get("fps") else None,
+        "profile": target_profile,
+        "columns": int(target.get("columns") or CONTACT_GRID[0]),
+        "rows": int(target.get("rows") or CONTACT_GRID[1]),
+    }
+
+
+def target_filter(index, target, grid_width, duration_ms=0):
+    """ 从 split 的第 index 路 [s{index}] 到输出标签 [out{index}] 的滤镜 """
+    source, label = f"[s{index}]", f"[out{index}]"
+    output_format = target["format"]
+    if output_format == "gif":
+        # 每帧单独生成调色板（stats_mode=single），不需要先缓存整段视频再统一生成
+        width = min(target["width"] or GIF_WIDTH, grid_width)
+        return (f"{source}fps={target['fps'] or GIF_FPS},scale={even(width)}:-2:flags=lanczos,split[g{index}][h{index}];"
+                f"[g{index}]palettegen=stats_mode=single[p{index}];"
+                f"[h{index}][p{index}]paletteuse=new=1:dither=bayer{label}")
+    if output_format == "contact":
+        # 在导出区间内均匀取 columns x rows 帧拼成一张图，时长未知时每 10 秒取一帧
+        count = target["columns"] * target["rows"]
+        rate = f"{count}/{duration_ms / 1000:.3f}" if duration_ms else "1/10"
+        width = even((target["width"] or CONTACT_WIDTH) / target["columns"])
+        return (f"{source}fps={rate},scale={width}:-2,"
+                f"tile={target['columns']}x{target['rows']}:padding=4:color=black{label}")
+
+    filters = []
+    if target["fps"]:
+        filters.append(f"fps={target['fps']}")
+    if target["width"] and target["width"] < grid_width:
+        filters.append(f"scale={even(target['width'])}:-2:flags=lanczos")
+    return f"{source}{','.join(filters) or 'null'}{label}"
+
+
+def target_encoder_args(target):
+    profile = target["profile"]
+    output_format = target["format"]
+    if output_format == "h264":
+        return encoder_args(profile)
+    if output_format == "gif":
+        return ["-loop", "0"]
+    if output_format == "contact":
+        return ["-frames:v", "1", "-update", "1"]
+
+    threads = ["-threads", str(profile["threads"])] if profile["threads"] else []
+    if output_format == "hevc":
+        # hvc1 标签让 QuickTime 和 Safari 也能播放
+        args = ["-c:v", "libx265", "-preset", profile["preset"], "-crf", str(profile["crf"]),
+                "-pix_fmt", "yuv420p", "-tag:v", "hvc1", "-x265-params", "log-level=error"]
+    else:
+        args = ["-c:v", "libvpx-vp9", "-crf", str(profile["crf"]), "-b:v", "0", "-row-mt", "1",
+                "-deadline", "good", "-cpu-used", str(VP9_SPEED.get(profile["preset"], 2)), "-pix_fmt", "yuv420p"]
+    return args + threads + profile_metadata_args(profile)
+
+
+def build_export_command(video_paths, output_path, videos_per_row, is_zigzag, tile_filter=None, tile_size=None,
+                         profile=None, offsets=None, duration_ms=0, start_ms=0, targets=None):
+    """ 单次编码的导出命令：一个 ffmpeg 进程完成解码、缩放、拼接和编码
+
+    start_ms 和 duration_ms 为导出区间（主时间线），各输入按对齐偏移在输入端定位；
+    targets 为附加输出（见 normalize_target），网格只拼接一次，用 split 分给主输出和每个附加输出的编码器
+    """
+    ffmpeg_cmd = ["ffmpeg", "-y"]
+    pads = []
+    for i, video_path in enumerate(video_paths):
+        args, pad = seek_input_args(video_path, start_ms, duration_ms, offsets[i] if offsets else 0)
+        ffmpeg_cmd.extend(args)
+        pads.append(pad)
+
+    filter_complex = build_grid_filter(len(video_paths), videos_per_row, is_zigzag, tile_filter, tile_size, profile,
+                                       pads if any(pads) else None, duration_ms)
+    # 主输出的格式同样按扩展名判断，可以直接导出 GIF、联系表或 WebM
+    main = normalize_target(output_path, profile)
+    outputs = [("[vout]", encoder_args(profile), output_path)]
+    if targets or main["format"] != "h264":
+        all_targets = [main] + list(targets or [])
+        profile = profile or get_profile()
+        grid_width = grid_output_size(tile_size or filler_size_for(profile), len(video_paths), videos_per_row,
+                                      profile)[0]
+        splits = "".join(f"[s{i}]" for i in range(len(all_targets)))
+        filter_complex += f";[vout]split={len(all_targets)}{splits};" + ";".join(
+            target_filter(i, target, grid_width, duration_ms) for i, target in enumerate(all_targets))
+        outputs = [(f"[out{i}]", target_encoder_args(target), target["output"])
+                   for i, target in enumerate(all_targets)]
+
+    ffmpeg_cmd.extend(["-filter_complex", filter_complex])
+    for label, args, path in outputs:
+        ffmpeg_cmd.extend(["-map", label])
+        ffmpeg_cmd.extend(args)
+        if duration_ms:
+            # 按时长策略截断，较长的输入不会让输出变长
+            ffmpeg_cmd.extend(["-t", f"{duration_ms / 1000:.3f}"])
+        ffmpeg_cmd.append(path)
+    return ffmpeg_cmd
+
+
+class FFmpegProgressParser:
+    """ 解析 ffmpeg -progress 输出的 key=value 行，每个进度块结束时返回一次统计 """
+    def __init__(self, total_duration_ms):
+        self.total_duration_ms = total_duration_ms
+        self.values = {}
+
+    def feed_line(self, line):
+        line = line.strip()
+        if "=" not in line:
+            return None
+        key, value = line.split("=", 1)
+        self.values[key.strip()] = value.strip()
+
+        # progress=continue/end 表示一个进度块结束
+        if key.strip() != "progress":
+            return None
+        return self.snapshot()
+
+    def snapshot(self):
+        out_time_ms = self.out_time_ms()
+
+        # speed 形如 "1.23x"，开头阶段可能为 N/A
+        speed = 0.0
+        try:
+            speed = float(self.values.get("speed", "0").rstrip("x"))
+        except ValueError:
+            pass
+
+        fps = 0.0
+        try:
+            fps = float(self.values.get("fps", "0"))
+        except ValueError:
+            pass
+
+        percent = 0.0
+        eta = None
+        if self.total_duration_ms > 0:
+            percent = min(100.0, out_time_ms * 100.0 / self.total_duration_ms)
+            if speed > 0:
+                # 剩余媒体时长 / 编码速度 = 剩余墙钟时间
+                eta = max(0.0, (self.total_duration_ms - out_time_ms) / 1000.0 / speed)
+
+        return {
+            "out_time_ms": out_time_ms,
+            "percent": percent,
+            "fps": fps,
+            "speed": speed,
+            "eta": eta,
+            "frame": int(self.values.get("frame", "0") or 0),
+            "done": self.values.get("progress") == "end",
+        }
+
+    def out_time_ms(self):
+        # ffmpeg 的 out_time_ms 实际单位也是微秒，优先使用 out_time_us
+        for key in ("out_time_us", "out_time_ms"):
+            value = self.values.get(key)
+            if value and value != "N/A":
+                try:
+                    return max(0, int(value) // 1000)
+                except ValueError:
+                    pass
+
+        # 退回到解析 HH:MM:SS.micro 格式
+        value = self.values.get("out_time", "")
+        try:
+            hours, minutes, seconds = value.split(":")
+            return max(0, int((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000))
+        except ValueError:
+            return 0
+
+
+def remove_file(path):
+    try:
+        if os.path.exists(path):
+            os.unlink(path)
+    except OSError as e:
+        print(f"无法删除文件 {path}: {e}")
@@ -0,0 +1,213 @@
+import bisect
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ffprobe 元数据缓存：每个文件只探测一次，结果按 路径+大小+修改时间 保存在磁盘上
+
+
+def app_cache_dir(subdir=""):
+    """ 返回工具的缓存目录，不存在时自动创建 """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "VideoComparisonTool", subdir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def parse_rate(value):
+    # ffprobe 的帧率形如 "30000/1001"
+    try:
+        num, _, den = value.partition("/")
+        num = float(num)
+        den = float(den) if den else 1.0
+        return num / den if den else 0.0
+    except (ValueError, AttributeError):
+        return 0.0
+
+
+def parse_ratio(value):
+    # 像素宽高比形如 "1:1"，未知时为 "0:1" 或 N/A
+    try:
+        num, _, den = value.partition(":")
+        num, den = int(num), int(den)
+        return (num, den) if num > 0 and den > 0 else (1, 1)
+    except (ValueError, AttributeError):
+        return (1, 1)
+
+
+def run_ffprobe(args):
+    result = subprocess.run(["ffprobe", "-v", "error"] + args, stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, errors="replace")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe 退出码 {result.returncode}")
+    return result.stdout
+
+
+def probe_keyframes(path):
+    """ 读取视频流中关键帧的时间（毫秒），只读取数据包不解码 """
+    output = run_ffprobe(["-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+                          "-of", "csv=print_section=0", path])
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(int(float(pts_time) * 1000))
+    keyframes.sort()
+    return keyframes
+
+
+def probe_file(path, with_keyframes=True):
+    """ 用 ffprobe 读取文件的时长、帧率、分辨率、编码、关键帧和音频流信息 """
+    data = json.loads(run_ffprobe(["-show_format", "-show_streams", "-of", "json", path]))
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+
+    duration = 0.0
+    try:
+        duration = float(data.get("format", {}).get("duration", 0))
+    except ValueError:
+        pass
+
+    info = {
+        "path": os.path.abspath(path),
+        "duration_ms": int(duration * 1000),
+        "fps": 0.0,
+        "width": 0,
+        "height": 0,
+        "sar": (1, 1),
+        "codec": "",
+        "keyframes": [],
+        "audio_streams": [],
+    }
+
+    if video is not None:
+        info["fps"] = parse_rate(video.get("avg_frame_rate")) or parse_rate(video.get("r_frame_rate"))
+        info["width"] = int(video.get("width", 0))
+        info["height"] = int(video.get("height", 0))
+        info["sar"] = parse_ratio(video.get("sample_aspect_ratio"))
+        info["codec"] = video.get("codec_name", "")
+        if not info["duration_ms"]:
+            try:
+                info["duration_ms"] = int(float(video.get("duration", 0)) * 1000)
+            except ValueError:
+                pass
+        if with_keyframes:
+            info["keyframes"] = probe_keyframes(path)
+
+    for stream in streams:
+        if stream.get("codec_type") == "audio":
+            info["audio_streams"].append({
+                "index": stream.get("index"),
+                "codec": stream.get("codec_name", ""),
+                "sample_rate": int(stream.get("sample_rate", 0) or 0),
+                "channels": int(stream.get("channels", 0) or 0),
+            })
+    return info
+
+
+def nearest_keyframe(keyframes, position_ms):
+    """ 返回离 position_ms 最近的关键帧时间，没有关键帧索引时原样返回 """
+    index = bisect.bisect_left(keyframes, position_ms)
+    candidates = keyframes[max(0, index - 1):index + 1]
+    return min(candidates, key=lambda k: abs(k - position_ms)) if candidates else position_ms
+
+
+def display_aspect(info):
+    """ 计算显示宽高比，考虑非方形像素 """
+    if not info or not info.get("width") or not info.get("height"):
+        return 16 / 9
+    sar_num, sar_den = info.get("sar") or (1, 1)
+    return info["width"] * sar_num / (info["height"] * sar_den)
+
+
+class ProbeCache:
+    """ 线程安全的探测结果缓存，保存在 JSON 文件中 """
+    def __init__(self, cache_path=None, max_workers=4):
+        self.cache_path = cache_path or os.path.join(app_cache_dir(), "probe_cache.json")
+        self.max_workers = max_workers
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._entries)
+        # 先写临时文件再替换，避免写到一半损坏缓存
+        temp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"无法保存探测缓存: {e}")
+
+    def get(self, path):
+        """ 只读取缓存，不执行探测；文件已变化或未探测时返回 None """
+        try:
+            key = file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            info = self._entries.get(key)
+        if info is not None:
+            info = dict(info, sar=tuple(info["sar"]))
+        return info
+
+    def probe(self, path, save=True):
+        info = self.get(path)
+        if info is not None:
+            return info
+
+        info = probe_file(path)
+        self.put(path, info)
+        if save:
+            self.save()
+        return info
+
+    def put(self, path, info):
+        """ 写入已知的探测结果（例如会话索引中保存的），不保存到磁盘 """
+        with self._lock:
+            # 同一路径的旧记录已经失效
+            abs_path = os.path.abspath(path)
+            for key in [k for k in self._entries if k.rsplit("|", 2)[0] == abs_path]:
+                del self._entries[key]
+            self._entries[file_key(path)] = info
+
+    def probe_many(self, paths, callback=None):
+        """ 并行探测多个文件，返回 {路径: 信息}，探测失败的文件为 None """
+        results = {}
+
+        def probe_one(path):
+            try:
+                info = self.probe(path, save=False)
+            except Exception as e:
+                print(f"探测失败 {path}: {e}")
+                info = None
+            if callback is not None:
+                callback(path, info)
+            return path, info
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for path, info in executor.map(probe_one, paths):
+                results[path] = info
+        self.save()
+        return results
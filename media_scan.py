@@ -0,0 +1,199 @@
+import fnmatch
+import glob
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# 批量添加：展开文件夹和通配符，按文件头识别视频容器，并按文件名把同一内容的不同编码分成对比组
+#
+# 扫描在调用方的工作线程中进行，每找到一批文件就通过 on_batch 回调交出去，界面可以边扫描边显示。
+# 只看扩展名会漏掉没有扩展名或扩展名不标准的渲染输出，也会把还没写完的空文件当成视频，
+# 所以每个候选文件都读取开头几百字节判断容器格式（多个文件并行读取，网络盘上也不会太慢）
+
+VIDEO_EXTENSIONS = frozenset({
+    ".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm", ".m4v", ".mpg", ".mpeg",
+    ".ts", ".m2ts", ".mts", ".3gp", ".y4m",
+})
+# 这些扩展名肯定不是视频，不读取文件头
+SKIP_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".exr", ".dpx", ".webp",
+    ".txt", ".log", ".json", ".csv", ".xml", ".yaml", ".yml", ".md", ".py", ".html",
+    ".wav", ".mp3", ".aac", ".flac", ".srt", ".ass", ".vtt", ".pdf", ".zip", ".part", ".tmp",
+    ".vcts", ".index", ".npy",
+})
+# 读取的文件头长度，MPEG-TS 需要连续三个 188 字节的包才能确认
+SNIFF_BYTES = 512
+# 每批交出的文件数
+BATCH_SIZE = 32
+
+# ISO BMFF（mp4/mov/3gp）开头常见的 box 类型
+MP4_BOXES = (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot", b"uuid")
+ASF_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+
+
+class ScanCancelled(Exception):
+    pass
+
+
+def sniff_container(path):
+    """ 根据文件头判断容器格式，返回格式名；不是视频或无法读取时返回 None """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    if len(head) < 12:
+        return None
+    if head[4:8] in MP4_BOXES:
+        return "mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "matroska"
+    if head.startswith(b"RIFF") and head[8:12] == b"AVI ":
+        return "avi"
+    if head.startswith(b"FLV"):
+        return "flv"
+    if head.startswith(ASF_GUID):
+        return "asf"
+    if head.startswith(b"\x00\x00\x01\xba"):
+        return "mpeg"
+    if head.startswith(b"YUV4MPEG2"):
+        return "y4m"
+    # MPEG-TS 每 188 字节一个以 0x47 开头的包，M2TS 每个包前面多 4 字节时间戳
+    for start, size in ((0, 188), (4, 192)):
+        if len(head) >= start + size * 2 + 1 and all(head[start + size * i] == 0x47 for i in range(3)):
+            return "mpegts"
+    return None
+
+
+def is_video_file(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def is_candidate(path):
+    # 没有扩展名或扩展名未知的文件也要检查文件头
+    return os.path.splitext(path)[1].lower() not in SKIP_EXTENSIONS
+
+
+def is_glob(path):
+    return any(c in path for c in "*?[")
+
+
+def natural_key(text):
+    """ 按数字大小排序，shot2 排在 shot10 前面 """
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", text)]
+
+
+def walk_files(root, recursive=True, name_pattern=None, cancel_event=None):
+    """ 按自然顺序列出目录中的文件，同一目录中文件在子目录之前；跳过隐藏文件和符号链接目录 """
+    stack = [root]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set():
+            raise ScanCancelled()
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted((e for e in it if not e.name.startswith(".")), key=lambda e: natural_key(e.name))
+        except OSError as e:
+            print(f"无法读取目录 {directory}: {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file() and (name_pattern is None or fnmatch.fnmatch(entry.name, name_pattern)):
+                    yield entry.path
+            except OSError:
+                continue
+        if recursive:
+            stack.extend(reversed(subdirs))
+
+
+def iter_candidates(paths, recursive=True, name_pattern=None, cancel_event=None):
+    """ 展开文件、文件夹和通配符，返回 (路径, 是否直接指定的文件) """
+    for path in paths:
+        if is_glob(path):
+            matches = sorted(glob.glob(path, recursive=True), key=natural_key)
+        else:
+            matches = [path]
+        for match in matches:
+            if os.path.isdir(match):
+                for file_path in walk_files(match, recursive, name_pattern, cancel_event):
+                    yield file_path, False
+            elif os.path.isfile(match):
+                yield match, not is_glob(path)
+
+
+def scan_paths(paths, recursive=True, name_pattern=None, on_batch=None, cancel_event=None, max_workers=8,
+               batch_size=BATCH_SIZE):
+    """ 扫描 paths 中的视频文件，返回按发现顺序排列的绝对路径列表
+
+    直接指定的视频扩展名文件不检查文件头，其余候选文件按文件头判断；
+    on_batch(路径列表) 在每批文件确认后调用，cancel_event 被设置时抛出 ScanCancelled
+    """
+    found = []
+    seen = set()
+    batch = []
+
+    def accept(item):
+        path, explicit = item
+        if explicit and is_video_file(path):
+            return path
+        return path if sniff_container(path) is not None else None
+
+    def flush():
+        if cancel_event is not None and cancel_event.is_set():
+            raise ScanCancelled()
+        accepted = [p for p in executor.map(accept, batch) if p is not None]
+        batch.clear()
+        if accepted:
+            found.extend(accepted)
+            if on_batch is not None:
+                on_batch(accepted)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path, explicit in iter_candidates(paths, recursive, name_pattern, cancel_event):
+            path = os.path.abspath(path)
+            if path in seen or not (explicit or is_candidate(path)):
+                continue
+            seen.add(path)
+            batch.append((path, explicit))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return found
+
+
+def group_key(path, pattern=None):
+    """ 对比组的键
+
+    指定 pattern（正则表达式）时在文件名（不含扩展名）中搜索，使用名为 key 的分组、第一个分组或整个匹配；
+    默认去掉文件名最后一段（如 shot010_crf18 -> shot010）
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if pattern is not None:
+        match = re.search(pattern, stem)
+        if match is None:
+            return stem
+        if "key" in match.re.groupindex:
+            return match.group("key")
+        return match.group(1) if match.re.groups else match.group(0)
+    return re.sub(r"[_\-. ]+[^_\-. ]+$", "", stem) or stem
+
+
+def group_files(paths, pattern=None):
+    """ 把文件分成对比组，返回 {组名: [路径]}，按第一次出现的顺序排列
+
+    同一个文件名出现在多个目录中（每个编码器一个输出目录）时按文件名分组，否则按 group_key 分组
+    """
+    stems = {}
+    for path in paths:
+        stems.setdefault(os.path.splitext(os.path.basename(path))[0], set()).add(os.path.dirname(path))
+    per_directory = pattern is None and any(len(dirs) > 1 for dirs in stems.values())
+
+    groups = {}
+    for path in paths:
+        key = os.path.splitext(os.path.basename(path))[0] if per_directory else group_key(path, pattern)
+        groups.setdefault(key, []).append(path)
+    return groups
@@ -0,0 +1,204 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 性能跟踪：记录解码、跳转、界面刷新和导出各阶段的耗时，导出为 Chrome 跟踪格式（chrome://tracing 或
+# Perfetto 直接打开），可以附在问题报告中
+#
+# 关闭时所有记录函数直接返回，不影响正常播放；事件保存在有上限的队列中，长时间开启也不会无限增长。
+# 设置环境变量 VCT_TRACE=文件路径 时启动即开启，退出时写入该文件
+
+# 最多保留的事件数，超出后丢弃最早的
+MAX_EVENTS = 200000
+# 跳转超过这个时间仍没有新位置时不再计入延迟（例如跳转后被停放）
+SEEK_TIMEOUT_S = 10.0
+
+
+class TraceRecorder:
+    """ 线程安全的事件记录器，时间戳为微秒，从创建时开始计算 """
+    def __init__(self, enabled=False, max_events=MAX_EVENTS):
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self._thread_names = {}
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def complete(self, name, start_us, duration_us, cat="", **args):
+        """ 记录一段已经结束的耗时 """
+        if not self.enabled:
+            return
+        self.events.append({"name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": duration_us,
+                            "pid": self.pid, "tid": self._tid(), "args": args})
+
+    @contextmanager
+    def span(self, name, cat="", **args):
+        if not self.enabled:
+            yield
+            return
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, start, self.now_us() - start, cat, **args)
+
+    def counter(self, name, cat="", **values):
+        """ 计数器，在跟踪视图中显示为曲线 """
+        if not self.enabled:
+            return
+        self.events.append({"name": name, "cat": cat, "ph": "C", "ts": self.now_us(), "pid": self.pid,
+                            "tid": self._tid(), "args": values})
+
+    def instant(self, name, cat="", **args):
+        if not self.enabled:
+            return
+        self.events.append({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self.now_us(), "pid": self.pid,
+                            "tid": self._tid(), "args": args})
+
+    def clear(self):
+        self.events.clear()
+
+    def to_json(self):
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "VideoComparisonTool"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                     for tid, name in list(self._thread_names.items())]
+        return {"traceEvents": metadata + list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        data = self.to_json()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return len(data["traceEvents"])
+
+
+# 全局记录器，界面、同步引擎和导出流水线共用
+tracer = TraceRecorder(enabled=bool(os.environ.get("VCT_TRACE")))
+
+
+def traced(cat):
+    """ 装饰器：开启跟踪时记录每次调用的耗时 """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(func.__qualname__, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PlayerPerfStats:
+    """ 单个播放器的解码帧、丢帧和跳转延迟统计
+
+    丢帧根据相邻两帧的时间戳判断：间隔超过一帧半时，中间缺少的帧计为丢帧；
+    跳转延迟为调用 setPosition 到收到第一个新的 positionChanged 之间的时间
+    """
+    def __init__(self, name):
+        self.name = name
+        self.decoded = 0
+        self.dropped = 0
+        self.last_timestamp = None
+        self.frame_duration = None
+        self.seek_started = None
+        self.seek_latencies = deque(maxlen=32)
+        # 上一次 snapshot 时的计数，用于计算每秒的值
+        self._snapshot_time = time.perf_counter()
+        self._snapshot_decoded = 0
+        self._snapshot_dropped = 0
+
+    def frame(self, start_us, end_us=-1):
+        """ 收到一帧，start_us/end_us 为帧的媒体时间（微秒），未知时为 -1 """
+        self.decoded += 1
+        if end_us > start_us >= 0:
+            self.frame_duration = end_us - start_us
+        if start_us < 0:
+            return
+        last, self.last_timestamp = self.last_timestamp, start_us
+        if last is None or not self.frame_duration:
+            return
+        gap = start_us - last
+        # 时间戳倒退或间隔超过一秒是跳转造成的，不计为丢帧
+        if self.frame_duration * 1.5 < gap < 1e6:
+            self.dropped += int(round(gap / self.frame_duration)) - 1
+
+    def seek(self, target):
+        self.seek_started = (time.perf_counter(), target)
+        # 跳转前后的帧不连续
+        self.last_timestamp = None
+
+    def position_changed(self, position):
+        """ 返回本次跳转的延迟（毫秒），没有进行中的跳转时返回 None """
+        if self.seek_started is None:
+            return None
+        started, target = self.seek_started
+        self.seek_started = None
+        now = time.perf_counter()
+        if now - started > SEEK_TIMEOUT_S:
+            return None
+        latency_ms = (now - started) * 1000
+        self.seek_latencies.append(latency_ms)
+        tracer.complete(f"seek {self.name}", (started - tracer.origin) * 1e6, (now - started) * 1e6, "seek",
+                        target=target, position=position)
+        return latency_ms
+
+    def snapshot(self):
+        """ 返回自上次调用以来的每秒解码帧数、丢帧数，以及累计值和最近的跳转延迟 """
+        now = time.perf_counter()
+        elapsed = max(1e-6, now - self._snapshot_time)
+        result = {
+            "fps": (self.decoded - self._snapshot_decoded) / elapsed,
+            "dropped": self.dropped - self._snapshot_dropped,
+            "decoded_total": self.decoded,
+            "dropped_total": self.dropped,
+            "seek_ms": self.seek_latencies[-1] if self.seek_latencies else None,
+            "seek_avg_ms": sum(self.seek_latencies) / len(self.seek_latencies) if self.seek_latencies else None,
+        }
+        self._snapshot_time = now
+        self._snapshot_decoded = self.decoded
+        self._snapshot_dropped = self.dropped
+        return result
+
+
+class LoopLagMonitor:
+    """ 事件循环延迟：定时器按固定间隔触发，实际间隔比预期多出的部分即为事件循环被占用的时间 """
+    def __init__(self, interval_ms):
+        self.interval_ms = interval_ms
+        self.last = None
+        self.max_lag_ms = 0.0
+        self.total_lag_ms = 0.0
+        self.ticks = 0
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.last is not None:
+            lag = max(0.0, (now - self.last) * 1000 - self.interval_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            self.total_lag_ms += lag
+            self.ticks += 1
+        self.last = now
+
+    def snapshot(self):
+        """ 返回 (平均延迟, 最大延迟) 并重新开始统计 """
+        result = (self.total_lag_ms / self.ticks if self.ticks else 0.0, self.max_lag_ms)
+        self.max_lag_ms = self.total_lag_ms = 0.0
+        self.ticks = 0
+        return result
+
+    def reset(self):
+        self.last = None
+        self.snapshot()
@@ -0,0 +1,163 @@
+import math
+import time
+
+# 主时钟同步播放：所有播放器都以同一个时间基准为准，定期测量每个播放器的漂移并纠正
+# 本模块不依赖 PyQt6，界面层负责读取播放器位置并执行纠正动作
+
+SYNC_PROPORTIONAL = "proportional"
+SYNC_ABSOLUTE = "absolute"
+
+# 超过这么多帧的漂移直接跳转纠正，较小的漂移通过微调播放速率追赶
+SEEK_THRESHOLD_FRAMES = 4
+# 小于这么多帧的漂移不做处理，避免来回抖动
+DEADBAND_FRAMES = 0.5
+# 速率微调的上下限
+MAX_RATE_ADJUST = 0.05
+# 漂移在这段时间内被纠正到零所需的速率
+RATE_CORRECTION_WINDOW_MS = 1000
+DEFAULT_FPS = 30.0
+
+
+class MasterClock:
+    """ 单一时间基准，暂停时停在当前位置，播放时按单调时钟前进 """
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._base_position = 0.0
+        self._base_time = None
+        self.duration = 0
+
+    def is_running(self):
+        return self._base_time is not None
+
+    def position(self):
+        if self._base_time is None:
+            return self._base_position
+        position = self._base_position + (self._clock() - self._base_time) * 1000.0
+        if self.duration > 0:
+            position = min(position, float(self.duration))
+        return position
+
+    def start(self):
+        if self._base_time is None:
+            self._base_time = self._clock()
+
+    def pause(self):
+        self._base_position = self.position()
+        self._base_time = None
+
+    def seek(self, position):
+        self._base_position = float(max(0, position))
+        if self._base_time is not None:
+            self._base_time = self._clock()
+
+    def at_end(self):
+        return self.duration > 0 and self.position() >= self.duration
+
+
+def target_position(master_ms, master_duration, player_duration, mode, offset_ms=0):
+    """ 计算某个播放器在主时钟为 master_ms 时应处的位置
+
+    比例模式按时长比例映射（与原来的进度条行为一致），绝对时间模式让所有视频
+    比较同一时间戳；offset_ms 为该视频相对主时间线的起始偏移
+    """
+    if player_duration <= 0:
+        return 0
+    if mode == SYNC_PROPORTIONAL and master_duration > 0:
+        position = master_ms / master_duration * player_duration
+    else:
+        position = master_ms - offset_ms
+    return int(min(max(0, position), player_duration))
+
+
+def master_position_for(player_ms, master_duration, player_duration, mode, offset_ms=0):
+    """ target_position 的逆运算：播放器位于 player_ms 时主时钟应处的位置 """
+    if mode == SYNC_PROPORTIONAL and master_duration > 0 and player_duration > 0:
+        return int(player_ms / player_duration * master_duration)
+    return int(max(0, player_ms + offset_ms))
+
+
+def frame_ms(fps):
+    return 1000.0 / (fps if fps and fps > 0 else DEFAULT_FPS)
+
+
+def anchor_offset(master_ms, master_duration, player_duration, mode, offset_ms=0):
+    """ 跳转时计算播放器相对主时钟的偏移，播放过程中目标位置 = 主时钟 - 偏移
+
+    比例模式只在跳转时按比例定位，之后所有视频以相同速度前进，与原来的行为一致
+    """
+    return master_ms - target_position(master_ms, master_duration, player_duration, mode, offset_ms)
+
+
+def plan_correction(drift_ms, fps):
+    """ 根据漂移决定纠正方式，返回 ("seek", None) / ("rate", 速率) / ("none", 1.0)
+
+    drift_ms 为正表示播放器超前于主时钟
+    """
+    frame = frame_ms(fps)
+    if abs(drift_ms) >= SEEK_THRESHOLD_FRAMES * frame:
+        return "seek", None
+    if abs(drift_ms) <= DEADBAND_FRAMES * frame:
+        return "none", 1.0
+
+    # 在纠正窗口内追上漂移，超前时减速，落后时加速
+    adjust = -drift_ms / RATE_CORRECTION_WINDOW_MS
+    adjust = max(-MAX_RATE_ADJUST, min(MAX_RATE_ADJUST, adjust))
+    return "rate", 1.0 + adjust
+
+
+class DriftStats:
+    """ 记录每个播放器的漂移样本，统计是否保持在一帧以内 """
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self.players = {}
+
+    def reset(self):
+        self.players.clear()
+
+    def record(self, player_id, name, drift_ms, fps, action):
+        entry = self.players.setdefault(player_id, {
+            "name": name, "fps": fps, "samples": [], "seeks": 0, "rate_adjustments": 0,
+        })
+        entry["name"] = name
+        entry["fps"] = fps
+        entry["samples"].append(round(drift_ms, 2))
+        # 只保留最近的样本，长时间播放时内存有界
+        if len(entry["samples"]) > self.max_samples:
+            del entry["samples"][:len(entry["samples"]) - self.max_samples]
+        if action == "seek":
+            entry["seeks"] += 1
+        elif action == "rate":
+            entry["rate_adjustments"] += 1
+
+    def summary(self):
+        result = []
+        for player_id, entry in sorted(self.players.items()):
+            samples = entry["samples"]
+            if not samples:
+                continue
+            abs_samples = sorted(abs(s) for s in samples)
+            frame = frame_ms(entry["fps"])
+            p95 = abs_samples[min(len(abs_samples) - 1, int(math.ceil(len(abs_samples) * 0.95)) - 1)]
+            result.append({
+                "player": player_id,
+                "name": entry["name"],
+                "fps": entry["fps"],
+                "samples": len(samples),
+                "mean_drift_ms": round(sum(samples) / len(samples), 2),
+                "max_abs_drift_ms": abs_samples[-1],
+                "p95_abs_drift_ms": p95,
+                "frame_ms": round(frame, 2),
+                "within_one_frame": round(sum(1 for s in abs_samples if s <= frame) / len(samples), 4),
+                "seeks": entry["seeks"],
+                "rate_adjustments": entry["rate_adjustments"],
+            })
+        return result
+
+    def export_json(self, path, include_samples=False):
+        import json
+
+        data = {"summary": self.summary()}
+        if include_samples:
+            data["samples"] = {str(k): v["samples"] for k, v in self.players.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
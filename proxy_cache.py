@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from export_pipeline import ExportCancelled, FFmpegRunner
+from grid_export import remove_file
+from media_probe import app_cache_dir, file_key
+
+# 低分辨率代理文件：网格中每个单元格只有几百像素高，播放原始 4K 文件浪费大部分解码
+# 代理按单元格高度分档生成，关键帧间隔很短且没有 B 帧，跳转和多路解码都更轻
+# 代理保存在有大小上限的缓存目录中，超出上限时删除最久没有使用的文件
+
+# 代理高度分档，单元格高度向上取整到最近的一档
+PROXY_HEIGHTS = (270, 360, 540, 720, 1080)
+# 缓存目录大小上限
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+# 关键帧间隔（帧），越小跳转越快，文件越大
+PROXY_GOP = 10
+# 生成失败后多久才重新尝试（秒），避免每次布局变化都对同一个文件重新运行 ffmpeg
+RETRY_AFTER_S = 60
+
+
+def proxy_height_for(tile_height, source_height):
+    """ 返回适合单元格高度的代理档位，原始文件已经不比代理大时返回 None """
+    height = next((h for h in PROXY_HEIGHTS if h >= tile_height), PROXY_HEIGHTS[-1])
+    if source_height and source_height <= height:
+        return None
+    return height
+
+
+def build_proxy_command(path, output_path, height):
+    return [
+        "ffmpeg", "-y", "-nostdin",
+        "-i", path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", f"scale=-2:{height}",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-crf", "23",
+        "-tune", "fastdecode",
+        "-g", str(PROXY_GOP),
+        "-bf", "0",
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        output_path,
+    ]
+
+
+class ProxyCache:
+    """ 代理文件缓存，后台并行转码，按最近使用时间淘汰 """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, max_workers=2):
+        self.directory = directory or app_cache_dir("proxies")
+        self.max_bytes = max_bytes
+        self.runner = FFmpegRunner()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}
+        self._failed = {}
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def proxy_path(self, path, height):
+        key = hashlib.sha1(file_key(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}_{height}p.mp4")
+
+    def lookup(self, path, height):
+        """ 返回已生成的代理路径并刷新使用时间，没有时返回 None """
+        try:
+            proxy = self.proxy_path(path, height)
+        except OSError:
+            return None
+        if not os.path.exists(proxy):
+            return None
+        try:
+            os.utime(proxy)
+        except OSError:
+            pass
+        return proxy
+
+    def set_in_use(self, paths):
+        # 正在播放的代理不会被淘汰
+        with self._lock:
+            self._in_use = set(paths)
+
+    def request(self, path, height, callback):
+        """ 在后台生成代理，完成后调用 callback(原始路径, 高度, 代理路径或 None)
+
+        最近生成失败过的代理在 RETRY_AFTER_S 秒内不再重试，直接以 None 回调
+        """
+        proxy = self.lookup(path, height)
+        if proxy is not None:
+            callback(path, height, proxy)
+            return
+
+        with self._lock:
+            key = (os.path.abspath(path), height)
+            failed_at = self._failed.get(key)
+            retry = failed_at is None or time.monotonic() - failed_at >= RETRY_AFTER_S
+        if not retry:
+            callback(path, height, None)
+            return
+
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].append(callback)
+                return
+            self._pending[key] = [callback]
+        self._executor.submit(self._build, path, height, key)
+
+    def _build(self, path, height, key):
+        proxy = temp_path = None
+        failed = False
+        try:
+            proxy = self.proxy_path(path, height)
+            temp_path = proxy + ".part"
+            self.runner.run(build_proxy_command(path, temp_path, height))
+            os.replace(temp_path, proxy)
+            self.evict()
+        except Exception as e:
+            # 取消不算失败，下次需要时立即重新生成
+            failed = not isinstance(e, ExportCancelled)
+            if failed:
+                print(f"生成代理失败 {path}: {e}")
+            if temp_path is not None:
+                remove_file(temp_path)
+            proxy = None
+
+        with self._lock:
+            if failed:
+                self._failed[key] = time.monotonic()
+            else:
+                self._failed.pop(key, None)
+            callbacks = self._pending.pop(key, [])
+        for callback in callbacks:
+            callback(path, height, proxy)
+
+    def evict(self):
+        """ 缓存超出上限时按最近使用时间删除旧的代理 """
+        entries = []
+        for name in os.listdir(self.directory):
+            file_path = os.path.join(self.directory, name)
+            if not name.endswith(".mp4"):
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            in_use = set(self._in_use)
+        for _, size, file_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if file_path in in_use:
+                continue
+            try:
+                os.unlink(file_path)
+                total -= size
+            except OSError as e:
+                print(f"无法删除代理 {file_path}: {e}")
+
+    def shutdown(self):
+        self.runner.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
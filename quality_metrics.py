@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 客观质量指标：以一个视频为参考，逐帧计算其余视频的 PSNR 和 SSIM
+#
+# numpy 后端：每个视频通过 frame_source 解码成灰度帧，后台线程预读到有上限的环形缓冲区，
+# 参考视频只解码一次，每批帧在线程池中并行计算（numpy 运算期间释放 GIL），
+# 内存占用只与批大小和分析分辨率有关
+# ffmpeg 后端：直接使用 ffmpeg 的 psnr/ssim 滤镜，安装了 libvmaf 时同时计算 VMAF
+#
+# 所有指标都只计算亮度（Y）平面
+
+METRICS = ("psnr", "ssim", "vmaf")
+# 分析分辨率的宽度，所有视频缩放到与参考视频相同的尺寸
+ANALYSIS_WIDTH = 640
+# 每批读取的帧数
+BATCH_FRAMES = 8
+# 完全相同的帧 PSNR 为无穷大，图表中按这个值显示
+MAX_PSNR = 100.0
+
+# SSIM 常数（8 位输入）
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+def analysis_size(info, width=ANALYSIS_WIDTH):
+    """ 按参考视频的显示宽高比计算分析分辨率，宽高都取偶数 """
+    from media_probe import display_aspect
+
+    width = min(width, info.get("width") or width)
+    width = max(2, width // 2 * 2)
+    return width, max(2, int(round(width / display_aspect(info) / 2)) * 2)
+
+
+def gaussian_kernel(size=11, sigma=1.5):
+    x = np.arange(size, dtype=np.float32) - (size - 1) / 2.0
+    kernel = np.exp(-(x ** 2) / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def filter_valid(frames, kernel):
+    """ 对 (批, 高, 宽) 数组做可分离的高斯滤波，只保留完整窗口的区域 """
+    size = len(kernel)
+    height, width = frames.shape[1] - size + 1, frames.shape[2] - size + 1
+    rows = kernel[0] * frames[:, :, :width]
+    for i in range(1, size):
+        rows += kernel[i] * frames[:, :, i:i + width]
+    result = kernel[0] * rows[:, :height, :]
+    for i in range(1, size):
+        result += kernel[i] * rows[:, i:i + height, :]
+    return result
+
+
+def psnr_batch(reference, distorted):
+    """ 每帧的 PSNR，输入为 (批, 高, 宽) 的 uint8 数组 """
+    diff = reference.astype(np.float32) - distorted.astype(np.float32)
+    mse = np.mean(diff * diff, axis=(1, 2))
+    with np.errstate(divide="ignore"):
+        psnr = 10.0 * np.log10(255.0 ** 2 / mse)
+    return np.minimum(psnr, MAX_PSNR)
+
+
+def ssim_batch(reference, distorted, kernel=None):
+    """ 每帧的 SSIM（11x11 高斯窗口，与 ffmpeg 和常见实现一致） """
+    kernel = gaussian_kernel() if kernel is None else kernel
+    x = reference.astype(np.float32)
+    y = distorted.astype(np.float32)
+
+    mu_x = filter_valid(x, kernel)
+    mu_y = filter_valid(y, kernel)
+    mu_xx = mu_x * mu_x
+    mu_yy = mu_y * mu_y
+    mu_xy = mu_x * mu_y
+    sigma_xx = filter_valid(x * x, kernel) - mu_xx
+    sigma_yy = filter_valid(y * y, kernel) - mu_yy
+    sigma_xy = filter_valid(x * y, kernel) - mu_xy
+
+    ssim_map = ((2 * mu_xy + SSIM_C1) * (2 * sigma_xy + SSIM_C2)) / \
+               ((mu_xx + mu_yy + SSIM_C1) * (sigma_xx + sigma_yy + SSIM_C2))
+    return ssim_map.mean(axis=(1, 2))
+
+
+class QualityResult:
+    """ 每个对比视频的逐帧指标，时间以参考视频为准 """
+    def __init__(self, reference, fps, backend):
+        self.reference = reference
+        self.fps = fps
+        self.backend = backend
+        self.metrics = {}
+
+    def add(self, path, metric, values):
+        self.metrics.setdefault(path, {}).setdefault(metric, []).extend(float(v) for v in values)
+
+    def available_metrics(self):
+        return [m for m in METRICS if any(m in values for values in self.metrics.values())]
+
+    def frame_time(self, frame):
+        return int(frame * 1000 / self.fps)
+
+    def worst_frames(self, path, metric, count=10):
+        """ 返回 [(帧序号, 数值)]，按质量从差到好排序 """
+        values = self.metrics.get(path, {}).get(metric, [])
+        return sorted(enumerate(values), key=lambda item: item[1])[:count]
+
+    def summary(self):
+        result = {}
+        for path, metrics in self.metrics.items():
+            result[path] = {metric: {"mean": round(sum(v) / len(v), 4), "min": round(min(v), 4), "frames": len(v)}
+                            for metric, v in metrics.items() if v}
+        return result
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"reference": self.reference, "fps": self.fps, "backend": self.backend,
+                       "summary": self.summary(), "frames": self.metrics}, f, ensure_ascii=False, indent=2)
+
+
+def compare_numpy(reference, others, size, fps, progress_callback=None, cancel_event=None, max_workers=None,
+                  total_frames=0):
+    """ 流式解码参考视频和所有对比视频，逐批计算 PSNR 和 SSIM """
+    from frame_source import FrameSource
+
+    result = QualityResult(reference, fps, "numpy")
+    kernel = gaussian_kernel()
+    sources = {}
+    frames_done = 0
+    max_workers = max_workers or min(len(others), os.cpu_count() or 2)
+    # 所有来源使用相同的尺寸和上限，环形缓冲区容量相同，每批的帧在各来源中都是连续的
+    memory_cap = size[0] * size[1] * BATCH_FRAMES * 4
+
+    def compare_one(path, start, reference_frames):
+        frames = sources[path].get_frames(start, len(reference_frames))
+        if frames is None:
+            return path, None, None
+        count = len(frames)
+        return path, psnr_batch(reference_frames[:count], frames), ssim_batch(reference_frames[:count], frames, kernel)
+
+    try:
+        # 所有视频都按参考视频的帧率取帧
+        for path in [reference] + list(others):
+            sources[path] = FrameSource(path, {"fps": fps}, size, "gray", memory_cap)
+        active = list(others)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while active:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AnalysisCancelled()
+                reference_frames = sources[reference].get_frames(frames_done, BATCH_FRAMES)
+                if reference_frames is None:
+                    break
+
+                start = frames_done
+                for path, psnr, ssim in executor.map(lambda p: compare_one(p, start, reference_frames), active):
+                    if psnr is None:
+                        # 对比视频比参考视频短，之后不再计算
+                        active.remove(path)
+                        continue
+                    result.add(path, "psnr", psnr)
+                    result.add(path, "ssim", ssim)
+
+                frames_done += len(reference_frames)
+                if progress_callback is not None:
+                    percent = min(100.0, frames_done * 100.0 / total_frames) if total_frames else 0.0
+                    progress_callback(frames_done, percent)
+    finally:
+        for source in sources.values():
+            source.close()
+    return result
+
+
+def ffmpeg_has_filter(name):
+    try:
+        output = subprocess.run(["ffmpeg", "-hide_banner", "-filters"], stdin=subprocess.DEVNULL,
+                                capture_output=True, text=True, errors="replace").stdout
+    except OSError:
+        return False
+    return any(line.split()[1:2] == [name] for line in output.splitlines() if line.strip())
+
+
+def parse_stats_file(path, key):
+    """ 读取 psnr/ssim 滤镜的 stats_file，每行形如 "n:1 ... key:value ..." """
+    values = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            for field in line.split():
+                name, _, value = field.partition(":")
+                if name == key:
+                    values.append(MAX_PSNR if value == "inf" else float(value))
+                    break
+    return values
+
+
+def compare_ffmpeg_one(reference, path, size, fps, with_vmaf, cancel_event=None):
+    """ 用 ffmpeg 滤镜计算一个对比视频的逐帧指标 """
+    width, height = size
+    outputs = 3 if with_vmaf else 2
+    temp_dir = tempfile.mkdtemp(prefix="vct_quality_")
+    # 滤镜参数中的路径需要转义，统一用正斜杠并把冒号转义
+    def filter_path(name):
+        return os.path.join(temp_dir, name).replace("\\", "/").replace(":", "\\:")
+
+    prepare = f"fps={fps},scale={width}:{height}:flags=bicubic,format=yuv420p"
+    graph = [f"[0:v]{prepare},split={outputs}" + "".join(f"[d{i}]" for i in range(outputs)),
+             f"[1:v]{prepare},split={outputs}" + "".join(f"[r{i}]" for i in range(outputs)),
+             f"[d0][r0]psnr=stats_file={filter_path('psnr.log')}",
+             f"[d1][r1]ssim=stats_file={filter_path('ssim.log')}"]
+    if with_vmaf:
+        graph.append(f"[d2][r2]libvmaf=log_fmt=json:log_path={filter_path('vmaf.json')}")
+
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-i", reference,
+           "-lavfi", ";".join(graph), "-f", "null", "-"]
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True, errors="replace")
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set():
+                    process.kill()
+                    process.communicate()
+                    raise AnalysisCancelled()
+        if process.returncode != 0:
+            raise RuntimeError(stderr.strip() or f"ffmpeg 退出码 {process.returncode}")
+
+        metrics = {
+            "psnr": parse_stats_file(os.path.join(temp_dir, "psnr.log"), "psnr_y"),
+            "ssim": parse_stats_file(os.path.join(temp_dir, "ssim.log"), "Y"),
+        }
+        if with_vmaf:
+            with open(os.path.join(temp_dir, "vmaf.json"), "r", encoding="utf-8") as f:
+                metrics["vmaf"] = [frame["metrics"]["vmaf"] for frame in json.load(f)["frames"]]
+        return path, metrics
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def compare_ffmpeg(reference, others, size, fps, progress_callback=None, cancel_event=None, max_workers=None):
+    """ 每个对比视频一个 ffmpeg 进程，多个进程并行运行 """
+    result = QualityResult(reference, fps, "ffmpeg")
+    with_vmaf = ffmpeg_has_filter("libvmaf")
+    max_workers = max_workers or max(1, min(len(others), (os.cpu_count() or 2) // 2))
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(compare_ffmpeg_one, reference, path, size, fps, with_vmaf, cancel_event)
+                   for path in others]
+        for future in futures:
+            path, metrics = future.result()
+            for metric, values in metrics.items():
+                result.add(path, metric, values)
+            done += 1
+            if progress_callback is not None:
+                progress_callback(done, done * 100.0 / len(others))
+    return result
+
+
+def compare_videos(reference, others, reference_info, backend="numpy", progress_callback=None, cancel_event=None,
+                   analysis_width=ANALYSIS_WIDTH, max_workers=None):
+    """ 以 reference 为参考计算 others 中每个视频的逐帧指标
+
+    reference_info 为参考视频的探测信息，用于确定分析分辨率和帧率；
+    progress_callback(已完成数量, 百分比)，cancel_event 被设置时抛出 AnalysisCancelled
+    """
+    size = analysis_size(reference_info, analysis_width)
+    fps = round(reference_info.get("fps") or 30.0, 3)
+    if backend == "ffmpeg":
+        return compare_ffmpeg(reference, others, size, fps, progress_callback, cancel_event, max_workers)
+    total_frames = int(reference_info.get("duration_ms", 0) * fps / 1000)
+    return compare_numpy(reference, others, size, fps, progress_callback, cancel_event, max_workers, total_frames)
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+
+# 会话文件：保存文件列表、布局、音量和静音、对齐偏移和播放位置，下次打开直接恢复
+# 会话旁边的 .index 文件保存每个文件的探测信息和缩略图索引，按 大小+修改时间 校验，
+# 打开会话时不需要等待 ffprobe 就能确定时长、显示缩略图，解码器在后台陆续就绪
+
+SESSION_VERSION = 1
+SESSION_EXTENSION = ".vcts"
+INDEX_SUFFIX = ".index"
+
+
+def index_path(session_path):
+    return session_path + INDEX_SUFFIX
+
+
+def file_signature(path):
+    # 整个目录移动后路径会变，只用大小和修改时间判断文件是否变化
+    stat = os.stat(path)
+    return f"{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def relative_to(path, base_dir):
+    try:
+        return os.path.relpath(path, base_dir)
+    except ValueError:
+        # Windows 下不同盘符之间没有相对路径
+        return None
+
+
+def write_json(path, data):
+    # 先写临时文件再替换，避免写到一半损坏
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def save_session(session_path, state, media_info=None, thumbnails=None):
+    """ 保存会话和旁边的索引
+
+    state["videos"] 为 [{"path", "muted", "offset_ms"}]，其余键（布局、音量、播放位置等）原样保存；
+    media_info 和 thumbnails 为 {绝对路径: 探测信息 / ThumbnailIndex}
+    """
+    base_dir = os.path.dirname(os.path.abspath(session_path))
+    videos = []
+    for video in state["videos"]:
+        path = os.path.abspath(video["path"])
+        # 同时保存相对路径，整个目录移动后仍然可以打开
+        videos.append(dict(video, path=path, relative_path=relative_to(path, base_dir)))
+    write_json(session_path, dict(state, version=SESSION_VERSION, videos=videos))
+
+    files = {}
+    for video in videos:
+        path = video["path"]
+        try:
+            entry = {"signature": file_signature(path), "relative_path": video["relative_path"]}
+        except OSError:
+            continue
+        info = (media_info or {}).get(path)
+        if info:
+            entry["info"] = info
+        index = (thumbnails or {}).get(path)
+        if index is not None:
+            entry["thumbnails"] = {"directory": index.directory, "times": index.times, "files": index.files}
+        files[path] = entry
+    try:
+        write_json(index_path(session_path), {"version": SESSION_VERSION, "files": files})
+    except OSError as e:
+        # 索引只用于加速，保存失败不影响会话本身
+        print(f"无法保存会话索引: {e}")
+
+
+def resolve_video_path(video, base_dir):
+    if os.path.exists(video["path"]):
+        return video["path"]
+    relative = video.get("relative_path")
+    if relative:
+        path = os.path.normpath(os.path.join(base_dir, relative))
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_session(session_path):
+    """ 读取会话，返回 (state, SessionIndex)
+
+    state["videos"] 中只包含能找到的文件，找不到的原路径放在 state["missing"] 中；
+    文件无法读取时抛出 OSError，格式不对时抛出 ValueError
+    """
+    with open(session_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("version") != SESSION_VERSION:
+        raise ValueError("不支持的会话文件版本")
+
+    base_dir = os.path.dirname(os.path.abspath(session_path))
+    videos, missing = [], []
+    for video in data.get("videos", []):
+        path = resolve_video_path(video, base_dir)
+        if path is None:
+            missing.append(video["path"])
+        else:
+            videos.append(dict(video, path=path))
+    return dict(data, videos=videos, missing=missing), SessionIndex.load(session_path)
+
+
+class SessionIndex:
+    """ 会话旁边的索引，文件变化过的条目不会被使用 """
+    def __init__(self, files=None, base_dir=""):
+        self.files = files or {}
+        self.base_dir = base_dir
+        self.relative = {entry["relative_path"]: entry for entry in self.files.values() if entry.get("relative_path")}
+
+    @classmethod
+    def load(cls, session_path):
+        base_dir = os.path.dirname(os.path.abspath(session_path))
+        try:
+            with open(index_path(session_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(base_dir=base_dir)
+        if data.get("version") != SESSION_VERSION:
+            return cls(base_dir=base_dir)
+        return cls(data.get("files"), base_dir)
+
+    def _entry(self, path):
+        path = os.path.abspath(path)
+        entry = self.files.get(path) or self.relative.get(relative_to(path, self.base_dir))
+        try:
+            if entry is None or entry.get("signature") != file_signature(path):
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def info(self, path):
+        entry = self._entry(path)
+        if entry is None or not entry.get("info"):
+            return None
+        info = entry["info"]
+        return dict(info, sar=tuple(info["sar"]))
+
+    def thumbnails(self, path):
+        from thumbnail_index import ThumbnailIndex
+
+        entry = self._entry(path)
+        data = entry.get("thumbnails") if entry else None
+        # 缩略图缓存可能已被清理
+        if not data or not os.path.isdir(data["directory"]):
+            return None
+        index = ThumbnailIndex(data["directory"], data["times"], data["files"])
+        index.touch()
+        return index
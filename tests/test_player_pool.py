@@ -0,0 +1,27 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 播放器池浸泡测试：反复添加和移除视频后，预热后的内存增长不能超过上限
+# 在子进程中运行 benchmarks/bench_player_pool.py，它超过上限时返回非零退出码
+
+pytest.importorskip("PyQt6.QtMultimedia")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("需要 ffmpeg 生成测试视频", allow_module_level=True)
+
+CYCLES = 10
+VIDEOS = 8
+MAX_GROWTH_MB = 30
+
+
+def test_memory_flat_after_add_remove_cycles():
+    result = subprocess.run([
+        sys.executable, os.path.join(ROOT, "benchmarks", "bench_player_pool.py"),
+        "--cycles", str(CYCLES), "--videos", str(VIDEOS), "--max-growth-mb", str(MAX_GROWTH_MB),
+    ], env=dict(os.environ, QT_QPA_PLATFORM="offscreen"), capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stdout + result.stderr
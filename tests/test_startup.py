@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_startup import DEFAULT_BUDGET_MS, measure
+
+# 启动耗时检查：无显示器启动 5 次，窗口显示耗时的中位数不能超出预算，启动时不能导入应延迟导入的模块
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+RUNS = 5
+
+
+@pytest.fixture(scope="module")
+def startup():
+    return measure(RUNS, "offscreen")
+
+
+def test_window_visible_within_budget(startup):
+    assert startup["median_process_wall_ms"] <= DEFAULT_BUDGET_MS, (
+        f"启动耗时中位数 {startup['median_process_wall_ms']:.0f} ms 超出预算 {DEFAULT_BUDGET_MS} ms")
+
+
+def test_deferred_modules_not_imported(startup):
+    assert startup["deferred_modules_loaded"] == []
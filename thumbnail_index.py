@@ -0,0 +1,178 @@
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from media_probe import app_cache_dir, file_key
+
+# 关键帧缩略图索引：拖动主进度条时先显示缓存的缩略图，松开后再真正跳转
+# 缩略图只解码关键帧，按 路径+大小+修改时间 缓存在磁盘上
+# 缓存目录有大小上限，超出上限时删除最久没有使用的索引（与代理缓存相同）
+
+THUMBNAIL_WIDTH = 160
+# 相邻缩略图的最小间隔，关键帧很密时避免生成过多图片
+MIN_INTERVAL_MS = 1000
+INDEX_FILE = "index.json"
+# 缓存目录大小上限
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+# 生成中的临时目录超过这个时间仍然存在时视为中途退出留下的，淘汰时一并删除
+STALE_TEMP_S = 24 * 3600
+TEMP_SUFFIX = ".tmp"
+
+
+def index_key(path):
+    return hashlib.sha1(file_key(path).encode("utf-8")).hexdigest()
+
+
+def index_dir(path):
+    return os.path.join(app_cache_dir("thumbnails"), index_key(path))
+
+
+def directory_size(directory):
+    total = 0
+    for name in os.listdir(directory):
+        try:
+            total += os.path.getsize(os.path.join(directory, name))
+        except OSError:
+            pass
+    return total
+
+
+def evict(cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, keep=()):
+    """ 缓存超出上限时按最近使用时间（索引文件的修改时间）删除旧的索引，keep 中的目录不删除 """
+    cache_dir = cache_dir or app_cache_dir("thumbnails")
+    keep = {os.path.abspath(directory) for directory in keep}
+    entries = []
+    now = time.time()
+    for name in os.listdir(cache_dir):
+        directory = os.path.join(cache_dir, name)
+        try:
+            if name.endswith(TEMP_SUFFIX):
+                if now - os.stat(directory).st_mtime > STALE_TEMP_S:
+                    shutil.rmtree(directory, ignore_errors=True)
+                continue
+            used = os.stat(os.path.join(directory, INDEX_FILE)).st_mtime
+            entries.append((used, directory_size(directory), directory))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, directory in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(directory) in keep:
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
+
+
+def select_times(keyframes, min_interval_ms=MIN_INTERVAL_MS):
+    """ 从关键帧中挑出间隔不小于 min_interval_ms 的时间点，返回 [(关键帧序号, 时间)] """
+    selected = []
+    last = None
+    for i, keyframe in enumerate(keyframes):
+        if last is None or keyframe - last >= min_interval_ms:
+            selected.append((i, keyframe))
+            last = keyframe
+    return selected
+
+
+class ThumbnailIndex:
+    """ 单个视频的缩略图索引，times 与 files 一一对应并按时间排序 """
+    def __init__(self, directory, times, files):
+        self.directory = directory
+        self.times = times
+        self.files = files
+
+    def __len__(self):
+        return len(self.times)
+
+    def lookup(self, position_ms):
+        """ 返回不晚于 position_ms 的最后一张缩略图路径 """
+        if not self.times:
+            return None
+        index = max(0, bisect.bisect_right(self.times, position_ms) - 1)
+        return os.path.join(self.directory, self.files[index])
+
+    def touch(self):
+        # 刷新使用时间，最近使用的索引最后被淘汰
+        try:
+            os.utime(os.path.join(self.directory, INDEX_FILE))
+        except OSError:
+            pass
+
+    @classmethod
+    def load(cls, path):
+        directory = index_dir(path)
+        try:
+            with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        index = cls(directory, data["times"], data["files"])
+        index.touch()
+        return index
+
+
+def build_index(path, keyframes, width=THUMBNAIL_WIDTH, min_interval_ms=MIN_INTERVAL_MS,
+                max_bytes=DEFAULT_MAX_BYTES):
+    """ 生成缩略图索引，已有缓存时直接读取，生成后按 max_bytes 淘汰旧的索引
+
+    用 -skip_frame nokey 只解码关键帧，第 i 张输出图片对应第 i 个关键帧
+    """
+    index = ThumbnailIndex.load(path)
+    if index is not None:
+        return index
+    if not keyframes:
+        return None
+
+    # 每次生成使用独立的临时目录，同一视频同时生成两次时不会互相删除文件
+    cache_dir = app_cache_dir("thumbnails")
+    directory = os.path.join(cache_dir, index_key(path))
+    temp_dir = tempfile.mkdtemp(prefix=index_key(path) + "_", suffix=TEMP_SUFFIX, dir=cache_dir)
+
+    try:
+        result = subprocess.run([
+            "ffmpeg", "-v", "error", "-nostdin",
+            "-skip_frame", "nokey", "-i", path,
+            "-map", "0:v:0",
+            "-vf", f"scale={width}:-2",
+            "-fps_mode", "passthrough",
+            "-q:v", "5",
+            os.path.join(temp_dir, "%06d.jpg"),
+        ], stdin=subprocess.DEVNULL, capture_output=True, text=True, errors="replace")
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"ffmpeg 退出码 {result.returncode}")
+
+        # 只保留挑选出来的关键帧，删除其余图片
+        keep = {}
+        for i, time_ms in select_times(keyframes, min_interval_ms):
+            name = f"{i + 1:06d}.jpg"
+            if os.path.exists(os.path.join(temp_dir, name)):
+                keep[name] = time_ms
+        for name in os.listdir(temp_dir):
+            if name not in keep:
+                os.unlink(os.path.join(temp_dir, name))
+
+        files = sorted(keep, key=keep.get)
+        with open(os.path.join(temp_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"times": [keep[name] for name in files], "files": files}, f)
+
+        # 完成后再放到最终位置，中途失败不会留下不完整的索引
+        shutil.rmtree(directory, ignore_errors=True)
+        try:
+            os.replace(temp_dir, directory)
+        except OSError:
+            # 另一次生成已经先放好了同一个索引，使用它的结果
+            if ThumbnailIndex.load(path) is None:
+                raise
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    evict(cache_dir, max_bytes, keep=[directory])
+    return ThumbnailIndex.load(path)
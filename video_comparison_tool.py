@@ -1,22 +1,42 @@
 import sys
 import os
-import tempfile
-import subprocess
+import threading
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QPushButton, QSlider, QLabel, QFileDialog, QGridLayout, 
-                            QSizePolicy, QComboBox, QStyle, QSpinBox)
-from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal, QSize, QThread, QProcess
-from PyQt6.QtGui import QPalette, QColor, QIcon, QFont
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaDevices
-from PyQt6.QtMultimediaWidgets import QVideoWidget
-from PyQt6.QtMultimedia import QMediaDevices, QMediaFormat
+                            QSizePolicy, QComboBox, QStyle, QSpinBox, QProgressBar, QStackedWidget,
+                            QCheckBox, QInputDialog)
+from PyQt6.QtCore import Qt, QTimer, QUrl, pyqtSignal, QSize, QObject
+from PyQt6.QtGui import QPalette, QColor, QIcon, QFont, QPixmap, QPainter, QPen, QImage
+from export_profiles import DEFAULT_PROFILE, EXPORT_PROFILES
+from perf_trace import LoopLagMonitor, PlayerPerfStats, traced, tracer
+from playback_sync import (SYNC_ABSOLUTE, SYNC_PROPORTIONAL, DriftStats, MasterClock, anchor_offset,
+                           master_position_for, plan_correction, target_position)
+
+# 多媒体模块和导出子系统导入较慢，在添加第一个视频或第一次导出时才导入
+QMediaPlayer = None
+QAudioOutput = None
+QVideoWidget = None
+
+def load_multimedia():
+    global QMediaPlayer, QAudioOutput, QVideoWidget
+    if QMediaPlayer is None:
+        from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+        from PyQt6.QtMultimediaWidgets import QVideoWidget
 
 class VideoPlayer(QWidget):    
+    remove_requested = pyqtSignal(object)
+    replace_requested = pyqtSignal(object)
+    focus_requested = pyqtSignal(object)
+    # 解码器加载完成，可以显示画面
+    loaded = pyqtSignal(object)
+    
     def __init__(self, index, parent=None):
         super().__init__(parent)
+        load_multimedia()
         self.index = index
-        self.media_player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
+        # 解码器和音频输出归播放器所有，随播放器一起释放
+        self.media_player = QMediaPlayer(self)
+        self.audio_output = QAudioOutput(self)
         self.audio_output.setVolume(0.5)  # 默认50%音量
         self.media_player.setAudioOutput(self.audio_output)
         self.video_widget = QVideoWidget()
@@ -59,6 +79,14 @@ class VideoPlayer(QWidget):
         """)
         self.mute_button.clicked.connect(self.toggle_mute)
         
+        # 替换和移除按钮
+        self.replace_button = QPushButton("替换")
+        self.replace_button.setFixedSize(50, 25)
+        self.replace_button.clicked.connect(lambda: self.replace_requested.emit(self))
+        self.remove_button = QPushButton("移除")
+        self.remove_button.setFixedSize(50, 25)
+        self.remove_button.clicked.connect(lambda: self.remove_requested.emit(self))
+        
         # 时间标签
         self.time_label = QLabel("00:00:00 / 00:00:00")
         self.time_label.setStyleSheet("color: #aaaaaa;")
@@ -88,32 +116,190 @@ class VideoPlayer(QWidget):
         # 视频控件
         self.media_player.setVideoOutput(self.video_widget)
         
+        # 拖动主进度条时显示缓存的关键帧缩略图，松开后切回视频
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.thumbnail_label.setStyleSheet("background-color: black;")
+        self.thumbnail_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.video_stack = QStackedWidget()
+        self.video_stack.addWidget(self.video_widget)
+        self.video_stack.addWidget(self.thumbnail_label)
+        self.thumbnail_index = None
+        self.thumbnail_path = None
+        
+        # 不在当前页的播放器会被停放：清空媒体源以释放解码器，重新激活时恢复到停放时的位置
+        self.file_path = None
+        self.parked = True
+        self.parked_position = 0
+        self.known_duration = 0
+        self.restore_position = None
+        self.restore_playing = False
+        
+        # 网格中播放低分辨率代理，proxy_height 为当前代理的档位
+        self.proxy_path = None
+        self.proxy_height = None
+        
         # 标题栏布局
         title_layout = QHBoxLayout()
         title_layout.addWidget(self.title_bar)
         title_layout.addStretch()
+        title_layout.addWidget(self.replace_button)
+        title_layout.addWidget(self.remove_button)
         title_layout.addWidget(self.mute_button)
         
+        # 性能统计（解码帧率、丢帧、跳转延迟），开启时显示在时间标签右侧
+        # QVideoWidget 使用原生视频表面，叠加在画面上的控件不一定能显示，所以放在画面下方
+        self.perf = None
+        self.perf_label = QLabel("")
+        self.perf_label.setStyleSheet("color: #e0a040; font-size: 8pt;")
+        self.perf_label.hide()
+        
         # 时间布局
         time_layout = QHBoxLayout()
         time_layout.addWidget(self.time_label)
+        time_layout.addStretch()
+        time_layout.addWidget(self.perf_label)
         
         # 主布局
         layout.addLayout(title_layout)
-        layout.addWidget(self.video_widget, 1)
+        layout.addWidget(self.video_stack, 1)
         layout.addLayout(time_layout)
         layout.addWidget(self.position_slider)
         
         self.setLayout(layout)
         
+        # 位置刷新由主窗口的调度器合并，displayed_time 用于跳过重复的标签更新
+        self.ui_scheduler = None
+        self.pending_position = 0
+        self.displayed_time = None
+        
         # 连接信号
         self.media_player.durationChanged.connect(self.duration_changed)
         self.media_player.positionChanged.connect(self.position_changed)
+        self.media_player.mediaStatusChanged.connect(self.media_status_changed)
         self.position_slider.sliderMoved.connect(self.set_position)
     
+    def show_thumbnail(self, position):
+        if self.thumbnail_index is None:
+            return
+        path = self.thumbnail_index.lookup(position)
+        if path is None:
+            return
+        
+        # 同一张缩略图不重复加载
+        if path != self.thumbnail_path:
+            self.thumbnail_path = path
+            pixmap = QPixmap(path)
+            self.thumbnail_label.setPixmap(pixmap.scaled(self.thumbnail_label.size(),
+                                                         Qt.AspectRatioMode.KeepAspectRatio,
+                                                         Qt.TransformationMode.FastTransformation))
+        self.video_stack.setCurrentWidget(self.thumbnail_label)
+    
+    def show_frame(self, frame):
+        """ 显示逐帧步进解码出的 RGB 帧（numpy 数组） """
+        height, width = frame.shape[:2]
+        image = QImage(frame.tobytes(), width, height, width * 3, QImage.Format.Format_RGB888)
+        self.thumbnail_path = None
+        self.thumbnail_label.setPixmap(QPixmap.fromImage(image).scaled(self.thumbnail_label.size(),
+                                                                       Qt.AspectRatioMode.KeepAspectRatio,
+                                                                       Qt.TransformationMode.SmoothTransformation))
+        self.video_stack.setCurrentWidget(self.thumbnail_label)
+    
+    def show_video(self):
+        self.video_stack.setCurrentWidget(self.video_widget)
+    
     def load_video(self, file_path):
-        self.media_player.setSource(QUrl.fromLocalFile(file_path))
+        # 只记录文件，解码器在播放器显示到网格中时才创建
+        self.file_path = os.path.abspath(file_path)
         self.title_bar.setText(os.path.basename(file_path))
+        if self.perf is not None:
+            self.perf = PlayerPerfStats(os.path.basename(file_path))
+    
+    def reset(self, index):
+        """ 回到新建时的状态，供播放器池复用；调用前应先停放 """
+        self.index = index
+        self.file_path = None
+        self.parked_position = 0
+        self.known_duration = 0
+        self.restore_position = None
+        self.restore_playing = False
+        self.proxy_path = None
+        self.proxy_height = None
+        self.thumbnail_index = None
+        self.thumbnail_path = None
+        self.thumbnail_label.clear()
+        self.show_video()
+        self.pending_position = 0
+        self.displayed_time = None
+        self.title_bar.setText(f"视频 {index + 1}")
+        self.time_label.setText("00:00:00 / 00:00:00")
+        self.position_slider.setRange(0, 0)
+        self.media_player.setPlaybackRate(1.0)
+    
+    def duration(self):
+        # 停放后解码器已释放，使用停放前或探测到的时长
+        return self.media_player.duration() or self.known_duration
+    
+    def park(self):
+        """ 释放解码器，返回是否真正执行了停放 """
+        if self.parked:
+            return False
+        if self.restore_position is None:
+            self.parked_position = self.media_player.position()
+        else:
+            # 还没加载完成就被停放，保留原来要恢复的位置
+            self.parked_position = self.restore_position
+        self.known_duration = self.duration()
+        self.parked = True
+        self.restore_position = None
+        self.media_player.stop()
+        self.media_player.setSource(QUrl())
+        return True
+    
+    def activate(self, position=None, playing=False):
+        """ 重新创建解码器，加载完成后跳到 position（默认为停放时的位置） """
+        if not self.parked or self.file_path is None:
+            return
+        self.parked = False
+        self.restore_position = self.parked_position if position is None else position
+        self.restore_playing = playing
+        self.media_player.setSource(QUrl.fromLocalFile(self.current_source()))
+    
+    def current_source(self):
+        return self.proxy_path or self.file_path
+    
+    def set_proxy(self, proxy_path, height=None):
+        """ 切换到代理文件（None 表示原始文件），保持当前位置和播放状态 """
+        self.proxy_height = height if proxy_path else None
+        if proxy_path == self.proxy_path:
+            return
+        self.proxy_path = proxy_path
+        if self.parked:
+            return
+        
+        # 还在加载时沿用原来要恢复的位置
+        if self.restore_position is None:
+            self.restore_position = self.media_player.position()
+            self.restore_playing = self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+        self.media_player.setSource(QUrl.fromLocalFile(self.current_source()))
+    
+    def mouseDoubleClickEvent(self, event):
+        # 双击单独显示这个视频，再次双击回到网格
+        self.focus_requested.emit(self)
+        super().mouseDoubleClickEvent(event)
+    
+    def media_status_changed(self, status):
+        if status != QMediaPlayer.MediaStatus.LoadedMedia:
+            return
+        if self.restore_position is not None:
+            position, self.restore_position = self.restore_position, None
+            self.seek(position)
+            if self.restore_playing:
+                self.media_player.play()
+            else:
+                # 暂停状态下跳转才会显示对应的画面
+                self.media_player.pause()
+        self.loaded.emit(self)
     
     def toggle_mute(self, checked):
         self.audio_output.setMuted(checked)
@@ -123,20 +309,70 @@ class VideoPlayer(QWidget):
         self.mute_button.setChecked(muted)
     
     def set_position(self, position):
+        self.seek(position)
+    
+    def seek(self, position):
+        # 所有跳转都经过这里，开启性能统计时记录跳转延迟
+        if self.perf is not None:
+            self.perf.seek(position)
         self.media_player.setPosition(position)
     
+    def set_perf_enabled(self, enabled):
+        sink = self.video_widget.videoSink()
+        if enabled and self.perf is None:
+            self.perf = PlayerPerfStats(self.title_bar.text())
+            sink.videoFrameChanged.connect(self.perf_frame)
+        elif not enabled and self.perf is not None:
+            sink.videoFrameChanged.disconnect(self.perf_frame)
+            self.perf = None
+            self.perf_label.clear()
+        self.perf_label.setVisible(enabled)
+    
+    def perf_frame(self, frame):
+        if self.perf is not None:
+            self.perf.frame(frame.startTime(), frame.endTime())
+    
+    def update_perf_label(self):
+        stats = self.perf.snapshot()
+        text = f"{stats['fps']:.1f} fps  丢帧 {stats['dropped_total']}"
+        if stats["seek_ms"] is not None:
+            text += f"  跳转 {stats['seek_ms']:.0f} ms"
+        self.perf_label.setText(text)
+        tracer.counter(f"frames {self.perf.name}", "player", fps=round(stats["fps"], 1), dropped=stats["dropped"])
+    
     def duration_changed(self, duration):
+        if duration <= 0:
+            # 停放时媒体源被清空，保留原来的时长显示
+            return
+        self.known_duration = duration
         self.position_slider.setRange(0, duration)
         self.update_duration_info(duration)
     
     def position_changed(self, position):
-        self.position_slider.setValue(position)
-        self.update_duration_info(position)
+        if self.perf is not None:
+            self.perf.position_changed(position)
+        # 有刷新调度器时只记录位置，由调度器在下一个显示帧统一刷新
+        self.pending_position = position
+        if self.ui_scheduler is not None:
+            self.ui_scheduler.request(self, self.refresh_position)
+        else:
+            self.refresh_position()
+    
+    def refresh_position(self):
+        if not self.position_slider.isSliderDown():
+            self.position_slider.setValue(self.pending_position)
+        self.update_duration_info(self.pending_position)
     
     def update_duration_info(self, position):
-        duration = self.media_player.duration()
+        duration = self.duration()
         if duration <= 0:
             return
+        
+        # 显示的秒数没有变化时不重新生成文本
+        displayed = (int(position / 1000), int(duration / 1000))
+        if displayed == self.displayed_time:
+            return
+        self.displayed_time = displayed
             
         current_time = self.format_time(position)
         total_time = self.format_time(duration)
@@ -148,6 +384,588 @@ class VideoPlayer(QWidget):
         hours = int(minutes / 60)
         return f"{hours:02d}:{minutes % 60:02d}:{seconds % 60:02d}"
 
+class PlayerPool:
+    """ 播放器对象池：移除的播放器先释放解码器再放回池中，添加视频时优先复用
+
+    factory(index) 负责创建新播放器并连接信号，复用的播放器保留原有的信号连接
+    """
+    def __init__(self, factory, max_idle=8):
+        self.factory = factory
+        self.max_idle = max_idle
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+    
+    def acquire(self, index):
+        if self.idle:
+            player = self.idle.pop()
+            player.reset(index)
+            self.reused += 1
+        else:
+            player = self.factory(index)
+            self.created += 1
+        return player
+    
+    def release(self, player):
+        player.park()
+        player.reset(player.index)
+        player.hide()
+        player.setParent(None)
+        if len(self.idle) < self.max_idle:
+            self.idle.append(player)
+        else:
+            player.deleteLater()
+    
+    def clear(self):
+        for player in self.idle:
+            player.deleteLater()
+        self.idle.clear()
+
+class UiUpdateScheduler(QObject):
+    """ 合并界面刷新请求：同一个对象在一个刷新周期内的多次请求只执行一次
+
+    默认刷新率跟随屏幕刷新率（最高 60Hz），并统计每秒的请求数和实际刷新数
+    """
+    def __init__(self, rate=None, parent=None):
+        super().__init__(parent)
+        self.pending = {}
+        self.request_count = 0
+        self.refresh_count = 0
+        self.requests_per_second = 0
+        self.refreshes_per_second = 0
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.flush)
+        self.set_rate(rate or self.display_rate())
+        
+        # 每秒统计一次
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.roll_stats)
+        self.stats_timer.start()
+    
+    def display_rate(self):
+        screen = QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 60
+        return min(60, rate) if rate > 0 else 60
+    
+    def set_rate(self, rate):
+        self.timer.setInterval(max(1, int(1000 / rate)))
+    
+    def request(self, key, callback):
+        self.request_count += 1
+        self.pending[key] = callback
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    @traced("ui")
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        for callback in pending.values():
+            callback()
+        self.refresh_count += len(pending)
+    
+    def roll_stats(self):
+        self.requests_per_second = self.request_count
+        self.refreshes_per_second = self.refresh_count
+        self.request_count = 0
+        self.refresh_count = 0
+
+class ExportQueueSignals(QObject):
+    """ 把导出队列工作线程中的回调转成信号，跨线程时自动排队到主线程 """
+    job_started = pyqtSignal(object)
+    job_progress = pyqtSignal(object, dict)
+    job_finished = pyqtSignal(object, bool, str)
+
+class SyncEngine(QObject):
+    """ 主时钟同步引擎：用同一个时间基准驱动所有播放器，定时测量漂移并纠正
+
+    漂移较大时直接跳转，较小时微调播放速率追赶，统计结果可以导出
+    """
+    position_changed = pyqtSignal(int)
+    playback_finished = pyqtSignal()
+    
+    # 跳转后等待解码器更新位置的时间，期间不测量漂移
+    SEEK_SETTLE_MS = 300
+    
+    def __init__(self, fps_lookup, parent=None):
+        super().__init__(parent)
+        self.fps_lookup = fps_lookup
+        self.clock = MasterClock()
+        self.mode = SYNC_PROPORTIONAL
+        self.players = []
+        self.anchors = {}
+        self.offsets = {}
+        self.settle_until = {}
+        self.stats = DriftStats()
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(40)
+        self.timer.timeout.connect(self.tick)
+    
+    def set_players(self, players):
+        self.players = list(players)
+        self.reanchor()
+    
+    def set_duration(self, duration):
+        self.clock.duration = duration
+    
+    def set_mode(self, mode):
+        self.mode = mode
+        self.seek(int(self.clock.position()))
+    
+    def set_offset(self, player, offset_ms):
+        # 视频相对主时间线的起始偏移，只在绝对时间模式下生效
+        self.offsets[player] = offset_ms
+        self.reanchor()
+    
+    def remove_player(self, player):
+        # 播放器被移除或替换视频时清除它的锚点和偏移
+        if player in self.players:
+            self.players.remove(player)
+        for state in (self.anchors, self.offsets, self.settle_until):
+            state.pop(player, None)
+    
+    def is_playing(self):
+        return self.clock.is_running()
+    
+    def position(self):
+        return int(self.clock.position())
+    
+    def preview_target(self, player, master):
+        # 不改变锚点，只计算拖动预览时播放器应显示的位置
+        return target_position(master, self.clock.duration, player.duration(),
+                               self.mode, self.offsets.get(player, 0))
+    
+    def master_for(self, player, position):
+        # 播放器位于 position 时主时钟应处的位置
+        return master_position_for(position, self.clock.duration, player.duration(), self.mode,
+                                   self.offsets.get(player, 0))
+    
+    def export_offset(self, player, start):
+        """ 从主时钟 start 开始导出时该播放器在主时间线上的偏移（输入位置 = 主时间线位置 - 偏移）
+
+        绝对时间模式就是对齐偏移；比例模式与跳转到 start 后播放一致：入点按比例定位，之后以相同速度前进
+        """
+        if self.mode == SYNC_PROPORTIONAL:
+            return start - self.preview_target(player, start)
+        return self.offsets.get(player, 0)
+    
+    def player_target(self, player, master):
+        duration = player.media_player.duration()
+        return int(min(max(0, master - self.anchors.get(player, 0)), duration))
+    
+    def reanchor(self):
+        master = self.clock.position()
+        for player in self.players:
+            self.anchors[player] = anchor_offset(master, self.clock.duration, player.media_player.duration(),
+                                                 self.mode, self.offsets.get(player, 0))
+    
+    def play(self):
+        if self.clock.at_end():
+            self.clock.seek(0)
+        self.seek(int(self.clock.position()))
+        self.clock.start()
+        for player in self.players:
+            player.media_player.play()
+        self.timer.start()
+    
+    def pause(self):
+        self.clock.pause()
+        self.timer.stop()
+        for player in self.players:
+            player.media_player.pause()
+            player.media_player.setPlaybackRate(1.0)
+        self.position_changed.emit(self.position())
+    
+    @traced("sync")
+    def seek(self, position):
+        self.clock.seek(position)
+        self.reanchor()
+        for player in self.players:
+            if player.media_player.duration() > 0:
+                self.seek_player(player, self.player_target(player, position))
+        self.position_changed.emit(self.position())
+    
+    def seek_player(self, player, target):
+        player.seek(target)
+        self.settle_until[player] = self.clock.position() + self.SEEK_SETTLE_MS
+    
+    @traced("sync")
+    def tick(self):
+        master = self.clock.position()
+        self.position_changed.emit(int(master))
+        if self.clock.at_end():
+            self.pause()
+            self.playback_finished.emit()
+            return
+        
+        for player in self.players:
+            duration = player.media_player.duration()
+            if duration <= 0 or master < self.settle_until.get(player, 0):
+                continue
+            target = self.player_target(player, master)
+            if target >= duration:
+                continue
+            
+            # 漂移为正表示播放器超前于主时钟
+            fps = self.fps_lookup(player)
+            drift = player.media_player.position() - target
+            action, rate = plan_correction(drift, fps)
+            self.stats.record(player.index, player.title_bar.text(), drift, fps, action)
+            
+            if action == "seek":
+                self.seek_player(player, target)
+            elif abs(player.media_player.playbackRate() - rate) > 0.002:
+                player.media_player.setPlaybackRate(rate)
+
+class QualityGraph(QWidget):
+    """ 逐帧质量曲线，横轴为参考视频的时间，点击跳转到对应帧 """
+    seek_requested = pyqtSignal(int)
+    
+    COLORS = ["#ff8c00", "#1e90ff", "#4caf50", "#e91e63", "#ffeb3b", "#9c27b0", "#00bcd4", "#ff5722", "#8bc34a"]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(90)
+        self.result = None
+        self.names = {}
+        self.metric = "psnr"
+        self.position = 0
+        # 按控件宽度缓存每一列的最小值，重绘时不再遍历全部帧
+        self.columns = {}
+        self.columns_key = None
+    
+    def set_result(self, result, names):
+        self.result = result
+        self.names = names
+        self.columns_key = None
+        self.update()
+    
+    def set_metric(self, metric):
+        self.metric = metric
+        self.columns_key = None
+        self.update()
+    
+    def set_position(self, position):
+        if position != self.position:
+            self.position = position
+            self.update()
+    
+    def frame_count(self):
+        if self.result is None:
+            return 0
+        return max((len(m.get(self.metric, [])) for m in self.result.metrics.values()), default=0)
+    
+    def update_columns(self, width):
+        # 每一列显示该列覆盖的帧中最差的值，最差帧不会因为缩放被跳过
+        key = (width, self.metric)
+        if self.columns_key == key:
+            return
+        self.columns_key = key
+        self.columns = {}
+        frames = self.frame_count()
+        if frames == 0 or width <= 0:
+            return
+        for path, metrics in self.result.metrics.items():
+            values = metrics.get(self.metric, [])
+            column_values = []
+            for x in range(width):
+                start = x * frames // width
+                end = max(start + 1, (x + 1) * frames // width)
+                bucket = values[start:end]
+                column_values.append(min(bucket) if bucket else None)
+            self.columns[path] = column_values
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1e1e1e"))
+        width, height = self.width(), self.height()
+        self.update_columns(width)
+        
+        values = [v for column in self.columns.values() for v in column if v is not None]
+        if values:
+            low, high = min(values), max(values)
+            if high - low < 1e-6:
+                low -= 1
+                high += 1
+            
+            for i, (path, column) in enumerate(self.columns.items()):
+                painter.setPen(QPen(QColor(self.COLORS[i % len(self.COLORS)]), 1))
+                last = None
+                for x, value in enumerate(column):
+                    if value is None:
+                        last = None
+                        continue
+                    y = int(height - 4 - (value - low) / (high - low) * (height - 8))
+                    if last is not None:
+                        painter.drawLine(x - 1, last, x, y)
+                    last = y
+            
+            # 图例和数值范围
+            painter.setPen(QColor("#aaaaaa"))
+            painter.drawText(4, 12, f"{self.metric.upper()} {high:.3f}")
+            painter.drawText(4, height - 4, f"{low:.3f}")
+            for i, path in enumerate(self.columns):
+                painter.setPen(QColor(self.COLORS[i % len(self.COLORS)]))
+                painter.drawText(width - 180, 12 + i * 12, self.names.get(path, os.path.basename(path))[:28])
+        
+        # 当前位置
+        frames = self.frame_count()
+        if frames:
+            x = int(self.position * self.result.fps / 1000 * width / frames)
+            painter.setPen(QPen(QColor("#ffffff"), 1))
+            painter.drawLine(x, 0, x, height)
+        painter.end()
+    
+    def mousePressEvent(self, event):
+        frames = self.frame_count()
+        if frames and self.width() > 0:
+            frame = int(event.position().x() * frames / self.width())
+            self.seek_requested.emit(self.result.frame_time(min(max(0, frame), frames - 1)))
+
+class DiffCanvas(QWidget):
+    """ 居中绘制差异图：图像按控件尺寸渲染，直接引用渲染器的输出缓冲区，绘制时不缩放也不复制 """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        if self.image is not None:
+            painter.drawImage((self.width() - self.image.width()) // 2, (self.height() - self.image.height()) // 2,
+                              self.image)
+        painter.end()
+
+class DiffView(QWidget):
+    """ 差异视图：以两个播放器当前解码的画面计算差值、热力图或划像，作为网格中的一个单元格显示
+
+    画面来自播放器视频控件的 QVideoSink，渲染请求交给刷新调度器合并，每个显示帧最多计算一次
+    """
+    closed = pyqtSignal()
+    
+    # 计算分辨率上限，超过时缩小到 1080p 以内
+    MAX_SIZE = (1920, 1080)
+    
+    def __init__(self, player_a, player_b, ui_scheduler, parent=None):
+        super().__init__(parent)
+        self.player_a = player_a
+        self.player_b = player_b
+        self.ui_scheduler = ui_scheduler
+        self.frames = {player_a: None, player_b: None}
+        self.renderer = None
+        self.samplers = None
+        self.rendered_frames = 0
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+        
+        # 标题栏：模式、划像位置、放大倍数和关闭按钮
+        title_layout = QHBoxLayout()
+        self.title_bar = QLabel(f"差异: {player_a.title_bar.text()} / {player_b.title_bar.text()}")
+        self.title_bar.setStyleSheet("color: #ffffff; font-weight: bold; padding: 5px; "
+                                     "background-color: #2a2a2a; border-radius: 3px;")
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("差值", "difference")
+        self.mode_combo.addItem("热力图", "heatmap")
+        self.mode_combo.addItem("划像", "wipe")
+        self.mode_combo.currentIndexChanged.connect(self.request_render)
+        self.gain_spinbox = QSpinBox()
+        self.gain_spinbox.setRange(1, 32)
+        self.gain_spinbox.setValue(4)
+        self.gain_spinbox.setPrefix("x")
+        self.gain_spinbox.valueChanged.connect(self.request_render)
+        self.close_button = QPushButton("关闭")
+        self.close_button.setFixedSize(50, 25)
+        self.close_button.clicked.connect(self.closed.emit)
+        title_layout.addWidget(self.title_bar, 1)
+        title_layout.addWidget(self.mode_combo)
+        title_layout.addWidget(self.gain_spinbox)
+        title_layout.addWidget(self.close_button)
+        
+        self.canvas = DiffCanvas()
+        
+        self.split_slider = QSlider(Qt.Orientation.Horizontal)
+        self.split_slider.setRange(0, 1000)
+        self.split_slider.setValue(500)
+        self.split_slider.valueChanged.connect(self.request_render)
+        
+        self.fps_label = QLabel("")
+        self.fps_label.setStyleSheet("color: #777777; font-size: 8pt;")
+        
+        layout.addLayout(title_layout)
+        layout.addWidget(self.canvas, 1)
+        layout.addWidget(self.split_slider)
+        layout.addWidget(self.fps_label)
+        
+        # 每秒统计一次实际渲染帧率
+        self.fps_timer = QTimer(self)
+        self.fps_timer.timeout.connect(self.update_fps_label)
+        self.fps_timer.start(1000)
+        
+        self.sinks = []
+        for player in (player_a, player_b):
+            sink = player.video_widget.videoSink()
+            handler = lambda frame, p=player: self.frame_changed(p, frame)
+            sink.videoFrameChanged.connect(handler)
+            self.sinks.append((sink, handler))
+    
+    def disconnect_sinks(self):
+        for sink, handler in self.sinks:
+            try:
+                sink.videoFrameChanged.disconnect(handler)
+            except TypeError:
+                pass
+        self.sinks = []
+        self.fps_timer.stop()
+    
+    def frame_changed(self, player, frame):
+        self.frames[player] = frame
+        self.request_render()
+    
+    def request_render(self):
+        self.ui_scheduler.request(self, self.render)
+    
+    @traced("ui")
+    def render(self):
+        frame_a, frame_b = self.frames[self.player_a], self.frames[self.player_b]
+        if frame_a is None or frame_b is None or not frame_a.isValid() or not frame_b.isValid():
+            return
+        
+        # 按画布尺寸（保持 A 的宽高比，不超过 MAX_SIZE）渲染，两路画面各缩放一次，显示时不再缩放；
+        # 尺寸变化时才重新创建渲染器、采样缓冲区和引用输出缓冲区的 QImage
+        size = frame_a.size().scaled(self.canvas.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        if size.width() > self.MAX_SIZE[0] or size.height() > self.MAX_SIZE[1]:
+            size = size.scaled(QSize(*self.MAX_SIZE), Qt.AspectRatioMode.KeepAspectRatio)
+        width, height = max(2, size.width() // 2 * 2), max(2, size.height() // 2 * 2)
+        if self.renderer is None or (self.renderer.width, self.renderer.height) != (width, height):
+            from frame_diff import DiffRenderer, FrameSampler
+            self.renderer = DiffRenderer(width, height)
+            self.samplers = (FrameSampler(width, height), FrameSampler(width, height))
+            self.canvas.image = QImage(self.renderer.output.data, width, height, width * 3,
+                                       QImage.Format.Format_RGB888)
+        
+        if not (copy_frame_to_array(frame_a, self.samplers[0], self.renderer.input_a) and
+                copy_frame_to_array(frame_b, self.samplers[1], self.renderer.input_b)):
+            return
+        # 渲染器原地写入输出缓冲区，画布的 QImage 随之更新
+        self.renderer.render(self.mode_combo.currentData(), self.split_slider.value() / 1000.0,
+                             self.gain_spinbox.value())
+        self.canvas.update()
+        self.rendered_frames += 1
+    
+    def update_fps_label(self):
+        self.fps_label.setText(f"差异计算 {self.rendered_frames} fps")
+        self.rendered_frames = 0
+
+# 可以直接读取的画面格式：打包 RGB 为 (每像素字节数, R/G/B 的字节位置)，
+# YUV 4:2:0 为 Y、U、V 的 (平面序号, 每像素字节数, 字节位置)
+RGB_FRAME_LAYOUTS = {
+    "Format_RGBA8888": (4, (0, 1, 2)),
+    "Format_RGBX8888": (4, (0, 1, 2)),
+    "Format_BGRA8888": (4, (2, 1, 0)),
+    "Format_BGRA8888_Premultiplied": (4, (2, 1, 0)),
+    "Format_BGRX8888": (4, (2, 1, 0)),
+    "Format_ARGB8888": (4, (1, 2, 3)),
+    "Format_ARGB8888_Premultiplied": (4, (1, 2, 3)),
+    "Format_XRGB8888": (4, (1, 2, 3)),
+    "Format_ABGR8888": (4, (3, 2, 1)),
+    "Format_XBGR8888": (4, (3, 2, 1)),
+}
+YUV_FRAME_PLANES = {
+    "Format_YUV420P": ((0, 1, 0), (1, 1, 0), (2, 1, 0)),
+    "Format_NV12": ((0, 1, 0), (1, 2, 0), (1, 2, 1)),
+    "Format_NV21": ((0, 1, 0), (1, 2, 1), (1, 2, 0)),
+}
+# QImage 格式的字节位置，32 位格式按机器字节序存放
+_ARGB32_OFFSETS = (1, 2, 3) if sys.byteorder == "big" else (2, 1, 0)
+RGB_IMAGE_LAYOUTS = {
+    "Format_RGB888": (3, (0, 1, 2)),
+    "Format_RGBX8888": (4, (0, 1, 2)),
+    "Format_RGBA8888": (4, (0, 1, 2)),
+    "Format_RGBA8888_Premultiplied": (4, (0, 1, 2)),
+    "Format_RGB32": (4, _ARGB32_OFFSETS),
+    "Format_ARGB32": (4, _ARGB32_OFFSETS),
+    "Format_ARGB32_Premultiplied": (4, _ARGB32_OFFSETS),
+}
+
+def mapped_plane(frame, index, rows):
+    """ 已映射的 QVideoFrame 的一个平面，返回 (行数, 行跨度) 的 uint8 视图，不复制 """
+    import numpy as np
+    
+    bits = frame.bits(index)
+    bits.setsize(frame.mappedBytes(index))
+    stride = frame.bytesPerLine(index)
+    return np.frombuffer(bits, dtype=np.uint8)[:rows * stride].reshape(rows, stride)
+
+def copy_frame_to_array(frame, sampler, array):
+    """ 把 QVideoFrame 缩放到数组尺寸并以 RGB 格式写入预先分配的 (高, 宽, 3) 数组
+
+    常见的 RGB 和 YUV 4:2:0 格式直接映射读取，不创建中间图像；其他格式（如硬件解码的画面）由 Qt 转换
+    """
+    import numpy as np
+    from PyQt6.QtMultimedia import QVideoFrame
+    
+    name = frame.pixelFormat().name
+    if (name in RGB_FRAME_LAYOUTS or name in YUV_FRAME_PLANES) and frame.map(QVideoFrame.MapMode.ReadOnly):
+        try:
+            width, height = frame.width(), frame.height()
+            if name in RGB_FRAME_LAYOUTS:
+                bpp, offsets = RGB_FRAME_LAYOUTS[name]
+                sampler.sample_rgb(mapped_plane(frame, 0, height), width, height, bpp, offsets, array)
+            else:
+                rows = (height, (height + 1) // 2, (height + 1) // 2)
+                planes = [(mapped_plane(frame, index, rows[i]), bpp, offset)
+                          for i, (index, bpp, offset) in enumerate(YUV_FRAME_PLANES[name])]
+                sampler.sample_yuv(planes, width, height, array)
+            return True
+        finally:
+            frame.unmap()
+    
+    image = frame.toImage()
+    if image.isNull():
+        return False
+    layout = RGB_IMAGE_LAYOUTS.get(image.format().name)
+    if layout is None:
+        image = image.convertToFormat(QImage.Format.Format_RGBX8888)
+        layout = RGB_IMAGE_LAYOUTS["Format_RGBX8888"]
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    plane = np.frombuffer(bits, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    sampler.sample_rgb(plane, image.width(), image.height(), layout[0], layout[1], array)
+    return True
+
+class QualitySignals(QObject):
+    """ 后台质量分析的进度和结果转到主线程 """
+    progress = pyqtSignal(float)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class AlignSignals(QObject):
+    """ 后台音频对齐的进度和结果转到主线程 """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class ScanSignals(QObject):
+    """ 文件夹扫描线程的信号，每批找到的文件和扫描完成时的全部文件 """
+    found = pyqtSignal(list)
+    finished = pyqtSignal(list)
+
+class FrameStepSignals(QObject):
+    """ 后台解码的逐帧步进画面转到主线程：播放器、步进序号和 RGB 帧 """
+    frame_ready = pyqtSignal(object, int, object)
+
+class MediaProbeSignals(QObject):
+    """ 后台探测和缩略图索引完成后把结果转到主线程 """
+    probed = pyqtSignal(str, object)
+    thumbnails_ready = pyqtSignal(str, object)
+    proxy_ready = pyqtSignal(str, int, object)
+
 class VideoComparisonTool(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -188,6 +1006,32 @@ class VideoComparisonTool(QMainWindow):
         """)
         self.add_button.clicked.connect(self.add_videos)
         
+        # 添加整个文件夹（可带文件名通配符），在后台线程中扫描，找到的视频陆续加入网格
+        self.add_folder_button = QPushButton("添加文件夹")
+        self.add_folder_button.setFixedSize(90, 30)
+        self.add_folder_button.clicked.connect(self.add_folder)
+        # 扫描完成后按文件名分成对比组，选择一组时只显示这一组
+        self.group_label = QLabel("对比组:")
+        self.group_combo = QComboBox()
+        self.group_combo.currentIndexChanged.connect(self.select_scan_group)
+        self.group_label.hide()
+        self.group_combo.hide()
+        self.scan_signals = ScanSignals(self)
+        self.scan_signals.found.connect(self.scan_found)
+        self.scan_signals.finished.connect(self.scan_finished)
+        self.scan_cancel_event = None
+        
+        # 会话：保存和恢复文件列表、布局、偏移和播放位置
+        self.save_session_button = QPushButton("保存会话")
+        self.save_session_button.setFixedSize(80, 30)
+        self.save_session_button.clicked.connect(self.save_session)
+        self.open_session_button = QPushButton("打开会话")
+        self.open_session_button.setFixedSize(80, 30)
+        self.open_session_button.clicked.connect(self.open_session)
+        # 当前会话文件，以及打开会话后还在加载解码器、暂时显示缩略图的播放器
+        self.session_path = None
+        self.session_pending = set()
+        
         # 播放/暂停按钮
         self.play_button = QPushButton()
         self.play_button.setFixedSize(60, 30)
@@ -196,6 +1040,14 @@ class VideoComparisonTool(QMainWindow):
         self.play_button.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
         self.play_button.clicked.connect(self.toggle_playback)
         
+        # 逐帧步进按钮，所有可见视频同时前进或后退一帧
+        self.prev_frame_button = QPushButton("◀|")
+        self.prev_frame_button.setFixedSize(40, 30)
+        self.prev_frame_button.clicked.connect(lambda: self.step_frame(-1))
+        self.next_frame_button = QPushButton("|▶")
+        self.next_frame_button.setFixedSize(40, 30)
+        self.next_frame_button.clicked.connect(lambda: self.step_frame(1))
+        
         # 静音所有按钮
         self.mute_all_button = QPushButton("全部静音")
         self.mute_all_button.setCheckable(True)
@@ -216,6 +1068,68 @@ class VideoComparisonTool(QMainWindow):
         self.videos_per_row_spinbox.setValue(3)
         self.videos_per_row_spinbox.valueChanged.connect(self.update_grid_layout)
         
+        # 分页：只有当前页的视频创建解码器，其余视频停放，内存占用只与每页数量有关
+        self.page_size_label = QLabel("每页:")
+        self.page_size_spinbox = QSpinBox()
+        self.page_size_spinbox.setRange(1, 64)
+        self.page_size_spinbox.setValue(16)
+        self.page_size_spinbox.valueChanged.connect(self.update_grid_layout)
+        self.prev_page_button = QPushButton("◀")
+        self.prev_page_button.setFixedSize(30, 30)
+        self.prev_page_button.clicked.connect(lambda: self.change_page(-1))
+        self.next_page_button = QPushButton("▶")
+        self.next_page_button.setFixedSize(30, 30)
+        self.next_page_button.clicked.connect(lambda: self.change_page(1))
+        self.page_label = QLabel("1/1")
+        self.current_page = 0
+        
+        # 同步方式：比例映射或绝对时间
+        self.sync_mode_label = QLabel("同步方式:")
+        self.sync_mode_combo = QComboBox()
+        self.sync_mode_combo.addItem("按比例", SYNC_PROPORTIONAL)
+        self.sync_mode_combo.addItem("绝对时间", SYNC_ABSOLUTE)
+        self.sync_mode_combo.currentIndexChanged.connect(self.update_sync_mode)
+        
+        # 导出漂移统计
+        self.sync_stats_button = QPushButton("同步统计")
+        self.sync_stats_button.setFixedSize(80, 30)
+        self.sync_stats_button.clicked.connect(self.export_sync_stats)
+        
+        # 按音轨自动对齐
+        self.align_button = QPushButton("音频对齐")
+        self.align_button.setFixedSize(80, 30)
+        self.align_button.clicked.connect(self.start_audio_align)
+        
+        # 性能统计：每个视频下方显示解码帧率、丢帧和跳转延迟，同时记录跟踪事件，可导出为 Chrome 跟踪文件
+        self.perf_checkbox = QCheckBox("性能统计")
+        self.perf_checkbox.setStyleSheet("color: #cccccc;")
+        self.perf_checkbox.toggled.connect(self.set_perf_enabled)
+        self.trace_button = QPushButton("导出跟踪")
+        self.trace_button.setFixedSize(80, 30)
+        self.trace_button.clicked.connect(self.export_trace)
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(1000)
+        self.perf_timer.timeout.connect(self.refresh_perf)
+        # 事件循环延迟：50ms 的定时器实际触发间隔比预期多出的部分
+        self.loop_lag = LoopLagMonitor(50)
+        self.lag_timer = QTimer(self)
+        self.lag_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.lag_timer.setInterval(50)
+        self.lag_timer.timeout.connect(self.loop_lag.tick)
+        self.loop_lag_label = QLabel("")
+        self.loop_lag_label.setStyleSheet("color: #e0a040; font-size: 8pt;")
+        self.loop_lag_label.hide()
+        
+        # 差异视图按钮
+        self.diff_button = QPushButton("差异视图")
+        self.diff_button.setFixedSize(80, 30)
+        self.diff_button.clicked.connect(self.open_diff_view)
+        
+        # 质量分析按钮
+        self.quality_button = QPushButton("质量分析")
+        self.quality_button.setFixedSize(80, 30)
+        self.quality_button.clicked.connect(self.start_quality_analysis)
+        
         # 导出视频按钮
         self.export_button = QPushButton("导出视频")
         self.export_button.setFixedSize(100, 30)
@@ -233,6 +1147,173 @@ class VideoComparisonTool(QMainWindow):
         """)
         self.export_button.clicked.connect(self.export_video)
         
+        # 导出模式
+        self.export_mode_label = QLabel("导出模式:")
+        self.export_mode_combo = QComboBox()
+        self.export_mode_combo.addItem("并行预缩放", "tiled")
+        self.export_mode_combo.addItem("分段并行", "segmented")
+        self.export_mode_combo.addItem("单次编码", "single")
+        self.export_mode_combo.setCurrentIndex(0)
+        
+        # 导出质量配置（草稿/审阅/母版）
+        self.export_profile_label = QLabel("导出质量:")
+        self.export_profile_combo = QComboBox()
+        for name, profile in EXPORT_PROFILES.items():
+            self.export_profile_combo.addItem(profile["label"], name)
+        self.export_profile_combo.setCurrentIndex(self.export_profile_combo.findData(DEFAULT_PROFILE))
+        
+        # 导出区间、输出帧率和时长策略，放在主进度条下方
+        self.range_panel = QWidget()
+        range_layout = QHBoxLayout(self.range_panel)
+        range_layout.setContentsMargins(10, 0, 10, 0)
+        self.export_range = [None, None]
+        self.range_in_button = QPushButton("设为入点")
+        self.range_in_button.setFixedSize(80, 26)
+        self.range_in_button.clicked.connect(self.set_export_in)
+        self.range_out_button = QPushButton("设为出点")
+        self.range_out_button.setFixedSize(80, 26)
+        self.range_out_button.clicked.connect(self.set_export_out)
+        self.range_clear_button = QPushButton("清除区间")
+        self.range_clear_button.setFixedSize(80, 26)
+        self.range_clear_button.clicked.connect(self.clear_export_range)
+        self.range_label = QLabel("")
+        self.export_fps_label = QLabel("输出帧率:")
+        self.export_fps_combo = QComboBox()
+        self.export_fps_combo.addItem("按配置", None)
+        for fps in (24, 25, 30, 50, 60):
+            self.export_fps_combo.addItem(str(fps), fps)
+        self.duration_policy_label = QLabel("输出时长:")
+        self.duration_policy_combo = QComboBox()
+        self.duration_policy_combo.addItem("最长的视频", "longest")
+        self.duration_policy_combo.addItem("最短的视频", "shortest")
+        self.duration_policy_combo.addItem("第一个视频", "reference")
+        # 附加输出与主输出共用一次解码和拼接，保存在主输出旁边
+        self.export_targets_label = QLabel("同时导出:")
+        self.export_target_checkboxes = {}
+        for name, label in (("preview", "网页预览"), ("gif", "GIF"), ("contact", "联系表")):
+            self.export_target_checkboxes[name] = QCheckBox(label)
+        range_layout.addWidget(self.range_in_button)
+        range_layout.addWidget(self.range_out_button)
+        range_layout.addWidget(self.range_clear_button)
+        range_layout.addWidget(self.range_label)
+        range_layout.addStretch()
+        range_layout.addWidget(self.export_fps_label)
+        range_layout.addWidget(self.export_fps_combo)
+        range_layout.addWidget(self.duration_policy_label)
+        range_layout.addWidget(self.duration_policy_combo)
+        range_layout.addWidget(self.export_targets_label)
+        for checkbox in self.export_target_checkboxes.values():
+            range_layout.addWidget(checkbox)
+        
+        # 同时运行的导出任务数
+        self.export_concurrency_label = QLabel("并行导出:")
+        self.export_concurrency_spinbox = QSpinBox()
+        self.export_concurrency_spinbox.setRange(1, 8)
+        self.export_concurrency_spinbox.setValue(1)
+        self.export_concurrency_spinbox.valueChanged.connect(self.update_export_concurrency)
+        
+        # 导出进度区域（仅在导出时显示）
+        self.export_panel = QWidget()
+        export_layout = QHBoxLayout(self.export_panel)
+        export_layout.setContentsMargins(10, 0, 10, 5)
+        
+        self.export_progress_bar = QProgressBar()
+        self.export_progress_bar.setRange(0, 1000)
+        self.export_progress_bar.setTextVisible(True)
+        self.export_progress_bar.setFormat("%p%")
+        self.export_progress_bar.setStyleSheet("""
+            QProgressBar {
+                background-color: #333333;
+                color: white;
+                border: 1px solid #444444;
+                border-radius: 4px;
+                text-align: center;
+                height: 18px;
+            }
+            QProgressBar::chunk {
+                background-color: #4caf50;
+                border-radius: 3px;
+            }
+        """)
+        
+        self.export_status_label = QLabel("")
+        self.export_status_label.setStyleSheet("color: #aaaaaa;")
+        
+        self.cancel_export_button = QPushButton("取消导出")
+        self.cancel_export_button.setFixedSize(80, 25)
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        
+        export_layout.addWidget(self.export_progress_bar, 1)
+        export_layout.addWidget(self.export_status_label)
+        export_layout.addWidget(self.cancel_export_button)
+        self.export_panel.hide()
+        
+        # 导出任务队列在第一次导出时创建，回调来自工作线程，通过信号转到主线程
+        self.export_signals = ExportQueueSignals(self)
+        self.export_signals.job_started.connect(self.export_started)
+        self.export_signals.job_progress.connect(self.update_export_progress)
+        self.export_signals.job_finished.connect(self.export_finished)
+        self.export_queue = None
+        self.export_progress = {}
+        
+        # 媒体探测缓存在添加第一个视频时创建，每个文件只运行一次 ffprobe，结果保存在磁盘上
+        self.probe_cache = None
+        self.probe_signals = MediaProbeSignals(self)
+        self.probe_signals.probed.connect(self.media_probed)
+        self.probe_signals.thumbnails_ready.connect(self.thumbnails_ready)
+        self.probe_signals.proxy_ready.connect(self.proxy_ready)
+        self.thumbnail_executor = None
+        self.media_info = {}
+        
+        # 质量分析结果，显示在主进度条下方
+        self.quality_panel = QWidget()
+        quality_layout = QVBoxLayout(self.quality_panel)
+        quality_layout.setContentsMargins(10, 0, 10, 0)
+        quality_header = QHBoxLayout()
+        self.quality_status_label = QLabel("")
+        self.quality_status_label.setStyleSheet("color: #aaaaaa;")
+        self.quality_backend_combo = QComboBox()
+        self.quality_backend_combo.addItem("NumPy", "numpy")
+        self.quality_backend_combo.addItem("FFmpeg滤镜", "ffmpeg")
+        self.quality_metric_combo = QComboBox()
+        self.quality_metric_combo.currentIndexChanged.connect(self.update_quality_metric)
+        self.worst_frame_button = QPushButton("下一个最差帧")
+        self.worst_frame_button.clicked.connect(self.jump_to_worst_frame)
+        self.quality_export_button = QPushButton("保存结果")
+        self.quality_export_button.clicked.connect(self.export_quality_result)
+        self.quality_close_button = QPushButton("关闭")
+        self.quality_close_button.clicked.connect(self.close_quality_panel)
+        quality_header.addWidget(QLabel("计算方式:"))
+        quality_header.addWidget(self.quality_backend_combo)
+        quality_header.addWidget(QLabel("指标:"))
+        quality_header.addWidget(self.quality_metric_combo)
+        quality_header.addWidget(self.worst_frame_button)
+        quality_header.addWidget(self.quality_export_button)
+        quality_header.addWidget(self.quality_status_label, 1)
+        quality_header.addWidget(self.quality_close_button)
+        self.quality_graph = QualityGraph()
+        self.quality_graph.seek_requested.connect(self.seek_quality_frame)
+        quality_layout.addLayout(quality_header)
+        quality_layout.addWidget(self.quality_graph)
+        self.quality_panel.hide()
+        
+        self.align_signals = AlignSignals(self)
+        self.align_signals.progress.connect(self.update_align_progress)
+        self.align_signals.finished.connect(self.audio_align_finished)
+        self.align_signals.failed.connect(self.audio_align_failed)
+        self.align_cancel_event = None
+        self.align_players = {}
+        
+        self.quality_signals = QualitySignals(self)
+        self.quality_signals.progress.connect(self.update_quality_progress)
+        self.quality_signals.finished.connect(self.quality_finished)
+        self.quality_signals.failed.connect(self.quality_failed)
+        self.quality_cancel_event = None
+        self.quality_result = None
+        self.quality_reference = None
+        self.quality_names = {}
+        self.worst_frame_index = 0
+        
         # 进度条
         self.master_slider = QSlider(Qt.Orientation.Horizontal)
         self.master_slider.setStyleSheet("""
@@ -256,7 +1337,23 @@ class VideoComparisonTool(QMainWindow):
                 border: 1px solid #ffa500;
             }
         """)
-        self.master_slider.sliderMoved.connect(self.sync_players_position)
+        # 拖动时只显示缩略图，松开或停顿后才真正跳转
+        self.master_slider.sliderMoved.connect(self.scrub_preview)
+        self.master_slider.sliderReleased.connect(self.commit_scrub)
+        self.scrub_timer = QTimer(self)
+        self.scrub_timer.setSingleShot(True)
+        self.scrub_timer.setInterval(250)
+        self.scrub_timer.timeout.connect(self.commit_scrub)
+        
+        # 网格中播放低分辨率代理，单独显示一个视频时播放原始文件
+        self.proxy_checkbox = QCheckBox("代理播放")
+        self.proxy_checkbox.setChecked(True)
+        self.proxy_checkbox.setStyleSheet("color: #cccccc;")
+        self.proxy_checkbox.toggled.connect(self.update_proxies)
+        
+        # 跳转时吸附到最近的关键帧
+        self.snap_keyframe_checkbox = QCheckBox("吸附关键帧")
+        self.snap_keyframe_checkbox.setStyleSheet("color: #cccccc;")
         
         # 时间标签
         self.master_time_label = QLabel("00:00:00 / 00:00:00")
@@ -292,10 +1389,21 @@ class VideoComparisonTool(QMainWindow):
         self.volume_label = QLabel("音量:")
         self.volume_label.setStyleSheet("color: #cccccc;")
         
+        # 界面刷新统计标签
+        self.ui_rate_label = QLabel("")
+        self.ui_rate_label.setStyleSheet("color: #777777; font-size: 8pt;")
+        
         # 添加到控制布局
         control_layout.addWidget(self.add_button)
+        control_layout.addWidget(self.add_folder_button)
+        control_layout.addWidget(self.group_label)
+        control_layout.addWidget(self.group_combo)
+        control_layout.addWidget(self.open_session_button)
+        control_layout.addWidget(self.save_session_button)
         control_layout.addSpacing(10)
+        control_layout.addWidget(self.prev_frame_button)
         control_layout.addWidget(self.play_button)
+        control_layout.addWidget(self.next_frame_button)
         control_layout.addSpacing(10)
         control_layout.addWidget(self.mute_all_button)
         control_layout.addSpacing(20)
@@ -305,27 +1413,100 @@ class VideoComparisonTool(QMainWindow):
         control_layout.addWidget(self.videos_per_row_label)
         control_layout.addWidget(self.videos_per_row_spinbox)
         control_layout.addSpacing(10)
+        control_layout.addWidget(self.page_size_label)
+        control_layout.addWidget(self.page_size_spinbox)
+        control_layout.addWidget(self.prev_page_button)
+        control_layout.addWidget(self.page_label)
+        control_layout.addWidget(self.next_page_button)
+        control_layout.addSpacing(10)
+        control_layout.addWidget(self.sync_mode_label)
+        control_layout.addWidget(self.sync_mode_combo)
+        control_layout.addWidget(self.sync_stats_button)
+        control_layout.addWidget(self.align_button)
+        control_layout.addWidget(self.snap_keyframe_checkbox)
+        control_layout.addWidget(self.proxy_checkbox)
+        control_layout.addWidget(self.quality_button)
+        control_layout.addWidget(self.diff_button)
+        control_layout.addWidget(self.perf_checkbox)
+        control_layout.addWidget(self.trace_button)
+        control_layout.addSpacing(10)
         control_layout.addWidget(self.export_button)
+        control_layout.addWidget(self.export_mode_label)
+        control_layout.addWidget(self.export_mode_combo)
+        control_layout.addWidget(self.export_profile_label)
+        control_layout.addWidget(self.export_profile_combo)
+        control_layout.addWidget(self.export_concurrency_label)
+        control_layout.addWidget(self.export_concurrency_spinbox)
         control_layout.addSpacing(20)
         control_layout.addWidget(self.volume_label)
         control_layout.addWidget(self.volume_slider)
         control_layout.addStretch()
+        control_layout.addWidget(self.loop_lag_label)
+        control_layout.addWidget(self.ui_rate_label)
+        control_layout.addSpacing(10)
         control_layout.addWidget(self.master_time_label)
         
         # 主布局
         self.main_layout.addWidget(self.video_grid, 1)
         self.main_layout.addWidget(self.master_slider)
+        self.main_layout.addWidget(self.range_panel)
+        self.main_layout.addWidget(self.quality_panel)
         self.main_layout.addWidget(self.control_panel)
+        self.main_layout.addWidget(self.export_panel)
         
-        # 视频播放器列表
+        # 视频播放器列表，移除的播放器放回池中复用
         self.players = []
+        self.player_pool = PlayerPool(self.create_player)
+        # 每个播放器当前所在的网格行列
+        self.grid_positions = {}
+        
+        # 合并所有播放器和主进度条的位置刷新，每个显示帧最多刷新一次
+        self.ui_scheduler = UiUpdateScheduler(parent=self)
+        self.pending_master_position = 0
+        self.displayed_master_time = None
+        
+        # 每秒显示一次界面刷新统计
+        self.ui_scheduler.stats_timer.timeout.connect(self.update_ui_rate_label)
+        
+        # 主时钟同步引擎
+        self.sync_engine = SyncEngine(self.player_fps, self)
+        self.sync_engine.position_changed.connect(self.update_master_position)
+        self.sync_engine.playback_finished.connect(self.playback_finished)
         self.current_grid_size = (2, 2)
         
+        # 每个停放的播放器停放时主时钟的位置
+        self.parked_master_position = {}
+        
+        # 代理缓存在第一次需要代理时创建；布局或窗口大小变化后稍等再按单元格尺寸请求代理
+        self.proxy_cache = None
+        self.proxy_timer = QTimer(self)
+        self.proxy_timer.setSingleShot(True)
+        self.proxy_timer.setInterval(500)
+        self.proxy_timer.timeout.connect(self.update_proxies)
+        # 双击单独显示的播放器
+        self.focused_player = None
+        # 差异视图，作为网格中的额外单元格
+        self.diff_view = None
+        # 逐帧步进时每个播放器的解码帧来源，开始播放后关闭
+        self.frame_sources = {}
+        # 逐帧解码在工作线程中进行，每个播放器同时只有一个任务，只保留最新的请求
+        self.frame_step_signals = FrameStepSignals(self)
+        self.frame_step_signals.frame_ready.connect(self.frame_step_ready)
+        self.frame_step_generation = 0
+        self.frame_step_pending = {}
+        self.frame_step_running = set()
+        self.frame_step_lock = threading.Lock()
+        self.frame_step_executor = None
+        
         # 更新UI
         self.update_ui_style()
         
         # 初始化网格布局
         self.update_grid_layout()
+        
+        # 设置了 VCT_TRACE 时启动即开启性能统计
+        if tracer.enabled:
+            self.perf_checkbox.setChecked(True)
     
     def update_ui_style(self):
         # 设置深色主题
@@ -385,60 +1566,409 @@ class VideoComparisonTool(QMainWindow):
     def add_videos(self):
         file_dialog = QFileDialog()
         file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
-        file_dialog.setNameFilter("视频文件 (*.mp4 *.avi *.mkv *.mov *.wmv *.flv)")
+        file_dialog.setNameFilter(video_file_filter())
         
         if file_dialog.exec():
-            file_paths = file_dialog.selectedFiles()
-            for file_path in file_paths:
-                player = VideoPlayer(len(self.players))
-                player.load_video(file_path)
-                self.players.append(player)
-                
-                # 连接主进度条更新
-                player.media_player.durationChanged.connect(self.update_master_duration)
-                player.media_player.positionChanged.connect(self.update_master_position)
-                
-                # 如果这是第一个视频，设置为主控制
-                if len(self.players) == 1:
-                    self.master_slider.setRange(0, player.media_player.duration())
-            
-            self.update_grid_layout()
+            self.add_video_files(file_dialog.selectedFiles())
     
-    def update_grid_layout(self):
-        # 清除现有布局
-        for i in reversed(range(self.grid_layout.count())): 
-            self.grid_layout.itemAt(i).widget().setParent(None)
+    def add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "添加文件夹")
+        if not directory:
+            return
+        pattern, ok = QInputDialog.getText(self, "添加文件夹", "文件名通配符（包含子文件夹）:", text="*")
+        if ok:
+            self.start_scan([directory], pattern.strip() or None)
+    
+    def start_scan(self, paths, name_pattern=None):
+        # 目录读取和文件头检查都在后台线程中进行，界面线程不做任何磁盘操作
+        if self.scan_cancel_event is not None:
+            self.scan_cancel_event.set()
+        self.scan_cancel_event = cancel_event = threading.Event()
         
-        # 获取每行视频数量
-        videos_per_row = self.videos_per_row_spinbox.value()
+        def found(batch):
+            # 已被新的扫描取代时不再交出结果
+            if not cancel_event.is_set():
+                self.scan_signals.found.emit(batch)
+        
+        def run():
+            from media_scan import ScanCancelled, scan_paths
+            try:
+                found_paths = scan_paths(paths, name_pattern=name_pattern, on_batch=found, cancel_event=cancel_event)
+            except ScanCancelled:
+                return
+            self.scan_signals.finished.emit(found_paths)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def scan_found(self, paths):
+        self.add_video_files(paths)
+    
+    def scan_finished(self, paths):
+        from media_scan import group_files
+        groups = group_files(paths)
+        print(f"扫描完成: {len(paths)} 个视频，{len(groups)} 组")
+        
+        # 只有一组时不需要选择
+        self.group_combo.blockSignals(True)
+        self.group_combo.clear()
+        self.group_combo.addItem(f"全部 ({len(paths)})", paths)
+        for name, group in groups.items():
+            self.group_combo.addItem(f"{name} ({len(group)})", group)
+        self.group_combo.blockSignals(False)
+        self.group_label.setVisible(len(groups) > 1)
+        self.group_combo.setVisible(len(groups) > 1)
+    
+    def select_scan_group(self, index):
+        paths = self.group_combo.itemData(index)
+        if paths is None:
+            return
+        # 播放器放回池中复用，探测信息和缩略图已经缓存，切换组很快
+        self.clear_players()
+        self.add_video_files(paths)
+    
+    def create_player(self, index):
+        # 只在新建播放器时连接信号，从池中复用的播放器保留原有连接
+        player = VideoPlayer(index)
+        player.ui_scheduler = self.ui_scheduler
+        player.media_player.durationChanged.connect(self.update_master_duration)
+        player.remove_requested.connect(self.remove_player)
+        player.replace_requested.connect(self.replace_player)
+        player.focus_requested.connect(self.focus_player)
+        player.loaded.connect(self.player_loaded)
+        return player
+    
+    def append_player(self, file_path, muted=False):
+        player = self.player_pool.acquire(len(self.players))
+        player.audio_output.setVolume(self.volume_slider.value() / 100.0)
+        player.set_muted(muted or self.mute_all_button.isChecked())
+        player.set_perf_enabled(self.perf_checkbox.isChecked())
+        player.load_video(file_path)
+        self.players.append(player)
+        return player
+    
+    def add_video_files(self, file_paths):
+        for file_path in file_paths:
+            self.append_player(file_path)
         
-        # 如果没有播放器，直接返回
+        self.start_probe(file_paths)
+        self.update_grid_layout()
+    
+    def session_state(self):
+        return {
+            "videos": [{"path": p.file_path, "muted": p.mute_button.isChecked(),
+                        "offset_ms": self.sync_engine.offsets.get(p, 0)} for p in self.players if p.file_path],
+            "layout": "zigzag" if self.layout_type_combo.currentIndex() == 0 else "grid",
+            "videos_per_row": self.videos_per_row_spinbox.value(),
+            "page_size": self.page_size_spinbox.value(),
+            "current_page": self.current_page,
+            "volume": self.volume_slider.value(),
+            "mute_all": self.mute_all_button.isChecked(),
+            "sync_mode": self.sync_mode_combo.currentData(),
+            "position": self.sync_engine.position(),
+            "export_range": list(self.export_range),
+        }
+    
+    def save_session(self):
         if not self.players:
+            print("没有视频可以保存")
             return
-            
-        # 计算行数
-        num_videos = len(self.players)
-        rows = (num_videos + videos_per_row - 1) // videos_per_row  # 向上取整
-        
-        # 添加播放器到网格
-        if self.layout_type_combo.currentIndex() == 0:  # Z字形布局
-            for i, player in enumerate(self.players):
-                row = i // videos_per_row
-                
-                # 如果是奇数行，则反向计算列位置
-                if row % 2 == 0:  # 偶数行（第一行是0）
-                    col = i % videos_per_row
-                else:  # 奇数行
-                    col = videos_per_row - 1 - (i % videos_per_row)
-                
-                self.grid_layout.addWidget(player, row, col)
-                player.show()
-        else:  # 普通网格布局
-            for i, player in enumerate(self.players):
-                row = i // videos_per_row
-                col = i % videos_per_row
-                self.grid_layout.addWidget(player, row, col)
+        from session import SESSION_EXTENSION, save_session
+        default_path = self.session_path or os.path.expanduser("~") + "/comparison" + SESSION_EXTENSION
+        session_path, _ = QFileDialog.getSaveFileName(self, "保存会话", default_path,
+                                                      f"对比会话 (*{SESSION_EXTENSION})")
+        if not session_path:
+            return
+        if not session_path.lower().endswith(SESSION_EXTENSION):
+            session_path += SESSION_EXTENSION
+    
+        # 探测信息和缩略图索引一起保存，下次打开时不需要等待 ffprobe
+        thumbnails = {p.file_path: p.thumbnail_index for p in self.players if p.thumbnail_index is not None}
+        try:
+            save_session(session_path, self.session_state(), self.media_info, thumbnails)
+        except OSError as e:
+            print(f"无法保存会话: {e}")
+            return
+        self.session_path = session_path
+        self.setWindowTitle(f"视频对比工具 - {os.path.basename(session_path)}")
+    
+    def open_session(self):
+        from session import SESSION_EXTENSION
+        session_path, _ = QFileDialog.getOpenFileName(self, "打开会话", "", f"对比会话 (*{SESSION_EXTENSION})")
+        if session_path:
+            self.open_session_file(session_path)
+    
+    def open_session_file(self, session_path):
+        from session import load_session
+        try:
+            state, index = load_session(session_path)
+        except (OSError, ValueError) as e:
+            print(f"无法打开会话: {e}")
+            return
+        for missing in state["missing"]:
+            print(f"找不到视频: {missing}")
+    
+        self.clear_players()
+    
+        # 先恢复布局和全局控件，再添加视频
+        self.layout_type_combo.setCurrentIndex(0 if state.get("layout", "zigzag") == "zigzag" else 1)
+        self.videos_per_row_spinbox.setValue(state.get("videos_per_row", 3))
+        self.page_size_spinbox.setValue(state.get("page_size", 16))
+        self.volume_slider.setValue(state.get("volume", 50))
+        self.mute_all_button.setChecked(state.get("mute_all", False))
+        sync_index = self.sync_mode_combo.findData(state.get("sync_mode", SYNC_PROPORTIONAL))
+        self.sync_mode_combo.setCurrentIndex(max(0, sync_index))
+        self.export_range = list(state.get("export_range") or [None, None])
+        self.update_range_label()
+    
+        # 索引中的探测信息放入缓存，start_probe 会立即确定时长；缩略图直接使用，网格在解码器就绪前就有画面
+        probe_cache = self.get_probe_cache()
+        for video in state["videos"]:
+            info = index.info(video["path"])
+            if info is not None:
+                probe_cache.put(video["path"], info)
+            player = self.append_player(video["path"], video.get("muted", False))
+            self.sync_engine.set_offset(player, video.get("offset_ms", 0))
+            player.thumbnail_index = index.thumbnails(video["path"])
+        self.start_probe([video["path"] for video in state["videos"]])
+    
+        # 主时钟回到保存时的位置，可见的播放器激活时直接跳到对应画面，多个解码器同时加载
+        self.update_master_duration(0)
+        self.sync_engine.seek(state.get("position", 0))
+        self.current_page = state.get("current_page", 0)
+        self.update_grid_layout()
+    
+        # 布局生效后缩略图才能按单元格大小缩放
+        self.grid_layout.activate()
+        master = self.sync_engine.position()
+        self.session_pending = {p for p in self.players if not p.parked}
+        for player in self.session_pending:
+            player.show_thumbnail(self.sync_engine.preview_target(player, master))
+    
+        self.session_path = session_path
+        self.setWindowTitle(f"视频对比工具 - {os.path.basename(session_path)}")
+    
+    def player_loaded(self, player):
+        if player not in self.session_pending:
+            return
+        self.session_pending.discard(player)
+        if not self.master_slider.isSliderDown() and player not in self.frame_sources:
+            player.show_video()
+    
+    def clear_players(self):
+        # 关闭当前的所有视频
+        if self.diff_view is not None:
+            self.close_diff_view()
+        self.focused_player = None
+        for player in list(self.players):
+            self.remove_player(player)
+    
+    def remove_player(self, player):
+        if player not in self.players:
+            return
+        self.players.remove(player)
+        self.session_pending.discard(player)
+        self.close_frame_sources([player])
+        if self.focused_player is player:
+            self.focused_player = None
+        if self.diff_view is not None and player in (self.diff_view.player_a, self.diff_view.player_b):
+            self.close_diff_view()
+        self.detach_from_grid(player)
+        self.sync_engine.remove_player(player)
+        self.parked_master_position.pop(player, None)
+        for i, remaining in enumerate(self.players):
+            remaining.index = i
+        self.player_pool.release(player)
+        
+        if not self.players and self.sync_engine.is_playing():
+            self.sync_engine.pause()
+            self.playback_finished()
+        self.update_master_duration(0)
+        self.update_grid_layout()
+    
+    def replace_player(self, player):
+        file_path, _ = QFileDialog.getOpenFileName(self, "替换视频", "", video_file_filter())
+        if not file_path:
+            return
+        
+        # 同一个播放器换一个文件，下次布局时按主时钟位置重新激活
+        self.close_frame_sources([player])
+        player.park()
+        player.reset(player.index)
+        player.set_muted(self.mute_all_button.isChecked())
+        player.load_video(file_path)
+        self.sync_engine.remove_player(player)
+        self.parked_master_position.pop(player, None)
+        self.start_probe([file_path])
+        self.update_master_duration(0)
+        self.update_grid_layout()
+    
+    @traced("ui")
+    def update_grid_layout(self):
+        # 获取每行视频数量
+        videos_per_row = self.videos_per_row_spinbox.value()
+        
+        # 当前页的视频
+        page_size = self.page_size_spinbox.value()
+        pages = max(1, (len(self.players) + page_size - 1) // page_size)
+        self.current_page = min(self.current_page, pages - 1)
+        self.page_label.setText(f"{self.current_page + 1}/{pages}")
+        self.prev_page_button.setEnabled(self.current_page > 0)
+        self.next_page_button.setEnabled(self.current_page < pages - 1)
+        start = self.current_page * page_size
+        visible = self.players[start:start + page_size]
+        if self.focused_player in self.players:
+            visible = [self.focused_player]
+        elif self.diff_view is not None:
+            # 差异视图的两个视频必须在解码，不在当前页时也一起显示
+            for player in (self.diff_view.player_a, self.diff_view.player_b):
+                if player not in visible:
+                    visible.append(player)
+        
+        # 先停放不可见的播放器释放解码器，再激活当前页
+        self.close_frame_sources([p for p in self.frame_sources if p not in visible])
+        master = self.sync_engine.position()
+        for player in self.players:
+            if player not in visible and player.park():
+                self.parked_master_position[player] = master
+        self.activate_players(visible)
+        
+        # 计算每个播放器的行列
+        positions = {}
+        for i, player in enumerate(visible):
+            row = i // videos_per_row
+            col = i % videos_per_row
+            # Z字形布局的奇数行反向排列
+            if self.layout_type_combo.currentIndex() == 0 and row % 2 == 1:
+                col = videos_per_row - 1 - col
+            positions[player] = (row, col)
+        
+        # 差异视图放在最后一个视频之后
+        if self.diff_view is not None and self.focused_player not in self.players:
+            i = len(visible)
+            row, col = i // videos_per_row, i % videos_per_row
+            if self.layout_type_combo.currentIndex() == 0 and row % 2 == 1:
+                col = videos_per_row - 1 - col
+            positions[self.diff_view] = (row, col)
+        
+        # 只移动行列发生变化的播放器，位置不变的保持原样
+        for player, cell in list(self.grid_positions.items()):
+            if positions.get(player) != cell:
+                self.detach_from_grid(player)
+                if player not in positions:
+                    player.hide()
+        for player, cell in positions.items():
+            if player not in self.grid_positions:
+                self.grid_layout.addWidget(player, *cell)
+                self.grid_positions[player] = cell
                 player.show()
+        self.proxy_timer.start()
+    
+    def detach_from_grid(self, player):
+        if self.grid_positions.pop(player, None) is not None:
+            self.grid_layout.removeWidget(player)
+    
+    @traced("ui")
+    def activate_players(self, players):
+        # 主时钟自停放以来没有移动时恢复到停放时的精确位置，否则跳到主时钟对应的位置
+        master = self.sync_engine.position()
+        playing = self.sync_engine.is_playing()
+        for player in players:
+            if not player.parked:
+                continue
+            position = None
+            if playing or master != self.parked_master_position.pop(player, None):
+                position = self.sync_engine.preview_target(player, master)
+            player.activate(position, playing)
+        self.sync_engine.set_players(players)
+    
+    def open_diff_view(self):
+        players = [p for p in self.players if p.file_path]
+        if len(players) < 2:
+            print("差异视图需要两个视频")
+            return
+        try:
+            import frame_diff
+        except ImportError:
+            print("差异视图需要安装 numpy")
+            return
+        
+        names = [f"{i + 1}. {p.title_bar.text()}" for i, p in enumerate(players)]
+        name_a, ok = QInputDialog.getItem(self, "差异视图", "视频 A:", names, 0, False)
+        if not ok:
+            return
+        name_b, ok = QInputDialog.getItem(self, "差异视图", "视频 B:", names, min(1, len(names) - 1), False)
+        if not ok or name_a == name_b:
+            return
+        
+        self.close_diff_view()
+        self.diff_view = DiffView(players[names.index(name_a)], players[names.index(name_b)], self.ui_scheduler)
+        self.diff_view.closed.connect(self.close_diff_view)
+        self.update_grid_layout()
+    
+    def close_diff_view(self):
+        if self.diff_view is None:
+            return
+        diff_view, self.diff_view = self.diff_view, None
+        diff_view.disconnect_sinks()
+        self.detach_from_grid(diff_view)
+        diff_view.hide()
+        diff_view.deleteLater()
+        self.update_grid_layout()
+    
+    def focus_player(self, player):
+        self.focused_player = None if self.focused_player is player else player
+        self.update_grid_layout()
+    
+    def get_proxy_cache(self):
+        if self.proxy_cache is None:
+            from proxy_cache import ProxyCache
+            self.proxy_cache = ProxyCache()
+        return self.proxy_cache
+    
+    def update_proxies(self):
+        # 只有一个视频可见或关闭代理时播放原始文件
+        visible = self.sync_engine.players
+        use_proxy = self.proxy_checkbox.isChecked() and len(visible) > 1
+        diff_players = (self.diff_view.player_a, self.diff_view.player_b) if self.diff_view is not None else ()
+        for player in visible:
+            info = self.media_info.get(player.file_path)
+            height = None
+            # 差异视图按原始画面计算
+            if use_proxy and info and player not in diff_players:
+                from proxy_cache import proxy_height_for
+                tile_height = int(player.video_stack.height() * player.devicePixelRatioF())
+                height = proxy_height_for(tile_height, info["height"])
+            if height is None:
+                player.set_proxy(None)
+            elif height != player.proxy_height:
+                player.proxy_height = height
+                self.get_proxy_cache().request(player.file_path, height, self.probe_signals.proxy_ready.emit)
+        self.update_proxies_in_use()
+    
+    def proxy_ready(self, file_path, height, proxy_path):
+        if proxy_path is None:
+            # 生成失败时清除请求的档位，之后的布局更新会重新请求（代理缓存限制了重试频率）
+            for player in self.sync_engine.players:
+                if player.file_path == os.path.abspath(file_path) and player.proxy_height == height:
+                    player.proxy_height = None
+            return
+        # 代理生成期间单元格尺寸可能已经变化，只应用仍然需要的档位
+        for player in self.sync_engine.players:
+            if player.file_path == os.path.abspath(file_path) and player.proxy_height == height:
+                player.set_proxy(proxy_path, height)
+        self.update_proxies_in_use()
+    
+    def update_proxies_in_use(self):
+        if self.proxy_cache is not None:
+            self.proxy_cache.set_in_use(p.proxy_path for p in self.players if p.proxy_path)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.proxy_timer.start()
+    
+    def change_page(self, step):
+        self.current_page = max(0, self.current_page + step)
+        self.update_grid_layout()
     
     def toggle_playback(self):
         if not self.players:
@@ -446,12 +1976,339 @@ class VideoComparisonTool(QMainWindow):
             
         if self.play_button.isChecked():
             self.play_button.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPause))
-            for player in self.players:
-                player.media_player.play()
+            self.close_frame_sources()
+            self.sync_engine.play()
         else:
             self.play_button.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
-            for player in self.players:
-                player.media_player.pause()
+            self.sync_engine.pause()
+    
+    def step_frame(self, step):
+        visible = self.sync_engine.players
+        if not visible:
+            return
+        if self.sync_engine.is_playing():
+            self.play_button.setChecked(False)
+            self.toggle_playback()
+        
+        # 以第一个可见视频的帧为步长，换算成主时钟位置
+        reference = visible[0]
+        fps = self.player_fps(reference) or 30.0
+        reference_ms = self.sync_engine.preview_target(reference, self.sync_engine.position())
+        frame = max(0, int(round(reference_ms * fps / 1000)) + step)
+        master = self.sync_engine.master_for(reference, frame * 1000 / fps)
+        
+        # 每个视频显示解码层给出的精确帧（在工作线程中解码），媒体播放器同时跳到同一位置以便继续播放
+        self.frame_step_generation += 1
+        for player in visible:
+            source = self.get_frame_source(player)
+            if source is not None:
+                self.request_step_frame(player, source, self.sync_engine.preview_target(player, master))
+        self.sync_engine.seek(master)
+    
+    def request_step_frame(self, player, source, position):
+        with self.frame_step_lock:
+            self.frame_step_pending[player] = (source, position, self.frame_step_generation)
+            if player in self.frame_step_running:
+                # 正在解码的任务结束后会取走这个最新的请求
+                return
+            self.frame_step_running.add(player)
+        if self.frame_step_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.frame_step_executor = ThreadPoolExecutor(max_workers=4)
+        self.frame_step_executor.submit(self.decode_step_frames, player)
+    
+    def decode_step_frames(self, player):
+        # 工作线程：依次解码这个播放器的最新请求，连续步进时中间的请求被跳过
+        while True:
+            with self.frame_step_lock:
+                request = self.frame_step_pending.pop(player, None)
+                if request is None:
+                    self.frame_step_running.discard(player)
+                    return
+            source, position, generation = request
+            try:
+                frame = source.frame_at(position)
+            except Exception as e:
+                print(f"逐帧解码失败 {player.file_path}: {e}")
+                frame = None
+            if frame is not None:
+                # 环形缓冲区中的帧在下次解码后失效，复制一份交给主线程
+                self.frame_step_signals.frame_ready.emit(player, generation, frame.copy())
+    
+    def frame_step_ready(self, player, generation, frame):
+        # 已经有更新的步进，或者已经开始播放（解码帧来源已关闭）时丢弃
+        if generation != self.frame_step_generation or player not in self.frame_sources:
+            return
+        player.show_frame(frame)
+    
+    def get_frame_source(self, player):
+        info = self.media_info.get(player.file_path)
+        if info is None or not info["width"]:
+            return None
+        
+        # 按单元格尺寸解码，单元格尺寸或文件变化时重新创建
+        from grid_export import even
+        from media_probe import display_aspect
+        box_width = max(2, player.video_stack.width())
+        box_height = max(2, player.video_stack.height())
+        aspect = display_aspect(info)
+        width = min(box_width, int(box_height * aspect), info["width"])
+        size = (even(width), even(width / aspect))
+        
+        key = (player.file_path, size)
+        entry = self.frame_sources.get(player)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if entry is not None:
+            entry[1].close()
+        try:
+            from frame_source import FrameSource
+        except ImportError as e:
+            print(f"逐帧步进需要安装 numpy: {e}")
+            return None
+        source = FrameSource(player.file_path, info, size, memory_cap=16 * 1024 * 1024)
+        self.frame_sources[player] = (key, source)
+        return source
+    
+    def close_frame_sources(self, players=None):
+        for player in list(self.frame_sources if players is None else players):
+            entry = self.frame_sources.pop(player, None)
+            if entry is not None:
+                entry[1].close()
+            player.show_video()
+    
+    def playback_finished(self):
+        self.play_button.setChecked(False)
+        self.play_button.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+    
+    def update_sync_mode(self):
+        self.sync_engine.set_mode(self.sync_mode_combo.currentData())
+        # 对齐偏移只在绝对时间模式下影响主时长
+        self.update_master_duration(0)
+    
+    def export_sync_stats(self):
+        if not self.sync_engine.stats.summary():
+            print("还没有同步统计数据，请先播放视频")
+            return
+        
+        output_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "保存同步统计",
+            os.path.expanduser("~") + "/sync_stats.json",
+            "JSON 文件 (*.json)"
+        )
+        if output_path:
+            self.sync_engine.stats.export_json(output_path, include_samples=True)
+            print(f"同步统计已保存: {output_path}")
+    
+    def start_quality_analysis(self):
+        players = [p for p in self.players if p.file_path]
+        if len(players) < 2:
+            print("质量分析至少需要两个视频")
+            return
+        
+        # 选择参考视频，其余视频都与它比较
+        names = [f"{i + 1}. {p.title_bar.text()}" for i, p in enumerate(players)]
+        name, ok = QInputDialog.getItem(self, "质量分析", "参考视频:", names, 0, False)
+        if not ok:
+            return
+        reference = players[names.index(name)]
+        info = self.media_info.get(reference.file_path)
+        if info is None:
+            print("参考视频还没有探测完成，请稍后再试")
+            return
+        others = []
+        for player in players:
+            if player.file_path != reference.file_path and player.file_path not in others:
+                others.append(player.file_path)
+        if not others:
+            print("没有可以比较的视频")
+            return
+        
+        try:
+            from quality_metrics import AnalysisCancelled, compare_videos
+        except ImportError as e:
+            print(f"质量分析需要安装 numpy: {e}")
+            return
+        
+        if self.quality_cancel_event is not None:
+            self.quality_cancel_event.set()
+        cancel_event = threading.Event()
+        self.quality_cancel_event = cancel_event
+        self.quality_reference = reference
+        self.quality_names = {p.file_path: p.title_bar.text() for p in players}
+        backend = self.quality_backend_combo.currentData()
+        signals = self.quality_signals
+        
+        def run():
+            try:
+                result = compare_videos(reference.file_path, others, info, backend,
+                                        progress_callback=lambda done, percent: signals.progress.emit(percent),
+                                        cancel_event=cancel_event)
+            except AnalysisCancelled:
+                return
+            except Exception as e:
+                signals.failed.emit(str(e))
+                return
+            if not cancel_event.is_set():
+                signals.finished.emit(result)
+        
+        self.quality_status_label.setText("正在分析...")
+        self.quality_panel.show()
+        threading.Thread(target=run, daemon=True).start()
+    
+    def update_quality_progress(self, percent):
+        self.quality_status_label.setText(f"正在分析... {percent:.1f}%")
+    
+    def quality_finished(self, result):
+        self.quality_result = result
+        self.worst_frame_index = 0
+        
+        # 只列出实际计算了的指标
+        self.quality_metric_combo.blockSignals(True)
+        self.quality_metric_combo.clear()
+        for metric in result.available_metrics():
+            self.quality_metric_combo.addItem(metric.upper(), metric)
+        self.quality_metric_combo.blockSignals(False)
+        
+        self.quality_graph.set_result(result, self.quality_names)
+        self.update_quality_metric()
+        lines = []
+        for path, metrics in result.summary().items():
+            values = ", ".join(f"{m.upper()} {v['mean']:.3f}" for m, v in metrics.items())
+            lines.append(f"{self.quality_names.get(path, os.path.basename(path))}: {values}")
+        self.quality_status_label.setText("  |  ".join(lines))
+    
+    def quality_failed(self, message):
+        self.quality_status_label.setText(f"分析失败: {message}")
+    
+    def update_quality_metric(self):
+        metric = self.quality_metric_combo.currentData()
+        if metric:
+            self.quality_graph.set_metric(metric)
+            self.worst_frame_index = 0
+    
+    def jump_to_worst_frame(self):
+        # 在所有对比视频中按当前指标从最差的帧开始依次跳转
+        result = self.quality_result
+        metric = self.quality_metric_combo.currentData()
+        if result is None or not metric:
+            return
+        worst = sorted((item for path in result.metrics for item in result.worst_frames(path, metric, 50)),
+                       key=lambda item: item[1])
+        frames = list(dict.fromkeys(frame for frame, _ in worst))
+        if not frames:
+            return
+        frame = frames[self.worst_frame_index % len(frames)]
+        self.worst_frame_index += 1
+        self.seek_quality_frame(result.frame_time(frame))
+    
+    def seek_quality_frame(self, reference_ms):
+        # 图表时间以参考视频为准，换算成主时钟位置后跳转
+        if self.quality_reference is None or self.quality_reference not in self.players:
+            return
+        self.sync_players_position(self.sync_engine.master_for(self.quality_reference, reference_ms))
+    
+    def export_quality_result(self):
+        if self.quality_result is None:
+            return
+        output_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "保存质量分析结果",
+            os.path.expanduser("~") + "/quality_metrics.json",
+            "JSON 文件 (*.json)"
+        )
+        if output_path:
+            self.quality_result.export_json(output_path)
+            print(f"质量分析结果已保存: {output_path}")
+    
+    def start_audio_align(self):
+        players = [p for p in self.players if p.file_path]
+        if len(players) < 2:
+            print("音频对齐至少需要两个视频")
+            return
+        
+        names = [f"{i + 1}. {p.title_bar.text()}" for i, p in enumerate(players)]
+        name, ok = QInputDialog.getItem(self, "音频对齐", "参考视频:", names, 0, False)
+        if not ok:
+            return
+        reference = players[names.index(name)]
+        
+        try:
+            from audio_align import AlignmentCancelled, align_clips
+        except ImportError as e:
+            print(f"音频对齐需要安装 numpy: {e}")
+            return
+        
+        if self.align_cancel_event is not None:
+            self.align_cancel_event.set()
+        cancel_event = threading.Event()
+        self.align_cancel_event = cancel_event
+        self.align_players = {"reference": reference, "players": players}
+        others = list(dict.fromkeys(p.file_path for p in players if p.file_path != reference.file_path))
+        signals = self.align_signals
+        
+        def run():
+            try:
+                offsets = align_clips(reference.file_path, others, cancel_event=cancel_event,
+                                      progress_callback=lambda done, total: signals.progress.emit(done, total))
+            except AlignmentCancelled:
+                return
+            except Exception as e:
+                signals.failed.emit(str(e))
+                return
+            if not cancel_event.is_set():
+                signals.finished.emit(offsets)
+        
+        self.align_button.setEnabled(False)
+        self.align_button.setText("对齐中...")
+        threading.Thread(target=run, daemon=True).start()
+    
+    def update_align_progress(self, done, total):
+        self.align_button.setText(f"对齐 {done}/{total}")
+    
+    def audio_align_finished(self, offsets):
+        self.align_cancel_event = None
+        self.align_button.setEnabled(True)
+        self.align_button.setText("音频对齐")
+        reference = self.align_players.get("reference")
+        if reference is None or reference not in self.players:
+            return
+        
+        # 参考视频作为主时间线，其余视频按偏移放到主时间线上
+        reference_offset = self.sync_engine.offsets.get(reference, 0)
+        for player in self.align_players["players"]:
+            if player not in self.players:
+                continue
+            if player.file_path == reference.file_path:
+                offset = 0
+            else:
+                result = offsets.get(player.file_path)
+                if result is None:
+                    print(f"{player.title_bar.text()}: 没有找到可靠的音频对齐，保持原偏移")
+                    continue
+                offset, score = result
+                print(f"{player.title_bar.text()}: 偏移 {offset} ms（相关系数 {score:.2f}）")
+            self.sync_engine.set_offset(player, offset + reference_offset)
+        self.align_players = {}
+        
+        # 偏移只在绝对时间模式下生效
+        self.sync_mode_combo.setCurrentIndex(self.sync_mode_combo.findData(SYNC_ABSOLUTE))
+        self.update_master_duration(0)
+        self.sync_players_position(self.sync_engine.position())
+    
+    def audio_align_failed(self, message):
+        self.align_cancel_event = None
+        self.align_players = {}
+        self.align_button.setEnabled(True)
+        self.align_button.setText("音频对齐")
+        print(f"音频对齐失败: {message}")
+    
+    def close_quality_panel(self):
+        if self.quality_cancel_event is not None:
+            self.quality_cancel_event.set()
+            self.quality_cancel_event = None
+        self.quality_panel.hide()
     
     def toggle_mute_all(self, muted):
         for player in self.players:
@@ -459,44 +2316,210 @@ class VideoComparisonTool(QMainWindow):
         
         self.mute_all_button.setText("取消静音" if muted else "全部静音")
     
+    def get_probe_cache(self):
+        if self.probe_cache is None:
+            from media_probe import ProbeCache
+            self.probe_cache = ProbeCache()
+        return self.probe_cache
+    
+    def get_export_queue(self):
+        if self.export_queue is None:
+            from export_pipeline import ExportQueue
+            self.export_queue = ExportQueue(
+                max_concurrent=self.export_concurrency_spinbox.value(),
+                on_started=self.export_signals.job_started.emit,
+                on_progress=self.export_signals.job_progress.emit,
+                on_finished=self.export_signals.job_finished.emit,
+            )
+        return self.export_queue
+    
+    def start_probe(self, file_paths):
+        # 查缓存也要对每个文件 stat（网络共享上可能很慢），全部放到后台线程：
+        # 已缓存的文件先交回主线程，其余的再并行探测
+        probe_cache = self.get_probe_cache()
+        emit = self.probe_signals.probed.emit
+        
+        def run():
+            missing = []
+            for file_path in file_paths:
+                info = probe_cache.get(file_path)
+                if info is not None:
+                    emit(file_path, info)
+                else:
+                    missing.append(file_path)
+            if missing:
+                probe_cache.probe_many(missing, emit)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def media_probed(self, file_path, info):
+        if info is None:
+            return
+        self.media_info[os.path.abspath(file_path)] = info
+        for player in self.players:
+            if player.file_path == os.path.abspath(file_path) and not player.known_duration:
+                player.known_duration = info["duration_ms"]
+        self.update_master_duration(info["duration_ms"])
+        # 会话索引中已经有缩略图时不需要再生成
+        if not all(p.thumbnail_index for p in self.players if p.file_path == os.path.abspath(file_path)):
+            self.start_thumbnail_index(file_path, info)
+        self.proxy_timer.start()
+    
+    def start_thumbnail_index(self, file_path, info):
+        # 缩略图索引在后台线程中生成，最多同时运行两个 ffmpeg
+        if self.thumbnail_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.thumbnail_executor = ThreadPoolExecutor(max_workers=2)
+        
+        def build():
+            from thumbnail_index import build_index
+            try:
+                index = build_index(file_path, info["keyframes"])
+            except Exception as e:
+                print(f"生成缩略图失败 {file_path}: {e}")
+                index = None
+            self.probe_signals.thumbnails_ready.emit(file_path, index)
+        
+        self.thumbnail_executor.submit(build)
+    
+    def thumbnails_ready(self, file_path, index):
+        if index is None:
+            return
+        for player in self.players:
+            if player.file_path == os.path.abspath(file_path):
+                player.thumbnail_index = index
+    
+    def player_duration(self, player):
+        # 解码器还没加载完成时使用探测到的时长
+        duration = player.duration()
+        if duration > 0:
+            return duration
+        info = self.media_info.get(player.file_path)
+        return info["duration_ms"] if info else 0
+    
     def update_master_duration(self, duration):
-        # 使用最长视频的时长作为主时长
-        max_duration = max((p.media_player.duration() for p in self.players if p.media_player.duration() > 0), default=0)
-        if max_duration > 0:
+        # 使用最长视频的时长作为主时长，绝对时间模式下包含对齐偏移
+        absolute = self.sync_engine.mode == SYNC_ABSOLUTE
+        max_duration = max((self.player_duration(p) + (self.sync_engine.offsets.get(p, 0) if absolute else 0)
+                            for p in self.players), default=0)
+        if not self.players:
+            # 所有视频都已移除
+            self.master_slider.setRange(0, 0)
+            self.sync_engine.set_duration(0)
+        elif max_duration > 0:
             self.master_slider.setRange(0, max_duration)
+            self.sync_engine.set_duration(max_duration)
+            # 新加载的时长会改变比例模式下的映射
+            self.sync_engine.reanchor()
+    
+    def player_fps(self, player):
+        info = self.media_info.get(player.file_path)
+        return info["fps"] if info else 0.0
     
     def update_master_position(self, position):
         if not self.players:
             return
+        self.pending_master_position = position
+        self.ui_scheduler.request(self, self.refresh_master_position)
+    
+    def refresh_master_position(self):
+        position = self.pending_master_position
+        
+        # 质量曲线上的当前位置以参考视频的时间为准
+        if self.quality_result is not None and self.quality_reference in self.players:
+            self.quality_graph.set_position(self.sync_engine.preview_target(self.quality_reference, position))
             
-        # 检查是否有任何播放器正在播放
-        if not any(p.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState for p in self.players):
+        # 更新主进度条位置，拖动时不覆盖用户操作
+        if not self.master_slider.isSliderDown():
+            self.master_slider.setValue(position)
+        
+        # 显示的秒数没有变化时不更新时间标签
+        duration = self.master_slider.maximum()
+        displayed = (int(position / 1000), int(duration / 1000))
+        if displayed == self.displayed_master_time:
             return
-            
-        # 更新主进度条位置
-        self.master_slider.setValue(position)
+        self.displayed_master_time = displayed
         
         # 更新时间标签
-        duration = self.master_slider.maximum()
         current_time = self.format_time(position)
         total_time = self.format_time(duration)
         self.master_time_label.setText(f"{current_time} / {total_time}")
     
-    def sync_players_position(self, position):
-        # 同步所有播放器的位置
-        was_playing = any(p.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState for p in self.players)
-        
+    def update_ui_rate_label(self):
+        scheduler = self.ui_scheduler
+        self.ui_rate_label.setText(f"界面刷新 {scheduler.refreshes_per_second}/s (请求 {scheduler.requests_per_second}/s)")
+    
+    def set_perf_enabled(self, enabled):
+        tracer.enabled = enabled
         for player in self.players:
-            if player.media_player.duration() > 0:
-                # 按比例设置位置
-                ratio = position / self.master_slider.maximum()
-                player_pos = int(ratio * player.media_player.duration())
-                player.media_player.setPosition(player_pos)
-        
-        # 如果之前有视频在播放，则继续播放
-        if was_playing and not self.play_button.isChecked():
-            self.play_button.setChecked(True)
-            self.toggle_playback()
+            player.set_perf_enabled(enabled)
+        self.loop_lag_label.setVisible(enabled)
+        if enabled:
+            self.loop_lag.reset()
+            self.lag_timer.start()
+            self.perf_timer.start()
+        else:
+            self.lag_timer.stop()
+            self.perf_timer.stop()
+    
+    def refresh_perf(self):
+        mean_lag, max_lag = self.loop_lag.snapshot()
+        self.loop_lag_label.setText(f"事件循环延迟 {mean_lag:.0f}/{max_lag:.0f} ms")
+        tracer.counter("event loop lag", "ui", mean_ms=round(mean_lag, 1), max_ms=round(max_lag, 1))
+        tracer.counter("ui refresh", "ui", refreshes=self.ui_scheduler.refreshes_per_second,
+                       requests=self.ui_scheduler.requests_per_second)
+        # 停放的播放器没有解码，不需要刷新
+        for player in self.players:
+            if player.perf is not None and not player.parked:
+                player.update_perf_label()
+    
+    def export_trace(self):
+        trace_path, _ = QFileDialog.getSaveFileName(self, "导出跟踪", os.path.expanduser("~") + "/trace.json",
+                                                    "Chrome 跟踪文件 (*.json)")
+        if not trace_path:
+            return
+        try:
+            count = tracer.export(trace_path)
+        except OSError as e:
+            print(f"无法导出跟踪: {e}")
+            return
+        print(f"已导出 {count} 个跟踪事件: {trace_path}")
+    
+    def scrub_preview(self, position):
+        # 每个视频显示对应时间点的缩略图，停顿一段时间后再真正跳转
+        for player in self.sync_engine.players:
+            player.show_thumbnail(self.sync_engine.preview_target(player, position))
+        self.update_master_position(position)
+        self.scrub_timer.start()
+    
+    @traced("ui")
+    def commit_scrub(self):
+        self.scrub_timer.stop()
+        position = self.master_slider.value()
+        
+        # 吸附到第一个视频中最近的关键帧：关键帧是该视频的媒体时间，先换算过去吸附，再换算回主时钟
+        if self.snap_keyframe_checkbox.isChecked() and self.players:
+            reference = self.players[0]
+            info = self.media_info.get(reference.file_path)
+            if info and info["keyframes"] and reference.duration() > 0:
+                from media_probe import nearest_keyframe
+                media_position = self.sync_engine.preview_target(reference, position)
+                position = int(self.sync_engine.master_for(reference, nearest_keyframe(info["keyframes"],
+                                                                                       media_position)))
+        
+        self.sync_players_position(position)
+        
+        # 仍在拖动时保留缩略图，松开后切回视频
+        if not self.master_slider.isSliderDown():
+            self.close_frame_sources()
+            for player in self.players:
+                # 打开会话后还没加载完成的播放器继续显示缩略图
+                if player not in self.session_pending:
+                    player.show_video()
+    
+    def sync_players_position(self, position):
+        # 通过主时钟同步所有播放器的位置（按比例或绝对时间）
+        self.sync_engine.seek(position)
     
     def update_volume(self, value):
         # 更新所有播放器的音量
@@ -516,35 +2539,21 @@ class VideoComparisonTool(QMainWindow):
         return f"{hours:02d}:{minutes % 60:02d}:{seconds % 60:02d}"
     
     def dragEnterEvent(self, event):
-        # 检查是否有视频文件被拖拽
+        # 接受本地文件和文件夹，是否为视频在扫描时判断
         if event.mimeData().hasUrls():
-            # 只接受本地文件
-            for url in event.mimeData().urls():
-                if url.isLocalFile() and self.is_video_file(url.toLocalFile()):
-                    event.acceptProposedAction()
-                    return
+            if any(url.isLocalFile() for url in event.mimeData().urls()):
+                event.acceptProposedAction()
+                return
         event.ignore()
     
     def dropEvent(self, event):
-        # 处理被拖拽的视频文件
-        files = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile() and self.is_video_file(url.toLocalFile())]
-        if files:
-            # 为每个被拖拽的视频创建播放器
-            for file_path in files:
-                player = VideoPlayer(len(self.players))
-                player.load_video(file_path)
-                self.players.append(player)
-                
-                # 连接主进度条更新
-                player.media_player.durationChanged.connect(self.update_master_duration)
-                player.media_player.positionChanged.connect(self.update_master_position)
-                
-                # 如果这是第一个视频，设置为主控制
-                if len(self.players) == 1:
-                    self.master_slider.setRange(0, player.media_player.duration())
-            
-            self.update_grid_layout()
-            event.acceptProposedAction()
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if not paths:
+            return
+        # 全部交给后台扫描：先判断是否为文件夹（名为 foo.mp4 的文件夹也会展开），
+        # 文件按扩展名或文件头判断，扩展名不常见的视频也能添加；按拖入的顺序加入网格
+        self.start_scan(paths)
+        event.acceptProposedAction()
     
     def dragMoveEvent(self, event):
         # 允许在窗口上拖动
@@ -552,16 +2561,33 @@ class VideoComparisonTool(QMainWindow):
             event.acceptProposedAction()
         else:
             event.ignore()
-    
-    def is_video_file(self, file_path):
-        # 检查文件是否为支持的视频格式
-        video_extensions = [".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv"]
-        return any(file_path.lower().endswith(ext) for ext in video_extensions)
         
     def closeEvent(self, event):
         # 清理资源
+        if self.export_queue is not None:
+            self.export_queue.cancel_all()
+        if self.thumbnail_executor is not None:
+            self.thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+        if self.frame_step_executor is not None:
+            self.frame_step_executor.shutdown(wait=False, cancel_futures=True)
+        # 停放所有播放器释放解码器，并销毁池中空闲的播放器
         for player in self.players:
-            player.media_player.stop()
+            player.park()
+        self.player_pool.clear()
+        self.close_frame_sources()
+        if self.quality_cancel_event is not None:
+            self.quality_cancel_event.set()
+        if self.align_cancel_event is not None:
+            self.align_cancel_event.set()
+        if self.scan_cancel_event is not None:
+            self.scan_cancel_event.set()
+        if os.environ.get("VCT_TRACE"):
+            try:
+                tracer.export(os.environ["VCT_TRACE"])
+            except OSError as e:
+                print(f"无法导出跟踪: {e}")
+        if self.proxy_cache is not None:
+            self.proxy_cache.shutdown()
         event.accept()
     
     def export_video(self):
@@ -569,11 +2595,8 @@ class VideoComparisonTool(QMainWindow):
         if not self.players:
             print("没有视频可以导出")
             return
-            
-        # 暂停所有视频
-        for player in self.players:
-            player.media_player.pause()
-            
+        
+        # 导出在后台线程中运行，播放状态保持不变（直接暂停播放器会与主时钟的漂移纠正冲突）
         # 选择保存路径
         output_path, _ = QFileDialog.getSaveFileName(
             self, 
@@ -585,112 +2608,143 @@ class VideoComparisonTool(QMainWindow):
         if not output_path:
             return  # 用户取消了保存对话框
         
-        # 获取所有视频路径
-        video_paths = []
-        for player in self.players:
-            media_url = player.media_player.source().toLocalFile()
-            if media_url:
-                video_paths.append(media_url)
+        # 获取所有视频路径和导出时间线上的偏移，入点处各视频的位置与拖动预览一致
+        export_players = [player for player in self.players if player.file_path]
+        video_paths = [player.file_path for player in export_players]
+        start = self.export_range[0] or 0
+        offsets = [self.sync_engine.export_offset(player, start) for player in export_players]
         
         # 获取当前的视频每行数量和布局类型
         videos_per_row = self.videos_per_row_spinbox.value()
         is_zigzag = self.layout_type_combo.currentIndex() == 0
         
-        # 使用FFmpeg合并视频
+        # 开始前估算输出分辨率，网格超过导出配置的输出尺寸上限时整体缩小
+        from grid_export import get_profile, grid_output_size, output_duration, tile_size_for
+        profile = get_profile(self.export_profile_combo.currentData())
+        if self.export_fps_combo.currentData():
+            profile["fps"] = self.export_fps_combo.currentData()
+        tile_size = tile_size_for([self.media_info.get(path) for path in video_paths], profile)
+        output_width, output_height = grid_output_size(tile_size, len(video_paths), videos_per_row, profile)
+        print(f"导出分辨率 {output_width}x{output_height}，单元格 {tile_size[0]}x{tile_size[1]}")
+        
+        # 按时长策略计算输出时长，有入点/出点时只导出这一段
+        duration_policy = self.duration_policy_combo.currentData()
+        end_times = [self.player_duration(p) + offset for p, offset in zip(export_players, offsets)]
+        total_duration = output_duration(end_times, duration_policy)
+        # 入点/出点在主时间线上，输入端的位置由上面的偏移换算（入点 - 偏移）
+        time_range = tuple(self.export_range) if self.export_range != [None, None] else None
+        
+        # 勾选的附加输出在同一个 ffmpeg 进程中编码
+        from grid_export import preset_target
+        targets = [preset_target(name, output_path)
+                   for name, checkbox in self.export_target_checkboxes.items() if checkbox.isChecked()]
+        
+        # 在后台线程中执行FFmpeg，界面和播放保持响应；多个导出会排队
+        # 分段模式下同一输出路径再次导出时会复用已完成的分段
+        # 入点在输出时长之后或出点不晚于入点时直接报错，不启动导出
+        from export_pipeline import create_export_job, export_range
         try:
-            # 创建临时文件夹用于处理
-            temp_dir = tempfile.mkdtemp()
-            
-            # 准备FFmpeg命令
-            ffmpeg_cmd = ["ffmpeg", "-y"]
-            
-            # 为每个视频添加输入
-            for i, video_path in enumerate(video_paths):
-                ffmpeg_cmd.extend(["-i", video_path])
-            
-            # 计算行数
-            num_videos = len(video_paths)
-            rows = (num_videos + videos_per_row - 1) // videos_per_row
-            
-            # 构建FFmpeg网格布局的筛选器复杂命令
-            filter_complex = []
-            
-            # 首先分析所有视频的尺寸以决定基准格式
-            # 使用缩放比例而不是固定大小
-            analyze_cmd = ["ffmpeg"]
-            # 分析每个视频的原始尺寸
-            aspect_ratios = []
-            
-            # 默认使用更小的padding和间距
-            # 视频之间仅留小空间(设置为1)
-            padding = 1
-            
-            # 添加xstack格式的视频网格
-            row_stacks = []
-            for row in range(rows):
-                row_inputs = []
-                for col in range(videos_per_row):
-                    idx = row * videos_per_row + col
-                    
-                    # 如果使用Z字形布局且是奇数行，则反向排序
-                    if is_zigzag and row % 2 == 1:
-                        idx = row * videos_per_row + (videos_per_row - 1 - col)
-                        
-                    if idx < num_videos:
-                        # 保持原始比例，使用缩放而不是填充
-                        # 使用更高的分辨率提高清晰度（640x360而不是320x180）
-                        # 使用简单的缩放命令，避免复杂的表达式
-                        filter_complex.append(f"[{idx}:v]scale=640:-2,setsar=1[v{idx}]")
-                        row_inputs.append(f"[v{idx}]")
-                    else:
-                        # 如果没有够的视频，添加适合分辨率的空白背景
-                        # 使用正确的FFmpeg color滤镜格式：s=宽度x高度
-                        filter_complex.append(f"color=black:s=640x360:d=999999[v{idx}]")
-                        row_inputs.append(f"[v{idx}]")
+            export_range(time_range, total_duration)
+            job = create_export_job(self.export_mode_combo.currentData(), video_paths, output_path,
+                                    videos_per_row, is_zigzag, total_duration, probe_cache=self.get_probe_cache(),
+                                    profile=profile, offsets=offsets, time_range=time_range,
+                                    duration_policy=duration_policy, targets=targets)
+        except ValueError as e:
+            print(f"导出错误: {e}")
+            return
+        
+        self.get_export_queue().add(job)
+        self.refresh_export_status()
+    
+    def set_export_in(self):
+        position = self.master_slider.value()
+        self.export_range[0] = position
+        if self.export_range[1] is not None and self.export_range[1] <= position:
+            self.export_range[1] = None
+        self.update_range_label()
+    
+    def set_export_out(self):
+        position = self.master_slider.value()
+        self.export_range[1] = position
+        if self.export_range[0] is not None and self.export_range[0] >= position:
+            self.export_range[0] = None
+        self.update_range_label()
+    
+    def clear_export_range(self):
+        self.export_range = [None, None]
+        self.update_range_label()
+    
+    def update_range_label(self):
+        start, end = self.export_range
+        if start is None and end is None:
+            self.range_label.setText("")
+            return
+        end_text = self.format_time(end) if end is not None else "结尾"
+        self.range_label.setText(f"导出区间 {self.format_time(start or 0)} - {end_text}")
+    
+    def update_export_concurrency(self, value):
+        if self.export_queue is not None:
+            self.export_queue.set_max_concurrent(value)
+    
+    def export_started(self, job):
+        self.export_progress[job] = None
+        self.refresh_export_status()
+    
+    def update_export_progress(self, job, stats):
+        if job in self.export_progress:
+            self.export_progress[job] = stats
+            self.refresh_export_status()
+    
+    def refresh_export_status(self):
+        export_queue = self.get_export_queue()
+        running = list(self.export_progress.values())
+        pending = len(export_queue.pending)
+        
+        if not running and not pending and not export_queue.running:
+            self.export_panel.hide()
+            return
+        self.export_panel.show()
+        
+        # 进度条显示所有运行中任务的平均进度
+        percents = [stats["percent"] if stats else 0.0 for stats in running]
+        self.export_progress_bar.setValue(int(sum(percents) / max(1, len(percents)) * 10))
+        
+        # 显示编码阶段、帧率、速度和剩余时间
+        status = ""
+        stats = running[0] if running else None
+        if stats is None:
+            status = "正在启动 ffmpeg..."
+        else:
+            status = f"{stats['stage']}  {stats['fps']:.1f} fps  {stats['speed']:.2f}x"
+            if stats["eta"] is not None:
+                status += f"  剩余 {self.format_time(stats['eta'] * 1000)}"
+        if len(running) > 1:
+            status += f"  运行中 {len(running)} 个"
+        if pending:
+            status += f"  排队 {pending} 个"
+        self.export_status_label.setText(status)
+    
+    def cancel_export(self):
+        if self.export_queue is not None:
+            self.export_status_label.setText("正在取消...")
+            self.export_queue.cancel_all()
+    
+    def export_finished(self, job, success, message):
+        self.export_progress.pop(job, None)
+        self.refresh_export_status()
+        
+        if success:
+            print(f"导出成功: {message}")
+            for target in job.targets:
+                print(f"附加输出: {target['output']}")
+        else:
+            print(f"导出错误: {message}")
+        if job.stage_times:
+            print("阶段耗时: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in job.stage_times.items()))
 
-                
-                # 水平合并每一行的视频，不使用padding参数避免兼容性问题
-                row_stacks.append(f"{''.join(row_inputs)}hstack=inputs={len(row_inputs)}[row{row}]")
-            
-            # 垂直合并所有行
-            filter_complex.extend(row_stacks)
-            rows_inputs = ''.join([f"[row{i}]" for i in range(rows)])
-            filter_complex.append(f"{rows_inputs}vstack=inputs={rows}[v]")
-            
-            # 为整个视频添加统一小边距
-            filter_complex.append(f"[v]pad=iw+10:ih+10:5:5:black[vout]")
-            
-            # 最终输出使用vout而不是v
-            output_label = "vout"
-            
-            # 添加最终的复合筛选器到FFmpeg命令
-            ffmpeg_cmd.extend(["-filter_complex", ';'.join(filter_complex)])
-            
-            # 添加输出参数，使用更高的质量和适当的编码设置以确保画质
-            ffmpeg_cmd.extend([
-                "-map", f"[{output_label}]", 
-                "-c:v", "libx264", 
-                "-preset", "slow",  # 使用更慢但质量更高的预设
-                "-crf", "16",  # 质量设置更高，数值越小质量越高、8-28之间，16已非常高
-                "-pix_fmt", "yuv420p",  # 确保在不同播放器中兼容
-                "-tune", "film",  # 优化处理电影内容
-                output_path
-            ])
-            
-            # 执行FFmpeg命令
-            subprocess.run(ffmpeg_cmd, check=True)
-            
-            # 清理临时目录
-            for file in os.listdir(temp_dir):
-                os.unlink(os.path.join(temp_dir, file))
-            os.rmdir(temp_dir)
-            
-            print(f"导出成功: {output_path}")
-            
-        except Exception as e:
-            print(f"导出错误: {str(e)}")
-            import traceback
-            traceback.print_exc()
+def video_file_filter():
+    from media_scan import VIDEO_EXTENSIONS
+    return "视频文件 (" + " ".join("*" + ext for ext in sorted(VIDEO_EXTENSIONS)) + ")"
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -701,8 +2755,18 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def set_app_icon(app, window):
+    # 设置应用程序图标，放在窗口显示之后加载，不影响启动速度
+    try:
+        app_icon = QIcon(resource_path('logo.ico'))
+        app.setWindowIcon(app_icon)
+        window.setWindowIcon(app_icon)
+    except Exception as e:
+        print(f"Warning: Could not set application icon: {e}")
+
+def create_application(argv):
+    """ 创建应用程序并显示主窗口，返回 (app, window)，由调用方运行事件循环 """
+    app = QApplication(argv)
     
     # 设置应用程序样式为Fusion以获得更好的跨平台外观
     app.setStyle("Fusion")
@@ -711,14 +2775,26 @@ if __name__ == "__main__":
     font = QFont("Microsoft YaHei", 9)
     app.setFont(font)
     
-    # 设置应用程序图标
-    try:
-        app_icon = QIcon(resource_path('logo.ico'))
-        app.setWindowIcon(app_icon)
-    except Exception as e:
-        print(f"Warning: Could not set application icon: {e}")
-    
+    # 先显示空窗口，其余初始化在事件循环开始后进行
     window = VideoComparisonTool()
-    window.setWindowIcon(app_icon)
     window.show()
-    sys.exit(app.exec())
+    QTimer.singleShot(0, lambda: set_app_icon(app, window))
+    return app, window
+
+def main():
+    app, window = create_application(sys.argv)
+    
+    # 命令行传入会话文件时直接打开，其他参数（视频、文件夹、通配符）交给后台扫描后添加
+    from session import SESSION_EXTENSION
+    args = app.arguments()[1:]
+    session_files = [arg for arg in args if arg.lower().endswith(SESSION_EXTENSION)]
+    video_args = [arg for arg in args if not arg.lower().endswith(SESSION_EXTENSION)]
+    if session_files:
+        QTimer.singleShot(0, lambda: window.open_session_file(session_files[0]))
+    if video_args:
+        QTimer.singleShot(0, lambda: window.start_scan(video_args))
+    
+    return app.exec()
+
+if __name__ == "__main__":
+    sys.exit(main())